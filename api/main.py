@@ -1,13 +1,26 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from api.routers.health import router as health_router
 from api.routers.matches import router as matches_router
 from api.core.config import settings
+from utils.matches_cache_reader import subscribe_to_updates
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Каждый воркер uvicorn подписывается сам и сбрасывает свой снимок кэша по уведомлению кэшера
+    subscriber = subscribe_to_updates("api")
+    try:
+        yield
+    finally:
+        subscriber.stop()
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="CS2 Matches API", version="0.1.0")
+    app = FastAPI(title="CS2 Matches API", version="0.1.0", lifespan=lifespan)
 
     app.add_middleware(
         CORSMiddleware,
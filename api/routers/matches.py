@@ -1,6 +1,6 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Query, Depends
+from fastapi import APIRouter, Query, Depends, HTTPException
 
 from api.services import matches_service
 from api.core.rate_limit import rate_limit_dependency
@@ -24,3 +24,29 @@ def recent_matches(tier: str = Query(default="1", pattern="^(1|all)$"), limit: i
     return matches_service.get_matches(status="past", tier=tier, limit=limit)
 
 
+@router.get("/history", dependencies=[Depends(rate_limit_dependency)])
+def match_history(
+    tier: str = Query(default="1", pattern="^(1|all)$"),
+    limit: int = Query(default=50, ge=1, le=200),
+    offset: int = Query(default=0, ge=0),
+    team_id: Optional[int] = Query(default=None),
+    q: Optional[str] = Query(default=None, max_length=100),
+):
+    return matches_service.get_history(tier=tier, limit=limit, offset=offset, team_id=team_id, search=q)
+
+
+@router.get("/changes", dependencies=[Depends(rate_limit_dependency)])
+def match_changes(
+    since: int = Query(default=0, ge=0),
+    limit: int = Query(default=500, ge=1, le=5000),
+    epoch: Optional[str] = Query(default=None, max_length=64),
+):
+    return matches_service.get_changes(since=since, limit=limit, epoch=epoch)
+
+
+@router.get("/{match_id}", dependencies=[Depends(rate_limit_dependency)])
+def match_by_id(match_id: int):
+    match = matches_service.get_match(match_id)
+    if match is None:
+        raise HTTPException(status_code=404, detail="Match not found")
+    return match
@@ -1,6 +1,7 @@
-from typing import List
+from typing import List, Optional
 
-from utils.matches_cache_reader import get_matches as read_matches
+from utils.matches_cache_reader import get_match as read_match, get_matches as read_matches, get_match_history
+from utils.match_journal import read_journal
 
 
 def _tier_param_to_internal(tier: str) -> str:
@@ -15,3 +16,15 @@ def get_matches(status: str, tier: str, limit: int) -> List[dict]:
     return read_matches(status=mapped_status, tier=("all" if internal_tier == "all" else "s"), limit=limit)
 
 
+def get_match(match_id: int) -> Optional[dict]:
+    match = read_match(match_id)
+    return match.to_dict() if match is not None else None
+
+
+def get_changes(since: int, limit: int, epoch: Optional[str] = None) -> dict:
+    return read_journal(since=since, limit=limit, epoch=epoch)
+
+
+def get_history(tier: str, limit: int, offset: int, team_id: Optional[int] = None, search: Optional[str] = None) -> List[dict]:
+    matches = get_match_history(tier=_tier_param_to_internal(tier), limit=limit, offset=offset, team_id=team_id, search=search)
+    return [m.to_dict() for m in matches]
@@ -11,14 +11,14 @@ from telegram.ext import CallbackQueryHandler, MessageHandler, filters, Conversa
 from datetime import datetime
 
 from utils.translations import t
-from utils.matches_cache_reader import get_matches
+from utils.matches_cache_reader import get_match_models, subscribe_to_updates
 from utils.logging_config import setup_logging
 from utils.telegram_messenger import send_match_batch
-from bot.db import (
-    init_db,
+from bot.db import init_db
+from bot.db_async import (
     add_subscriber,
     update_is_active,
-    get_subscriber_tier,
+    get_subscriber_profile,
     update_language,
     get_subscriber_language,
     save_feedback,
@@ -44,62 +44,59 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not update.message:
         return
     user_id = update.effective_chat.id
-    add_subscriber(user_id, tier="sa")
-    update_is_active(user_id, True)
+    await add_subscriber(user_id, tier="sa")
+    await update_is_active(user_id, True)
     logger.info(f"/start от пользователя {user_id}")
-    lang = get_subscriber_language(user_id)
+    lang = await get_subscriber_language(user_id)
     await update.message.reply_text(t("greeting", lang))
 
 async def next_matches(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_chat.id
     logger.info(f"/next от пользователя {user_id}")
-    tier = get_subscriber_tier(user_id) or "all"
-    lang = get_subscriber_language(user_id)
-    matches = get_matches(status="upcoming", tier=tier, limit=8)
-    await send_match_batch(update, context, matches=matches, prefix_text=t("prefix_upcoming", lang), show_time_until=True, empty_text=t("no_upcoming", lang))
+    tier, lang = await get_subscriber_profile(user_id)
+    matches = get_match_models(status="upcoming", tier=tier, limit=8)
+    await send_match_batch(update, context, matches=matches, prefix_text=t("prefix_upcoming", lang), show_time_until=True, empty_text=t("no_upcoming", lang), lang=lang)
 
 async def live_matches(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_chat.id
     logger.info(f"/live от пользователя {user_id}")
-    tier = get_subscriber_tier(user_id) or "all"
-    lang = get_subscriber_language(user_id)
-    matches = get_matches(status="running", tier=tier, limit=8)
-    await send_match_batch(update, context, matches=matches, prefix_text=t("prefix_live", lang), stream_button=True, empty_text=t("no_live", lang))
+    tier, lang = await get_subscriber_profile(user_id)
+    matches = get_match_models(status="running", tier=tier, limit=8)
+    await send_match_batch(update, context, matches=matches, prefix_text=t("prefix_live", lang), stream_button=True, empty_text=t("no_live", lang), lang=lang)
 
 async def recent_matches(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_chat.id
     logger.info(f"/recent от пользователя {user_id}")
-    tier = get_subscriber_tier(user_id) or "all"
-    lang = get_subscriber_language(user_id)
-    matches = get_matches(status="past", tier=tier, limit=8)
-    await send_match_batch(update, context, matches=matches, prefix_text=t("prefix_recent", lang), show_winner=True, empty_text=t("no_recent", lang))
+    tier, lang = await get_subscriber_profile(user_id)
+    matches = get_match_models(status="past", tier=tier, limit=8)
+    await send_match_batch(update, context, matches=matches, prefix_text=t("prefix_recent", lang), show_winner=True, empty_text=t("no_recent", lang), lang=lang)
 
 async def subscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_chat.id
     logger.info(f"/subscribe_top_tiers от пользователя {user_id}")
-    add_subscriber(user_id, tier="sa")
-    update_is_active(user_id, True)
-    lang = get_subscriber_language(user_id)
+    await add_subscriber(user_id, tier="sa")
+    await update_is_active(user_id, True)
+    lang = await get_subscriber_language(user_id)
     await update.message.reply_text(t("subscribed_top", lang))
 
 async def unsubscribe(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_chat.id
     logger.info(f"/unsubscribe от пользователя {user_id}")
-    update_is_active(user_id, False)
-    lang = get_subscriber_language(user_id)
+    await update_is_active(user_id, False)
+    lang = await get_subscriber_language(user_id)
     await update.message.reply_text(t("unsubscribed", lang))
 
 async def subscribe_all(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_chat.id
     logger.info(f"/subscribe_all_tiers от пользователя {user_id}")
-    add_subscriber(user_id, tier="all")
-    update_is_active(user_id, True)
-    lang = get_subscriber_language(user_id)
+    await add_subscriber(user_id, tier="all")
+    await update_is_active(user_id, True)
+    lang = await get_subscriber_language(user_id)
     await update.message.reply_text(t("subscribed_all", lang))
 
 async def language(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_chat.id
-    lang = get_subscriber_language(user_id)
+    lang = await get_subscriber_language(user_id)
     keyboard = InlineKeyboardMarkup([
         [InlineKeyboardButton("English", callback_data="lang_en")],
         [InlineKeyboardButton("Русский", callback_data="lang_ru")],
@@ -112,13 +109,13 @@ async def language_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await query.answer()
     user_id = query.from_user.id
     lang_code = query.data.replace("lang_", "")
-    update_language(user_id, lang_code)
+    await update_language(user_id, lang_code)
     await query.edit_message_text(t("language_updated", lang_code))
 
 async def feedback_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
     logger.info(f"➡️ feedback_start от пользователя {user_id}")
-    lang = get_subscriber_language(user_id)
+    lang = await get_subscriber_language(user_id)
 
     # Удалим проверку здесь — пусть команда всегда работает
     await update.message.reply_text(t("feedback_prompt", lang))
@@ -126,7 +123,7 @@ async def feedback_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def feedback_receive(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = update.effective_user.id
-    lang = get_subscriber_language(user_id)
+    lang = await get_subscriber_language(user_id)
     text = update.message.text.strip()
 
     if "http://" in text or "https://" in text or "t.me" in text:
@@ -146,13 +143,13 @@ async def feedback_receive(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Устанавливаем таймер только после успешной отправки
     feedback_states[user_id] = now
-    save_feedback(user_id, text)
+    await save_feedback(user_id, text)
     logger.info(f"Feedback получен от {user_id}: {text[:50]}...")
     await update.message.reply_text(t("feedback_thanks", lang))
     return ConversationHandler.END
 
 async def feedback_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    lang = get_subscriber_language(update.effective_user.id)
+    lang = await get_subscriber_language(update.effective_user.id)
     await update.message.reply_text(t("feedback_cancelled", lang))
     return ConversationHandler.END
 
@@ -217,6 +214,7 @@ async def main():
     ))
 
     await set_bot_commands(app)
+    subscribe_to_updates("bot")
     logger.info("Бот запущен")
     await app.run_polling()
 
@@ -1,8 +1,12 @@
 import sqlite3
 import os
 import logging
-from datetime import datetime, timezone, timedelta
+import threading
+import time
+from typing import Optional
 from utils.logging_config import setup_logging
+from bot import subscriber_cache
+from bot.subscriber_cache import SubscriberProfile
 
 # Путь к базе данных
 DB_PATH = "data/subscribers.db"
@@ -12,10 +16,78 @@ setup_logging()
 logger = logging.getLogger("db")
 logger.setLevel(logging.DEBUG if os.getenv("DEV_MODE") == "true" else logging.INFO)
 
+# Параметры соединений: WAL позволяет боту и уведомлениям читать, пока другой процесс пишет,
+# а busy_timeout ждёт освобождения блокировки вместо немедленного "database is locked"
+BUSY_TIMEOUT_SECONDS = float(os.getenv("DB_BUSY_TIMEOUT_SECONDS", 5))
+CACHED_STATEMENTS = 256
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",   # в WAL-режиме надёжно при сбое процесса, fsync только на checkpoint
+    "PRAGMA cache_size=-16000",    # ~16 МБ кэша страниц
+    "PRAGMA mmap_size=67108864",   # 64 МБ чтения через mmap
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Отметки об отправленных уведомлениях нужны только для дедупликации в окне уведомления —
+# старше NOTIFIED_RETENTION_DAYS удаляются порциями по NOTIFIED_CLEANUP_CHUNK_SIZE строк
+NOTIFIED_RETENTION_DAYS = int(os.getenv("NOTIFIED_RETENTION_DAYS", 2))
+NOTIFIED_CLEANUP_CHUNK_SIZE = int(os.getenv("NOTIFIED_CLEANUP_CHUNK_SIZE", 5000))
+# Сколько свободных страниц возвращать ОС за один PRAGMA incremental_vacuum
+VACUUM_CHUNK_PAGES = 1000
+
+# Версия схемы (PRAGMA user_version); миграции — в _migrate
+SCHEMA_VERSION = 1
+
+# Одно долгоживущее соединение на поток (sqlite3.Connection нельзя делить между потоками)
+_local = threading.local()
+
+
+def _open_connection(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_SECONDS, cached_statements=CACHED_STATEMENTS)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    logger.debug(f"🔌 Открыто соединение с базой {path} (поток {threading.current_thread().name}).")
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """Соединение текущего потока с DB_PATH; переоткрывается, если DB_PATH сменился.
+
+    Использовать как `with get_connection() as conn:` — блок коммитит (или откатывает при ошибке),
+    но не закрывает соединение; подготовленные запросы кэшируются между вызовами.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.path == DB_PATH:
+        return conn
+
+    close_connection()
+    conn = _open_connection(DB_PATH)
+    _local.conn, _local.path = conn, DB_PATH
+    return conn
+
+
+def close_connection():
+    """Закрывает соединение текущего потока (следующий get_connection откроет новое)."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        conn.close()
+        _local.conn = _local.path = None
+
+
 # Инициализация базы данных и таблиц
 def init_db():
     os.makedirs("data", exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    # Файл базы мог быть пересоздан — не держим соединение со старым
+    close_connection()
+    conn = get_connection()
+
+    # Освобождённые очисткой страницы возвращаются через incremental_vacuum; режим включается
+    # только полным VACUUM (один раз; для новой базы — мгновенно)
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        logger.info("🧹 Включаем incremental auto_vacuum (VACUUM базы)...")
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+
     cursor = conn.cursor()
 
     cursor.execute("""
@@ -32,64 +104,159 @@ def init_db():
         CREATE INDEX IF NOT EXISTS idx_subscribers_active ON subscribers (is_active);
     """)
 
-    # Таблица уведомлений о матчах
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS notified_matches (
-            user_id INTEGER NOT NULL,
-            match_id INTEGER NOT NULL,
-            notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            PRIMARY KEY (user_id, match_id)
-        );
-    """)
+    # Журнал изменений подписчиков для межпроцессной инвалидации кэша профилей
+    cursor.executescript(subscriber_cache.SCHEMA)
+
+    _migrate(conn)
 
     conn.commit()
-    conn.close()
     logger.info("База данных и таблицы инициализированы.")
 
-def add_subscriber(user_id: int, tier: str = "sa", language: str = "en"):
+def _migrate(conn: sqlite3.Connection):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
     try:
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-
-        c.execute("""
-            INSERT INTO subscribers (user_id, tier, is_active, language)
-            VALUES (?, ?, 1, ?)
-            ON CONFLICT(user_id) DO UPDATE SET
-                tier = excluded.tier,
-                is_active = 1
-                -- language НЕ ОБНОВЛЯЕМ!
-        """, (user_id, tier, language))
+        if version < 1:
+            # notified_matches: WITHOUT ROWID с ключом (match_id, user_id) — выборка по матчам окна
+            # идёт по первичному ключу; notified_at — unix-время с индексом для очистки по диапазону
+            conn.execute("""
+                CREATE TABLE notified_matches_v1 (
+                    match_id INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    notified_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER)),
+                    PRIMARY KEY (match_id, user_id)
+                ) WITHOUT ROWID;
+            """)
+            old_table = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notified_matches'"
+            ).fetchone()
+            if old_table:
+                # Старые строки: TEXT-время (CURRENT_TIMESTAMP) -> unix-время; индексы удаляются вместе с таблицей
+                cursor = conn.execute("""
+                    INSERT OR IGNORE INTO notified_matches_v1 (match_id, user_id, notified_at)
+                    SELECT match_id, user_id,
+                           COALESCE(CAST(strftime('%s', notified_at) AS INTEGER), CAST(strftime('%s', 'now') AS INTEGER))
+                    FROM notified_matches
+                """)
+                logger.info(f"🔄 notified_matches перенесена в новую схему: {cursor.rowcount} записей.")
+                conn.execute("DROP TABLE notified_matches")
+            conn.execute("ALTER TABLE notified_matches_v1 RENAME TO notified_matches")
+            conn.execute("CREATE INDEX idx_notified_at ON notified_matches (notified_at)")
 
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         conn.commit()
-        conn.close()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(f"База данных обновлена до версии схемы {SCHEMA_VERSION}.")
+
+def add_subscriber(user_id: int, tier: str = "sa", language: str = "en"):
+    try:
+        with get_connection() as conn:
+            conn.execute("""
+                INSERT INTO subscribers (user_id, tier, is_active, language)
+                VALUES (?, ?, 1, ?)
+                ON CONFLICT(user_id) DO UPDATE SET
+                    tier = excluded.tier,
+                    is_active = 1
+                    -- language НЕ ОБНОВЛЯЕМ!
+            """, (user_id, tier, language))
+
+        subscriber_cache.update(user_id, tier=tier, is_active=True)
         logger.info(f"Подписчик {user_id} добавлен/обновлён с tier={tier}, language={language}")
     except Exception as e:
         logger.error(f"Ошибка при добавлении/обновлении подписчика {user_id}: {e}")
 
 def remove_subscriber(user_id: int):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         logger.info(f"Отключаем уведомления для пользователя {user_id}.")
         conn.execute("UPDATE subscribers SET is_active = 0 WHERE user_id = ?", (user_id,))
         conn.commit()
+        subscriber_cache.update(user_id, is_active=False)
         logger.info(f"Пользователь {user_id} отмечен как неактивный.")
 
 def get_all_subscribers() -> list[int]:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.execute("SELECT user_id FROM subscribers WHERE is_active = 1")
         users = [row[0] for row in cursor.fetchall()]
         logger.debug(f"Получено {len(users)} активных подписчиков из базы: {users}")
         return users
 
+# Сколько id подставлять в один IN (...) — с запасом ниже лимита переменных SQLite
+QUERY_CHUNK_SIZE = 500
+
+def _profile_from_row(row) -> SubscriberProfile:
+    tier, language, is_active = row
+    return SubscriberProfile(tier or "sa", language or "en", is_active == 1)
+
+def get_subscriber_profile(user_id: int) -> Optional[SubscriberProfile]:
+    """Профиль подписчика (tier, язык, активность) через кэш профилей; None — пользователя нет."""
+    with get_connection() as conn:
+        use_cache = subscriber_cache.sync(conn, DB_PATH)
+        if use_cache:
+            hit, profile = subscriber_cache.get(user_id)
+            if hit:
+                return profile
+
+        row = conn.execute(
+            "SELECT tier, language, is_active FROM subscribers WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        profile = _profile_from_row(row) if row else None
+        if use_cache:
+            subscriber_cache.put(user_id, profile)
+        return profile
+
+def get_subscriber_profiles(user_ids: list[int]) -> dict[int, tuple[str, str]]:
+    """tier и язык сразу для списка пользователей (промахи кэша — одним запросом).
+    Отсутствующих в базе в словаре нет."""
+    profiles = {}
+    with get_connection() as conn:
+        use_cache = subscriber_cache.sync(conn, DB_PATH)
+        missing = []
+        for user_id in user_ids:
+            hit, profile = subscriber_cache.get(user_id) if use_cache else (False, None)
+            if not hit:
+                missing.append(user_id)
+            elif profile is not None:
+                profiles[user_id] = (profile.tier, profile.language)
+
+        for start in range(0, len(missing), QUERY_CHUNK_SIZE):
+            chunk = missing[start:start + QUERY_CHUNK_SIZE]
+            cursor = conn.execute(
+                f"SELECT user_id, tier, language, is_active FROM subscribers WHERE user_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            found = {row[0]: _profile_from_row(row[1:]) for row in cursor}
+            for user_id in chunk:
+                profile = found.get(user_id)
+                if use_cache:
+                    subscriber_cache.put(user_id, profile)
+                if profile is not None:
+                    profiles[user_id] = (profile.tier, profile.language)
+    logger.debug(f"Получены профили {len(profiles)} из {len(user_ids)} пользователей ({len(missing)} из базы).")
+    return profiles
+
+def get_active_subscriber_profiles() -> list[tuple[int, str, str]]:
+    """(user_id, tier, language) всех активных подписчиков одним запросом."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT user_id, tier, language FROM subscribers WHERE is_active = 1"
+        ).fetchall()
+    profiles = [(user_id, tier or "sa", language or "en") for user_id, tier, language in rows]
+    logger.debug(f"Получены профили {len(profiles)} активных подписчиков.")
+    return profiles
+
 def get_subscriber_tier(user_id: int) -> str:
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute("SELECT tier FROM subscribers WHERE user_id = ?", (user_id,))
-        row = cursor.fetchone()
-        tier = row[0] if row else "sa"
-        logger.debug(f"Tier для пользователя {user_id}: {tier}")
-        return tier
+    profile = get_subscriber_profile(user_id)
+    tier = profile.tier if profile else "sa"
+    logger.debug(f"Tier для пользователя {user_id}: {tier}")
+    return tier
 
 def was_notified(user_id: int, match_id: int) -> bool:
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         cursor = conn.execute(
             "SELECT 1 FROM notified_matches WHERE user_id = ? AND match_id = ?",
             (user_id, match_id)
@@ -99,7 +266,7 @@ def was_notified(user_id: int, match_id: int) -> bool:
         return result
 
 def mark_notified(user_id: int, match_id: int):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute(
             "INSERT OR IGNORE INTO notified_matches (user_id, match_id) VALUES (?, ?)",
             (user_id, match_id)
@@ -108,18 +275,17 @@ def mark_notified(user_id: int, match_id: int):
         logger.info(f"Пометка: пользователь {user_id} уведомлён о матче {match_id}.")
 
 def get_notified_match_ids(user_id: int, days: int = 3) -> set:
-    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-    cutoff_str = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+    cutoff = int(time.time()) - days * 86400
 
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             cursor = conn.execute(
                 """
                 SELECT match_id
                 FROM notified_matches
                 WHERE user_id = ? AND notified_at >= ?
                 """,
-                (user_id, cutoff_str)
+                (user_id, cutoff)
             )
             match_ids = {row[0] for row in cursor.fetchall()}
             logger.debug(f"🔎 Уведомления за последние {days} дней для {user_id}: {len(match_ids)} матчей.")
@@ -128,64 +294,84 @@ def get_notified_match_ids(user_id: int, days: int = 3) -> set:
         logger.exception(f"❌ Ошибка при получении notified_match_ids для {user_id}: {e}")
         return set()
 
-def mark_notified_bulk(user_match_pairs: list[tuple[int, int]]):
+def get_notified_pairs(match_ids: list[int]) -> set[tuple[int, int]]:
+    """Пары (user_id, match_id), по которым уже отправлено уведомление, только для переданных матчей."""
+    match_ids = list(match_ids)
+    pairs = set()
+    with get_connection() as conn:
+        for start in range(0, len(match_ids), QUERY_CHUNK_SIZE):
+            chunk = match_ids[start:start + QUERY_CHUNK_SIZE]
+            cursor = conn.execute(
+                f"SELECT user_id, match_id FROM notified_matches WHERE match_id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            pairs.update(cursor.fetchall())
+    logger.debug(f"🔎 Уже уведомлённых пар по {len(match_ids)} матчам: {len(pairs)}.")
+    return pairs
+
+def mark_notified_bulk(user_match_pairs: list[tuple[int, int]]) -> bool:
+    """Записывает пары (user_id, match_id) одной транзакцией. False — запись не удалась."""
     if not user_match_pairs:
-        return
+        return True
 
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with get_connection() as conn:
             conn.executemany(
                 "INSERT OR IGNORE INTO notified_matches (user_id, match_id) VALUES (?, ?)",
                 user_match_pairs
             )
             conn.commit()
             logger.info(f"📥 Добавлено уведомлений: {len(user_match_pairs)} записей.")
+        return True
     except Exception as e:
         logger.exception(f"❌ Ошибка при массовой вставке уведомлений: {e}")
+        return False
 
 def update_is_active(user_id: int, is_active: bool):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute("UPDATE subscribers SET is_active = ? WHERE user_id = ?", (1 if is_active else 0, user_id))
         conn.commit()
+        subscriber_cache.update(user_id, is_active=is_active)
         logger.info(f"Пользователь {user_id} обновлён: is_active = {is_active}")
 
 def is_subscriber_active(user_id: int) -> bool:
-    with sqlite3.connect(DB_PATH) as conn:
-        cursor = conn.execute("SELECT is_active FROM subscribers WHERE user_id = ?", (user_id,))
-        row = cursor.fetchone()
-        result = row is not None and row[0] == 1
-        logger.debug(f"Проверка активности пользователя {user_id}: {result}")
-        return result
+    profile = get_subscriber_profile(user_id)
+    result = profile is not None and profile.is_active
+    logger.debug(f"Проверка активности пользователя {user_id}: {result}")
+    return result
     
 def update_tier(user_id: int, tier: str):
-    with sqlite3.connect(DB_PATH) as conn:
+    with get_connection() as conn:
         conn.execute(
             "UPDATE subscribers SET tier = ? WHERE user_id = ?",
             (tier, user_id)
         )
         conn.commit()
+        subscriber_cache.update(user_id, tier=tier)
         logger.info(f"У пользователя {user_id} обновлён уровень подписки на {tier}.")
 
-def create_indexes():
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE INDEX IF NOT EXISTS idx_user_match
-        ON notified_matches(user_id, match_id);
-    """)
-    conn.commit()
-    conn.close()
+def delete_notified_before(cutoff_ts: int, limit: int = NOTIFIED_CLEANUP_CHUNK_SIZE) -> int:
+    """Удаляет не больше limit отметок старше cutoff_ts (по индексу notified_at), отдельной
+    короткой транзакцией. Возвращает число удалённых строк."""
+    with get_connection() as conn:
+        cursor = conn.execute("""
+            DELETE FROM notified_matches
+            WHERE (match_id, user_id) IN (
+                SELECT match_id, user_id FROM notified_matches WHERE notified_at < ? LIMIT ?
+            )
+        """, (cutoff_ts, limit))
+        return cursor.rowcount
 
-def get_connection():
-    return sqlite3.connect(DB_PATH)
+def incremental_vacuum(max_pages: int = VACUUM_CHUNK_PAGES) -> int:
+    """Возвращает ОС до max_pages свободных страниц. Возвращает, сколько свободных осталось."""
+    conn = get_connection()
+    conn.execute(f"PRAGMA incremental_vacuum({int(max_pages)})").fetchall()
+    return conn.execute("PRAGMA freelist_count").fetchone()[0]
 
 def get_subscriber_language(user_id: int) -> str:
     try:
-        with get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT language FROM subscribers WHERE user_id = ?", (user_id,))
-            row = cursor.fetchone()
-            return row[0] if row and row[0] else "en"
+        profile = get_subscriber_profile(user_id)
+        return profile.language if profile else "en"
     except Exception as e:
         logger.exception("Ошибка при получении языка пользователя")
         return "en"
@@ -200,6 +386,7 @@ def update_language(user_id: int, language: str):
                 (language, user_id)
             )
             conn.commit()
+        subscriber_cache.update(user_id, language=language)
     except Exception as e:
         logger.exception("Ошибка при обновлении языка пользователя")
 
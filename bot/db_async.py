@@ -0,0 +1,135 @@
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+from bot import db
+from utils.logging_config import setup_logging
+
+# Асинхронный доступ к базе для хендлеров бота и уведомлений: все запросы выполняются в одном
+# выделенном потоке (у него своё долгоживущее соединение из bot.db), event loop не блокируется.
+# Запросы профиля (tier + язык), пришедшие за один проход цикла, объединяются в один SELECT.
+
+setup_logging()
+logger = logging.getLogger("db")
+
+DEFAULT_PROFILE = ("sa", "en")
+
+# Пауза между порциями очистки notified_matches: в неё успевают выполниться запросы уведомлений
+CLEANUP_PAUSE_SECONDS = 0.05
+
+_db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+
+# Ожидающие запросы профиля: user_id -> futures; _batch_loop — цикл, в котором запланирован сброс
+_profile_waiters: dict[int, list[asyncio.Future]] = {}
+_batch_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def run_db(func, *args, **kwargs):
+    """Выполняет синхронную функцию bot.db в потоке базы."""
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, partial(func, *args, **kwargs))
+
+
+def _db_call(name: str):
+    # Функция берётся из bot.db в момент вызова, чтобы работали подмены в тестах
+    async def call(*args, **kwargs):
+        return await run_db(getattr(db, name), *args, **kwargs)
+
+    call.__name__ = name
+    call.__doc__ = f"Асинхронная версия bot.db.{name}."
+    return call
+
+
+add_subscriber = _db_call("add_subscriber")
+remove_subscriber = _db_call("remove_subscriber")
+get_all_subscribers = _db_call("get_all_subscribers")
+get_active_subscriber_profiles = _db_call("get_active_subscriber_profiles")
+update_is_active = _db_call("update_is_active")
+is_subscriber_active = _db_call("is_subscriber_active")
+update_tier = _db_call("update_tier")
+update_language = _db_call("update_language")
+save_feedback = _db_call("save_feedback")
+get_notified_match_ids = _db_call("get_notified_match_ids")
+get_notified_pairs = _db_call("get_notified_pairs")
+mark_notified_bulk = _db_call("mark_notified_bulk")
+
+
+async def _flush_profiles(waiters: dict[int, list[asyncio.Future]]):
+    try:
+        profiles = await run_db(db.get_subscriber_profiles, list(waiters))
+    except Exception as e:
+        logger.exception(f"❌ Ошибка при пакетном получении профилей: {e}")
+        profiles = {}
+
+    for user_id, futures in waiters.items():
+        profile = profiles.get(user_id, DEFAULT_PROFILE)
+        for future in futures:
+            if not future.done():
+                future.set_result(profile)
+
+
+def _start_flush():
+    global _profile_waiters, _batch_loop
+    waiters, _profile_waiters = _profile_waiters, {}
+    loop, _batch_loop = _batch_loop, None
+    if waiters:
+        logger.debug(f"📦 Пакетный запрос профилей: {len(waiters)} пользователей.")
+        loop.create_task(_flush_profiles(waiters))
+
+
+async def get_subscriber_profile(user_id: int) -> tuple[str, str]:
+    """(tier, язык) пользователя; для неизвестного — ("sa", "en").
+
+    Все вызовы, сделанные до следующего прохода event loop (например, из asyncio.gather),
+    обслуживаются одним запросом к базе.
+    """
+    global _batch_loop
+    loop = asyncio.get_running_loop()
+    if _batch_loop is not loop:
+        # Первый запрос пачки (или прежний цикл уже закрыт) — планируем сброс
+        _profile_waiters.clear()
+        _batch_loop = loop
+        loop.call_soon(_start_flush)
+
+    future = loop.create_future()
+    _profile_waiters.setdefault(user_id, []).append(future)
+    return await future
+
+
+async def get_subscriber_tier(user_id: int) -> str:
+    return (await get_subscriber_profile(user_id))[0]
+
+
+async def get_subscriber_language(user_id: int) -> str:
+    return (await get_subscriber_profile(user_id))[1]
+
+
+async def cleanup_notified_matches(days: Optional[int] = None) -> int:
+    """Удаляет отметки об уведомлениях старше days (по умолчанию NOTIFIED_RETENTION_DAYS) порциями,
+    каждая — отдельной короткой транзакцией в потоке базы, затем возвращает освободившееся место.
+    Между порциями поток базы свободен для остальных запросов. Возвращает число удалённых строк."""
+    days = db.NOTIFIED_RETENTION_DAYS if days is None else days
+    cutoff = int(time.time()) - days * 86400
+    deleted = 0
+    try:
+        while True:
+            chunk = await run_db(db.delete_notified_before, cutoff, db.NOTIFIED_CLEANUP_CHUNK_SIZE)
+            deleted += chunk
+            if chunk < db.NOTIFIED_CLEANUP_CHUNK_SIZE:
+                break
+            await asyncio.sleep(CLEANUP_PAUSE_SECONDS)
+
+        free_pages = await run_db(db.incremental_vacuum)
+        while free_pages:
+            await asyncio.sleep(CLEANUP_PAUSE_SECONDS)
+            remaining = await run_db(db.incremental_vacuum)
+            if remaining >= free_pages:
+                break
+            free_pages = remaining
+    except Exception as e:
+        logger.exception(f"❌ Ошибка при очистке notified_matches: {e}")
+
+    logger.info(f"🧹 Удалено старых записей: {deleted}")
+    return deleted
@@ -0,0 +1,216 @@
+import os
+import time
+import asyncio
+import logging
+import itertools
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from telegram import Bot
+from telegram.error import Forbidden, RetryAfter
+
+from utils.logging_config import setup_logging
+
+# Очередь исходящих сообщений рассылки с учётом лимитов Telegram: общий token bucket
+# (~30 сообщений/с на бота), не чаще раза в PER_CHAT_INTERVAL_SECONDS в один чат, не больше
+# MAX_CONCURRENCY одновременных запросов. Меньший priority обслуживается раньше (старт матча —
+# вперёд дайджестов). RetryAfter приостанавливает всю отправку и возвращает сообщение в очередь.
+GLOBAL_RATE_PER_SECOND = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))
+GLOBAL_BURST = int(os.getenv("TELEGRAM_GLOBAL_BURST", 30))
+PER_CHAT_INTERVAL_SECONDS = float(os.getenv("TELEGRAM_PER_CHAT_INTERVAL_SECONDS", 1))
+MAX_CONCURRENCY = int(os.getenv("TELEGRAM_MAX_CONCURRENCY", 20))
+MAX_RETRY_AFTER_ATTEMPTS = 5
+
+PRIORITY_START = 0
+PRIORITY_DIGEST = 10
+
+# Окно для расчёта текущей скорости отправки
+THROUGHPUT_WINDOW_SECONDS = 10
+
+setup_logging()
+logger = logging.getLogger("notifications")
+
+
+class _TokenBucket:
+    """Token bucket с резервированием: reserve() сразу списывает токен и говорит, сколько
+    подождать до отправки, — ожидающие не соревнуются за один и тот же токен."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class _Job:
+    __slots__ = ("priority", "seq", "bot", "chat_id", "kwargs", "on_forbidden", "future", "attempts")
+
+    def __init__(self, priority, seq, bot, chat_id, kwargs, on_forbidden, future):
+        self.priority = priority
+        self.seq = seq
+        self.bot = bot
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.on_forbidden = on_forbidden
+        self.future = future
+        self.attempts = 0
+
+    def __lt__(self, other: "_Job"):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_queue: Optional[asyncio.PriorityQueue] = None
+_workers: list[asyncio.Task] = []
+_bucket = _TokenBucket(GLOBAL_RATE_PER_SECOND, GLOBAL_BURST)
+_seq = itertools.count()
+# Когда в чат можно отправлять следующее сообщение (loop.time())
+_chat_next: dict[int, float] = {}
+# До какого момента вся отправка стоит после RetryAfter
+_paused_until = 0.0
+
+_counters = {"sent": 0, "failed": 0, "forbidden": 0, "retry_after": 0}
+_sent_times: deque = deque()
+# Неотправленные сообщения (в очереди, отложенные и отправляемые) по приоритетам
+_depth: dict[int, int] = {}
+
+
+def _ensure_workers() -> asyncio.PriorityQueue:
+    """Очередь и воркеры текущего event loop (создаются при первой отправке)."""
+    global _loop, _queue, _workers, _bucket, _paused_until
+    loop = asyncio.get_running_loop()
+    if _loop is not loop:
+        _loop = loop
+        _queue = asyncio.PriorityQueue()
+        _bucket = _TokenBucket(GLOBAL_RATE_PER_SECOND, GLOBAL_BURST)
+        _paused_until = 0.0
+        _chat_next.clear()
+        _depth.clear()
+        _workers = [loop.create_task(_worker()) for _ in range(MAX_CONCURRENCY)]
+        logger.debug(f"📮 Диспетчер рассылки запущен: {MAX_CONCURRENCY} воркеров, {GLOBAL_RATE_PER_SECOND}/с.")
+    return _queue
+
+
+def submit(
+    bot: Bot,
+    chat_id: int,
+    text: str,
+    *,
+    priority: int = PRIORITY_START,
+    on_forbidden: Optional[Callable[[int], Awaitable]] = None,
+    **kwargs,
+) -> asyncio.Future:
+    """Ставит сообщение в очередь. Future завершится True (отправлено) или False."""
+    queue = _ensure_workers()
+    future = _loop.create_future()
+    job = _Job(priority, next(_seq), bot, chat_id, {"text": text, **kwargs}, on_forbidden, future)
+    _depth[priority] = _depth.get(priority, 0) + 1
+    future.add_done_callback(lambda _: _depth.__setitem__(priority, _depth.get(priority, 1) - 1))
+    queue.put_nowait(job)
+    return future
+
+
+def _resolve(job: _Job, sent: bool):
+    if not job.future.done():
+        job.future.set_result(sent)
+
+
+async def send(bot: Bot, chat_id: int, text: str, **kwargs) -> bool:
+    """Отправляет сообщение через очередь и ждёт результата (см. submit)."""
+    return await submit(bot, chat_id, text, **kwargs)
+
+
+def _requeue(job: _Job, delay: float):
+    # Порядковый номер сохраняется — вернувшись, сообщение встанет в начало своей полосы
+    _loop.call_later(delay, _queue.put_nowait, job)
+
+
+async def _worker():
+    while True:
+        job = await _queue.get()
+        try:
+            await _process(job)
+        except Exception as e:
+            logger.exception(f"❌ Ошибка диспетчера при отправке в чат {job.chat_id}: {e}")
+            _resolve(job, False)
+        finally:
+            _queue.task_done()
+
+
+async def _process(job: _Job):
+    global _paused_until
+    if job.future.done():
+        # Отправитель уже не ждёт (отменён)
+        return
+    now = _loop.time()
+    wait = max(_chat_next.get(job.chat_id, 0.0), _paused_until) - now
+    if wait > 0:
+        _requeue(job, wait)
+        return
+    _chat_next[job.chat_id] = now + PER_CHAT_INTERVAL_SECONDS
+
+    delay = _bucket.reserve()
+    if delay > 0:
+        await asyncio.sleep(delay)
+
+    try:
+        await job.bot.send_message(chat_id=job.chat_id, **job.kwargs)
+    except RetryAfter as e:
+        _counters["retry_after"] += 1
+        job.attempts += 1
+        retry_after = float(e.retry_after)
+        _paused_until = max(_paused_until, _loop.time() + retry_after)
+        if job.attempts >= MAX_RETRY_AFTER_ATTEMPTS:
+            logger.warning(f"⚠️ Чат {job.chat_id}: RetryAfter {job.attempts} раз подряд, сообщение отброшено.")
+            _counters["failed"] += 1
+            _resolve(job, False)
+            return
+        logger.warning(f"⏳ RetryAfter {retry_after:.0f} с: отправка приостановлена, чат {job.chat_id} вернётся в очередь.")
+        _requeue(job, retry_after)
+        return
+    except Forbidden:
+        _counters["forbidden"] += 1
+        logger.warning(f"🚫 Пользователь {job.chat_id} заблокировал бота.")
+        _resolve(job, False)
+        if job.on_forbidden is not None:
+            await job.on_forbidden(job.chat_id)
+        return
+    except Exception as e:
+        _counters["failed"] += 1
+        logger.warning(f"⚠️ Ошибка при отправке пользователю {job.chat_id}: {e}")
+        _resolve(job, False)
+        return
+
+    _counters["sent"] += 1
+    _sent_times.append(time.monotonic())
+    _resolve(job, True)
+    _prune_chats(now)
+
+
+def _prune_chats(now: float):
+    # Паузы чатов нужны только пока не истекли; не даём словарю расти на миллионах чатов
+    if len(_chat_next) > 10000:
+        for chat_id in [chat_id for chat_id, ready in _chat_next.items() if ready <= now]:
+            del _chat_next[chat_id]
+
+
+def stats() -> dict:
+    """Счётчики отправки, текущая скорость (сообщений/с) и глубина очереди по приоритетам."""
+    cutoff = time.monotonic() - THROUGHPUT_WINDOW_SECONDS
+    while _sent_times and _sent_times[0] < cutoff:
+        _sent_times.popleft()
+
+    by_priority = {priority: count for priority, count in _depth.items() if count}
+    return {
+        **_counters,
+        "rate_per_second": round(len(_sent_times) / THROUGHPUT_WINDOW_SECONDS, 2),
+        "queued": sum(by_priority.values()),
+        "queued_by_priority": by_priority,
+    }
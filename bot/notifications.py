@@ -1,20 +1,19 @@
 import os
+import signal
 import asyncio
 import logging
 from datetime import datetime, timezone
 from telegram import Bot
-from telegram.error import Forbidden
 from dotenv import load_dotenv
 
-from bot.db import (
-    get_all_subscribers,
-    get_notified_match_ids,
-    mark_notified_bulk,
+from bot.db_async import (
+    cleanup_notified_matches,
+    get_active_subscriber_profiles,
+    get_notified_pairs,
     update_is_active,
-    get_subscriber_tier,
-    get_subscriber_language,
 )
-from utils.matches_cache_reader import get_matches
+from bot import dispatcher, notify_buffer
+from utils.matches_cache_reader import matches_between, subscribe_to_updates
 from utils.logging_config import setup_logging
 from utils.form_match_card import build_match_card
 from utils.translations import t
@@ -28,21 +27,38 @@ logger.setLevel(logging.DEBUG if os.getenv("DEV_MODE") == "true" else logging.IN
 
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 INTERVAL = int(os.getenv("NOTIFY_INTERVAL_SECONDS", 60))
+# Окно уведомления: ±5 минут от начала матча
+NOTIFY_WINDOW_SECONDS = 5 * 60
+# Матчи с этими статусами в окне не уведомляются
+SKIP_STATUSES = {"finished", "canceled"}
+# Как часто удалять устаревшие отметки об уведомлениях
+CLEANUP_INTERVAL_SECONDS = int(os.getenv("NOTIFIED_CLEANUP_INTERVAL_SECONDS", 3600))
 bot = Bot(token=TELEGRAM_BOT_TOKEN)
 
 
 # --- Рассылка уведомления ---
-async def send(user_id, match_id, match_name, message, keyboard, successful_notifications):
-    try:
-        await bot.send_message(chat_id=user_id, text=message, parse_mode="HTML", reply_markup=keyboard)
+async def deactivate_user(user_id):
+    logger.warning(f"🚫 Пользователь {user_id} заблокировал бота. Помечаем как неактивного.")
+    await update_is_active(user_id, False)
+
+
+async def send(user_id, match_id, match_name, message, keyboard) -> bool:
+    # Через диспетчер: общий лимит Telegram, пауза на чат, повтор после RetryAfter
+    sent = await dispatcher.send(
+        bot,
+        user_id,
+        message,
+        priority=dispatcher.PRIORITY_START,
+        on_forbidden=deactivate_user,
+        parse_mode="HTML",
+        reply_markup=keyboard,
+    )
+    if sent:
         logger.info(f"✅ Уведомление отправлено: {user_id} -> {match_name} ({match_id})")
-        successful_notifications.append((user_id, match_id))
+        # Сразу в буфер: следующая проверка уже считает пару отправленной, запись в базу — пачкой
+        notify_buffer.record(user_id, match_id)
         logger.debug(f"📝 Добавлено к записи: {user_id} -> матч {match_id}")
-    except Forbidden:
-        logger.warning(f"🚫 Пользователь {user_id} заблокировал бота. Помечаем как неактивного.")
-        update_is_active(user_id, False)
-    except Exception as e:
-        logger.warning(f"⚠️ Ошибка при отправке пользователю {user_id}: {e}")
+    return sent
 
 
 # --- Основная логика уведомлений ---
@@ -50,101 +66,80 @@ async def notify_upcoming_matches():
     try:
         logger.debug("🔍 Запуск проверки матчей...")
 
-        subscribers = get_all_subscribers() or []
-        logger.debug(f"👥 Найдено подписчиков: {len(subscribers)}")
+        now = datetime.now(timezone.utc).timestamp()
 
-        # Группируем пользователей по tier
-        tier_by_user = {
-            user_id: get_subscriber_tier(user_id) or "all"
-            for user_id in subscribers
+        # Матчи, начинающиеся в окне уведомления (поиск по индексу begin_ts)
+        matches_by_tier = {
+            tier: [
+                match for match in matches_between(now - NOTIFY_WINDOW_SECONDS, now + NOTIFY_WINDOW_SECONDS, tier=tier)
+                if match.status not in SKIP_STATUSES
+            ]
+            for tier in ("sa", "all")
         }
+        window_match_ids = sorted({match.id for matches in matches_by_tier.values() for match in matches})
+        if not window_match_ids:
+            logger.debug("⏭ В окне уведомления нет матчей")
+            return
+
+        # Весь тик — два запроса к базе: профили активных подписчиков и уже отправленные пары по матчам окна
+        profiles = await get_active_subscriber_profiles()
+        logger.debug(f"👥 Найдено подписчиков: {len(profiles)}")
 
         subs_by_tier = {"sa": [], "all": []}
-        for user_id, tier in tier_by_user.items():
+        lang_by_user = {}
+        for user_id, tier, lang in profiles:
             tier = tier if tier in ["sa", "all"] else "all"
             subs_by_tier[tier].append(user_id)
+            lang_by_user[user_id] = lang
 
         logger.debug(f"S/A: {len(subs_by_tier['sa'])}, ALL: {len(subs_by_tier['all'])}")
 
-        # Уже уведомлённые пользователи
-        notified_ids_by_user = {
-            user_id: set(get_notified_match_ids(user_id))
-            for user_id in subscribers
-        }
-
-        now = datetime.now(timezone.utc)
-
-        # Загружаем матчи из кэша
-        matches_by_tier = {
-            "sa": get_matches(status="upcoming", tier="sa", limit=20),
-            "all": get_matches(status="upcoming", tier="all", limit=20),
-        }
+        # Уже уведомлённые пары (user_id, match_id): записанные в базу и ещё ждущие в буфере
+        notified_pairs = await get_notified_pairs(window_match_ids)
+        notified_pairs |= notify_buffer.pending_pairs(window_match_ids)
 
-        successful_notifications = []
+        # Все отправки тика ставятся в очередь диспетчера разом, он сам выдерживает лимиты
+        tasks = []
 
         # Проходим по матчам для каждого tier
         for tier, matches in matches_by_tier.items():
             for match in matches:
-                match_id = match.get("id")
-                begin_at = match.get("begin_at")
-
-                if not begin_at:
-                    logger.warning(f"⚠️ Нет begin_at у матча {match_id}")
-                    continue
-
-                # Определяем время старта матча
-                try:
-                    start_time = datetime.fromisoformat(begin_at.replace("Z", "+00:00"))
-                except Exception as e:
-                    logger.warning(f"❌ Ошибка разбора времени: {e}")
-                    continue
-
-                # Считаем минуты до начала
-                minutes_to_start = (start_time - now).total_seconds() / 60
-
-                # Проверка окна уведомлений (-5/+5 минут от начала)
-                if -5 <= minutes_to_start <= 5:
-                    match_name = match.get("name", "?")
-
-                    tasks = []
-
-                    # Отправляем уведомления каждому пользователю
-                    for user_id in subs_by_tier.get(tier, []):
-                        if match_id in notified_ids_by_user.get(user_id, set()):
-                            logger.debug(f"🔁 Уже уведомлён: {user_id} -> матч {match_id}")
-                            continue
-
-                        # Получаем язык пользователя
-                        lang = get_subscriber_language(user_id)
-
-                        # Логируем наличие stream_url
-                        stream_url = match.get("stream_url")
-                        if stream_url:
-                            logger.debug(f"🎥 Матч {match_id}: stream_url найден -> {stream_url}")
-                        else:
-                            logger.debug(f"🚫 Матч {match_id}: stream_url отсутствует")
-
-                        # Формируем сообщение с кнопкой
-                        message, keyboard = build_match_card(
-                            match,
-                            stream_button=True,
-                            lang=lang
-                        )
-
-                        prefix = t("prefix_starting", lang)
-                        final_message = prefix + message
-
-                        tasks.append(send(user_id, match_id, match_name, final_message, keyboard, successful_notifications))
-
-                    # Выполняем все отправки
-                    await asyncio.gather(*tasks)
-
-                    # Отмечаем уведомления в базе
-                    if successful_notifications:
-                        logger.info(f"💾 Отмечено {len(successful_notifications)} уведомлений в базе.")
-                        mark_notified_bulk(successful_notifications)
+                match_id = match.id
+                match_name = match.name or "?"
+
+                # Логируем наличие stream_url
+                stream_url = match.stream_url
+                if stream_url:
+                    logger.debug(f"🎥 Матч {match_id}: stream_url найден -> {stream_url}")
                 else:
-                    logger.debug(f"⏭ Матч {match_id} не попадает в окно уведомления")
+                    logger.debug(f"🚫 Матч {match_id}: stream_url отсутствует")
+
+                # Готовое сообщение с кнопкой — одно на язык, а не на пользователя
+                cards = {}
+
+                # Отправляем уведомления каждому пользователю
+                for user_id in subs_by_tier.get(tier, []):
+                    if (user_id, match_id) in notified_pairs:
+                        logger.debug(f"🔁 Уже уведомлён: {user_id} -> матч {match_id}")
+                        continue
+
+                    lang = lang_by_user.get(user_id, "en")
+                    if lang not in cards:
+                        message, keyboard = build_match_card(match, stream_button=True, lang=lang)
+                        cards[lang] = (t("prefix_starting", lang) + message, keyboard)
+                    final_message, keyboard = cards[lang]
+
+                    tasks.append(send(user_id, match_id, match_name, final_message, keyboard))
+
+        # Выполняем все отправки
+        if tasks:
+            sent = sum(await asyncio.gather(*tasks))
+            stats = dispatcher.stats()
+            logger.info(
+                f"📊 Отправлено {sent} из {len(tasks)} уведомлений; "
+                f"диспетчер: {stats['rate_per_second']}/с, в очереди {stats['queued']}, "
+                f"RetryAfter {stats['retry_after']}, ошибок {stats['failed']}"
+            )
 
     except Exception as e:
         logger.exception(f"🔥 Ошибка в notify_upcoming_matches: {e}")
@@ -152,10 +147,48 @@ async def notify_upcoming_matches():
 
 # --- Циклический запуск ---
 async def main():
-    while True:
-        await notify_upcoming_matches()
-        await asyncio.sleep(INTERVAL)
+    # Новое поколение кэша будит цикл сразу, не дожидаясь конца интервала
+    cache_updated = asyncio.Event()
+    subscribe_to_updates("notifications", lambda message: cache_updated.set())
+
+    # Очистка идёт фоновой задачей рядом с рассылкой, а не отдельным процессом
+    cleanup_task = None
+    last_cleanup = float("-inf")
+
+    try:
+        while True:
+            cache_updated.clear()
+            now = asyncio.get_running_loop().time()
+            if now - last_cleanup >= CLEANUP_INTERVAL_SECONDS and (cleanup_task is None or cleanup_task.done()):
+                cleanup_task = asyncio.create_task(cleanup_notified_matches())
+                last_cleanup = now
+
+            await notify_upcoming_matches()
+            try:
+                await asyncio.wait_for(cache_updated.wait(), timeout=INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        # Остановка (SIGTERM от supervisor, Ctrl+C): дописываем буфер отметок в базу
+        if notify_buffer.pending_count():
+            logger.info(f"💾 Остановка: записываем буфер уведомлений ({notify_buffer.pending_count()} пар)...")
+        await notify_buffer.flush()
+
+
+def _run():
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(main())
+    # SIGTERM отменяет main(), чтобы отработал finally с записью буфера
+    loop.add_signal_handler(signal.SIGTERM, task.cancel)
+    try:
+        loop.run_until_complete(task)
+    except (asyncio.CancelledError, KeyboardInterrupt):
+        if not task.done():
+            task.cancel()
+            loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+    finally:
+        loop.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    _run()
\ No newline at end of file
@@ -0,0 +1,103 @@
+import os
+import asyncio
+import logging
+from typing import Iterable, Optional
+
+from bot.db_async import mark_notified_bulk
+from utils.logging_config import setup_logging
+
+# Буфер отметок об отправленных уведомлениях (write-behind): отправка не ждёт записи в базу,
+# пары копятся и записываются одной транзакцией — как только набралось NOTIFY_BUFFER_FLUSH_SIZE
+# или прошло NOTIFY_BUFFER_FLUSH_SECONDS с первой незаписанной. Пока пара не записана, проверка
+# "уже уведомлён" учитывает её через pending_pairs. При остановке процесса — flush().
+FLUSH_SIZE = int(os.getenv("NOTIFY_BUFFER_FLUSH_SIZE", 500))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("NOTIFY_BUFFER_FLUSH_SECONDS", 1))
+
+setup_logging()
+logger = logging.getLogger("notifications")
+
+# Ещё не записанные пары и пары, запись которых идёт прямо сейчас
+_pending: dict[tuple[int, int], None] = {}
+_in_flight: set[tuple[int, int]] = set()
+_flush_tasks: set[asyncio.Task] = set()
+_timer: Optional[asyncio.TimerHandle] = None
+_timer_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def record(user_id: int, match_id: int):
+    """Отмечает отправленное уведомление; запись в базу — в ближайшем сбросе буфера."""
+    _pending[(user_id, match_id)] = None
+    if len(_pending) >= FLUSH_SIZE:
+        _start_flush()
+    else:
+        _schedule_flush()
+
+
+def _schedule_flush():
+    global _timer, _timer_loop
+    loop = asyncio.get_running_loop()
+    if _timer is None or _timer_loop is not loop:
+        # Первая пара пачки (или таймер остался от прежнего цикла) — планируем сброс по времени
+        _timer, _timer_loop = loop.call_later(FLUSH_INTERVAL_SECONDS, _start_flush), loop
+
+
+def pending_pairs(match_ids: Iterable[int]) -> set[tuple[int, int]]:
+    """Пары (user_id, match_id) по этим матчам, которые отправлены, но ещё не записаны в базу."""
+    match_ids = set(match_ids)
+    return {pair for pair in (*_pending, *_in_flight) if pair[1] in match_ids}
+
+
+def pending_count() -> int:
+    return len(_pending) + len(_in_flight)
+
+
+def _start_flush():
+    global _timer
+    if _timer is not None:
+        _timer.cancel()
+        _timer = None
+    if _pending:
+        task = asyncio.get_running_loop().create_task(_write(_take_batch()))
+        _flush_tasks.add(task)
+        task.add_done_callback(_flush_tasks.discard)
+
+
+def _take_batch() -> list[tuple[int, int]]:
+    # Синхронно, чтобы пары, добавленные до начала записи, попали уже в следующую пачку
+    batch = list(_pending)
+    _pending.clear()
+    _in_flight.update(batch)
+    return batch
+
+
+async def _write(batch: list[tuple[int, int]]) -> int:
+    try:
+        written = await mark_notified_bulk(batch)
+    except Exception as e:
+        logger.exception(f"❌ Ошибка при записи буфера уведомлений: {e}")
+        written = False
+    finally:
+        _in_flight.difference_update(batch)
+
+    if written is False:
+        # Вернём пары в буфер: повторим при следующем сбросе, а до тех пор они защищают от дублей
+        for pair in batch:
+            _pending[pair] = None
+        logger.warning(f"⚠️ Буфер уведомлений не записан ({len(batch)} пар), повторим позже.")
+        _schedule_flush()
+        return 0
+
+    logger.debug(f"💾 Буфер уведомлений записан: {len(batch)} пар.")
+    return len(batch)
+
+
+async def flush() -> int:
+    """Записывает всё накопленное и дожидается уже идущих записей (вызывается при остановке).
+    Возвращает число записанных этим вызовом пар."""
+    global _timer
+    if _timer is not None:
+        _timer.cancel()
+        _timer = None
+    if _flush_tasks:
+        await asyncio.gather(*_flush_tasks, return_exceptions=True)
+    return await _write(_take_batch()) if _pending else 0
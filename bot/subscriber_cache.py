@@ -0,0 +1,146 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from utils.logging_config import setup_logging
+
+# Кэш профилей подписчиков (tier, язык, активность) в памяти процесса перед bot.db.
+# Ограничен по размеру (LRU). Свои записи обновляют его сразу (write-through), а изменения из
+# других процессов (бот <-> уведомления) приходят через таблицу subscriber_changes, которую
+# заполняют триггеры на subscribers; она опрашивается не чаще раза в SUBSCRIBER_CACHE_POLL_SECONDS.
+SUBSCRIBER_CACHE_SIZE = int(os.getenv("SUBSCRIBER_CACHE_SIZE", 10000))
+SUBSCRIBER_CACHE_POLL_SECONDS = float(os.getenv("SUBSCRIBER_CACHE_POLL_SECONDS", 2))
+
+# Сколько хранить журнал изменений (процесс, отставший сильнее, сбрасывает кэш целиком)
+CHANGES_RETENTION_SECONDS = 3600
+CHANGES_PRUNE_EVERY_SECONDS = 600
+
+setup_logging()
+logger = logging.getLogger("db")
+
+
+class SubscriberProfile(NamedTuple):
+    tier: str
+    language: str
+    is_active: bool
+
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS subscriber_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        changed_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+    );
+    CREATE TRIGGER IF NOT EXISTS trg_subscribers_insert AFTER INSERT ON subscribers
+    BEGIN
+        INSERT INTO subscriber_changes (user_id) VALUES (NEW.user_id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_subscribers_update AFTER UPDATE ON subscribers
+    BEGIN
+        INSERT INTO subscriber_changes (user_id) VALUES (NEW.user_id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS trg_subscribers_delete AFTER DELETE ON subscribers
+    BEGIN
+        INSERT INTO subscriber_changes (user_id) VALUES (OLD.user_id);
+    END;
+"""
+
+_lock = threading.Lock()
+# None в кэше — пользователя нет в базе (тоже кэшируется, чтобы не спрашивать повторно)
+_profiles: "OrderedDict[int, Optional[SubscriberProfile]]" = OrderedDict()
+_db_path: Optional[str] = None
+_last_seq: Optional[int] = None
+_last_poll = 0.0
+_last_prune = 0.0
+
+
+def reset(db_path: Optional[str] = None):
+    global _db_path, _last_seq, _last_poll
+    with _lock:
+        _profiles.clear()
+        _db_path = db_path
+        _last_seq = None
+        _last_poll = 0.0
+
+
+def sync(conn: sqlite3.Connection, db_path: str) -> bool:
+    """Применяет изменения, сделанные другими процессами. False — кэш использовать нельзя
+    (например, в базе ещё нет таблицы изменений), читать надо напрямую."""
+    global _last_seq, _last_poll, _last_prune
+    if db_path != _db_path:
+        logger.debug(f"🔄 Кэш профилей сброшен: база сменилась на {db_path}")
+        reset(db_path)
+
+    now = time.monotonic()
+    if _last_seq is not None and now - _last_poll < SUBSCRIBER_CACHE_POLL_SECONDS:
+        return True
+
+    try:
+        if _last_seq is None:
+            changed, max_seq = [], conn.execute("SELECT COALESCE(MAX(seq), 0) FROM subscriber_changes").fetchone()[0]
+        else:
+            oldest = conn.execute("SELECT MIN(seq) FROM subscriber_changes").fetchone()[0]
+            if oldest is not None and oldest > _last_seq + 1:
+                # Пропущенные изменения уже удалены — доверять кэшу нельзя
+                reset(db_path)
+                return sync(conn, db_path)
+            rows = conn.execute(
+                "SELECT seq, user_id FROM subscriber_changes WHERE seq > ? ORDER BY seq", (_last_seq,)
+            ).fetchall()
+            changed = [user_id for _, user_id in rows]
+            max_seq = rows[-1][0] if rows else _last_seq
+
+        if now - _last_prune > CHANGES_PRUNE_EVERY_SECONDS:
+            with conn:
+                conn.execute(
+                    "DELETE FROM subscriber_changes WHERE changed_at < ?",
+                    (int(time.time()) - CHANGES_RETENTION_SECONDS,),
+                )
+            _last_prune = now
+    except sqlite3.Error as e:
+        if _last_seq is not None or _last_poll == 0.0:
+            logger.warning(f"⚠️ Кэш профилей недоступен, читаем из базы напрямую: {e}")
+        reset(db_path)
+        _last_poll = -1.0
+        return False
+
+    with _lock:
+        for user_id in changed:
+            _profiles.pop(user_id, None)
+        _last_seq = max_seq
+        _last_poll = now
+    if changed:
+        logger.debug(f"🔄 Кэш профилей: изменения по {len(set(changed))} пользователям")
+    return True
+
+
+def get(user_id: int):
+    """Профиль из кэша; (True, profile|None) при попадании, (False, None) при промахе."""
+    with _lock:
+        if user_id in _profiles:
+            _profiles.move_to_end(user_id)
+            return True, _profiles[user_id]
+    return False, None
+
+
+def put(user_id: int, profile: Optional[SubscriberProfile]):
+    with _lock:
+        _profiles[user_id] = profile
+        _profiles.move_to_end(user_id)
+        while len(_profiles) > SUBSCRIBER_CACHE_SIZE:
+            _profiles.popitem(last=False)
+
+
+def update(user_id: int, **fields):
+    """Write-through: меняет поля закэшированного профиля. Если профиля нет (или пользователь
+    ещё не существовал) — просто выбрасывает запись, следующее чтение возьмёт её из базы."""
+    with _lock:
+        profile = _profiles.get(user_id)
+        if profile is None:
+            _profiles.pop(user_id, None)
+        else:
+            _profiles[user_id] = profile._replace(**fields)
@@ -0,0 +1,96 @@
+import os
+import shutil
+import asyncio
+import socket
+
+import pytest
+
+from utils import cache_notify
+from utils.cache_notify import CacheSubscriber, get_notify_dir, publish, summarize_changes
+
+
+@pytest.fixture(autouse=True)
+def notify_dir(tmp_path, monkeypatch):
+    path = tmp_path / "run" / "notify"
+    monkeypatch.setattr(cache_notify, "NOTIFY_DIR", str(path))
+    return path
+
+
+def test_summarize_changes():
+    old = [{"id": 1, "status": "not_started"}, {"id": 2, "status": "running"}]
+    new = [{"id": 1, "status": "running"}, {"id": 3, "status": "not_started"}]
+
+    summary = summarize_changes(old, new)
+    assert summary["added"] == [3]
+    assert summary["removed"] == [2]
+    assert summary["changed"] == [1]
+    assert summary["total"] == 2
+
+
+async def test_publish_reaches_subscriber(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(tmp_path / "cache"))
+    received = asyncio.Queue()
+    subscriber = CacheSubscriber("test", received.put_nowait).start()
+    try:
+        assert publish(7, {"total": 3}) == 1
+        message = await asyncio.wait_for(received.get(), timeout=1)
+        assert message == {"generation": 7, "summary": {"total": 3}}
+    finally:
+        subscriber.stop()
+    assert not os.path.exists(subscriber.path)
+
+
+async def test_clearing_cache_keeps_subscriber_sockets(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(cache_dir))
+    received = asyncio.Queue()
+    subscriber = CacheSubscriber("test", received.put_nowait).start()
+    try:
+        # make refresh-cache: rm -rf cache/*
+        cache_dir.mkdir(exist_ok=True)
+        shutil.rmtree(cache_dir)
+        assert publish(8) == 1
+        assert (await asyncio.wait_for(received.get(), timeout=1))["generation"] == 8
+    finally:
+        subscriber.stop()
+
+
+def test_publish_removes_dead_sockets(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(tmp_path))
+    os.makedirs(get_notify_dir())
+    dead_path = os.path.join(get_notify_dir(), "dead-1.sock")
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(dead_path)
+    sock.close()
+
+    assert publish(1) == 0
+    assert not os.path.exists(dead_path)
+
+
+async def test_cacher_publishes_new_generation(tmp_path, monkeypatch):
+    import utils.matches_cache_reader as reader
+    from utils.match_cacher import save_matches
+
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(reader, "_push_enabled", False)
+    received = asyncio.Queue()
+    subscriber = reader.subscribe_to_updates("test", received.put_nowait)
+    try:
+        matches = [{"id": 1, "status": "not_started", "begin_at": "2030-01-01T00:00:00Z"}]
+        assert save_matches(matches, None) == 1
+        first = await asyncio.wait_for(received.get(), timeout=1)
+        assert first["generation"] == 1
+        assert first["summary"]["added"] == [1]
+        assert reader.get_snapshot().generation == 1
+
+        # Без изменений поколение не растёт и уведомление не отправляется
+        assert save_matches(matches, None) is None
+
+        matches = [{**matches[0], "status": "running"}]
+        assert save_matches(matches, None) == 2
+        second = await asyncio.wait_for(received.get(), timeout=1)
+        assert second["summary"]["changed"] == [1]
+        assert reader.get_snapshot().generation == 2
+        assert received.empty()
+    finally:
+        subscriber.stop()
@@ -33,7 +33,7 @@ def test_get_cache_last_modified(tmp_path, monkeypatch):
     name = "test_modified"
     data = {"tournaments": [{"id": 100, "name": "Test Tournament"}]}
 
-    write_json_to_cache(name, data)
+    write_json_to_cache(name, data, formats=("json",))
 
     mtime = get_cache_last_modified(name)
     assert isinstance(mtime, datetime)
@@ -57,4 +57,106 @@ def test_overwrite_existing_cache(tmp_path, monkeypatch):
     write_json_to_cache(name, {"matches": [{"id": 2}]})
 
     result = read_json_from_cache(name)
-    assert result["matches"][0]["id"] == 2
\ No newline at end of file
+    assert result["matches"][0]["id"] == 2
+
+def test_unchanged_content_is_not_rewritten(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(cache_dir))
+
+    name = "test_unchanged"
+    assert write_json_to_cache(name, {"matches": [{"id": 1}], "updated_at": "2025-01-01T00:00:00"}, formats=("json",))
+    mtime_before = os.stat(cache_dir / f"{name}.json").st_mtime_ns
+
+    # Отличается только updated_at — содержимое то же, файл не трогаем
+    assert not write_json_to_cache(name, {"matches": [{"id": 1}], "updated_at": "2025-01-01T00:10:00"}, formats=("json",))
+    assert os.stat(cache_dir / f"{name}.json").st_mtime_ns == mtime_before
+
+    assert write_json_to_cache(name, {"matches": [{"id": 2}], "updated_at": "2025-01-01T00:20:00"}, formats=("json",))
+    assert read_json_from_cache(name)["matches"][0]["id"] == 2
+
+
+def test_read_reuses_parsed_data_until_file_changes(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(cache_dir))
+
+    name = "test_parsed_cache"
+    write_json_to_cache(name, {"matches": [{"id": 1}]})
+    first = read_json_from_cache(name)
+    assert read_json_from_cache(name) is first
+
+    write_json_to_cache(name, {"matches": [{"id": 2}]})
+    second = read_json_from_cache(name)
+    assert second is not first
+    assert second["matches"][0]["id"] == 2
+
+
+def test_binary_format_round_trip_and_detection(tmp_path, monkeypatch):
+    from utils.cache_writer import BINARY_MAGIC, decode_cache, encode_cache
+
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(cache_dir))
+
+    data = {"matches": [{"id": 1, "name": "Матч", "begin_ts": 123, "opponents": []}], "updated_at": None}
+    raw = encode_cache(data, "bin")
+    assert raw.startswith(BINARY_MAGIC)
+    assert decode_cache(raw) == data
+    assert decode_cache(encode_cache(data, "json")) == data
+
+    write_json_to_cache("test_bin", data, formats=("bin",))
+    assert (cache_dir / "test_bin.bin").exists()
+    assert not (cache_dir / "test_bin.json").exists()
+    assert read_json_from_cache("test_bin") == data
+
+
+def test_reader_prefers_newest_format(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(cache_dir))
+
+    write_json_to_cache("test_both", {"matches": [{"id": 1}]}, formats=("bin",))
+    time.sleep(0.01)
+    write_json_to_cache("test_both", {"matches": [{"id": 2}]}, formats=("json",))
+    assert read_json_from_cache("test_both")["matches"][0]["id"] == 2
+
+
+def test_unsupported_binary_version_is_rejected(tmp_path, monkeypatch):
+    import struct
+    from utils.cache_writer import BINARY_MAGIC
+
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(cache_dir))
+    (cache_dir / "test_future.bin").write_bytes(struct.pack("<4sH", BINARY_MAGIC, 99) + b"\x00")
+
+    assert read_json_from_cache("test_future") == {"matches": [], "updated_at": None}
+
+    # Рядом есть json (миграция/откат) — читатель берёт его, а не отдаёт пустой кэш
+    write_json_to_cache("test_future", {"matches": [{"id": 1}]}, formats=("json",))
+    os.utime(cache_dir / "test_future.bin")
+    assert read_json_from_cache("test_future")["matches"] == [{"id": 1}]
+
+    # Исправный bin снова свежее — читается он
+    write_json_to_cache("test_future", {"matches": [{"id": 2}]}, formats=("bin",))
+    assert read_json_from_cache("test_future")["matches"] == [{"id": 2}]
+
+
+def test_fsync_policy(tmp_path, monkeypatch):
+    import utils.cache_writer as cache_writer
+
+    monkeypatch.setattr(cache_writer, "CACHE_DIR", str(tmp_path))
+    synced = []
+    real_fsync = os.fsync
+    monkeypatch.setattr(cache_writer.os, "fsync", lambda fd: synced.append(fd) or real_fsync(fd))
+
+    monkeypatch.setattr(cache_writer, "CACHE_FSYNC", False)
+    write_json_to_cache("nosync", {"matches": []}, formats=("json",))
+    assert synced == []
+
+    monkeypatch.setattr(cache_writer, "CACHE_FSYNC", True)
+    write_json_to_cache("sync", {"matches": []}, formats=("json",))
+    # Временный файл и каталог
+    assert len(synced) == 2
+    assert not os.path.exists(cache_writer.get_cache_path("sync") + ".tmp")
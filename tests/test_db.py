@@ -79,4 +79,85 @@ def test_save_feedback(temp_db_path):
     user_id = 1011
     db.add_subscriber(user_id)
     db.save_feedback(user_id, "This is a test feedback.")
-    # Нет функции get_feedback — можно просто проверить что ошибок не возникло
\ No newline at end of file
+    # Нет функции get_feedback — можно просто проверить что ошибок не возникло
+
+def test_connection_is_reused_with_wal(temp_db_path):
+    conn = db.get_connection()
+    assert db.get_connection() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == int(db.BUSY_TIMEOUT_SECONDS * 1000)
+
+def test_connection_follows_db_path(temp_db_path, monkeypatch, tmp_path):
+    conn = db.get_connection()
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "other.db"))
+    db.init_db()
+    assert db.get_connection() is not conn
+    assert db.get_all_subscribers() == []
+
+def test_connection_per_thread(temp_db_path):
+    import threading
+
+    connections = []
+    thread = threading.Thread(target=lambda: connections.append(db.get_connection()))
+    thread.start()
+    thread.join()
+    assert connections[0] is not db.get_connection()
+
+def test_get_active_subscriber_profiles(temp_db_path):
+    db.add_subscriber(1012, tier="all", language="pt")
+    db.add_subscriber(1013, tier="sa")
+    db.update_is_active(1013, False)
+    assert db.get_active_subscriber_profiles() == [(1012, "all", "pt")]
+
+def test_get_notified_pairs_only_for_requested_matches(temp_db_path):
+    db.mark_notified_bulk([(1014, 1), (1015, 1), (1014, 2), (1014, 3)])
+    assert db.get_notified_pairs([1, 2]) == {(1014, 1), (1015, 1), (1014, 2)}
+    assert db.get_notified_pairs([]) == set()
+
+def test_notified_matches_schema(temp_db_path):
+    conn = db.get_connection()
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == db.SCHEMA_VERSION
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'notified_matches'").fetchone()[0]
+    assert "WITHOUT ROWID" in sql
+    plan = " ".join(row[-1] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT match_id, user_id FROM notified_matches WHERE notified_at < 0"
+    ))
+    assert "idx_notified_at" in plan
+
+def test_migrates_old_notified_matches(monkeypatch, tmp_path):
+    path = str(tmp_path / "old.db")
+    old = sqlite3.connect(path)
+    old.executescript("""
+        CREATE TABLE notified_matches (
+            user_id INTEGER NOT NULL,
+            match_id INTEGER NOT NULL,
+            notified_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (user_id, match_id)
+        );
+        CREATE INDEX idx_user_match ON notified_matches(user_id, match_id);
+        INSERT INTO notified_matches VALUES (1, 10, '2020-01-01 00:00:00'), (2, 10, CURRENT_TIMESTAMP);
+    """)
+    old.close()
+
+    monkeypatch.setattr(db, "DB_PATH", path)
+    db.init_db()
+    db.init_db()
+
+    assert db.get_notified_pairs([10]) == {(1, 10), (2, 10)}
+    assert db.get_notified_match_ids(2) == {10}
+    assert db.get_notified_match_ids(1) == set()
+    conn = db.get_connection()
+    assert conn.execute("SELECT notified_at FROM notified_matches WHERE user_id = 1").fetchone()[0] == 1577836800
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_user_match'").fetchone() is None
+    db.close_connection()
+
+def test_delete_notified_before_in_chunks(temp_db_path):
+    db.mark_notified_bulk([(user_id, 20) for user_id in range(5)] + [(1, 21)])
+    with db.get_connection() as conn:
+        conn.execute("UPDATE notified_matches SET notified_at = 100 WHERE match_id = 20")
+
+    assert db.delete_notified_before(1000, limit=3) == 3
+    assert db.delete_notified_before(1000, limit=3) == 2
+    assert db.delete_notified_before(1000, limit=3) == 0
+    assert db.get_notified_pairs([20, 21]) == {(1, 21)}
@@ -0,0 +1,79 @@
+import os
+import asyncio
+import tempfile
+import threading
+
+import pytest
+
+from bot import db, db_async
+
+
+@pytest.fixture
+def temp_db_path(monkeypatch):
+    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    temp_file.close()
+    monkeypatch.setattr(db, "DB_PATH", temp_file.name)
+    db.init_db()
+    yield temp_file.name
+    os.remove(temp_file.name)
+
+
+@pytest.mark.asyncio
+async def test_calls_run_in_db_thread(temp_db_path, monkeypatch):
+    threads = []
+    real_add = db.add_subscriber
+
+    def add(*args, **kwargs):
+        threads.append(threading.current_thread().name)
+        return real_add(*args, **kwargs)
+
+    monkeypatch.setattr(db, "add_subscriber", add)
+    await db_async.add_subscriber(2001, tier="all")
+
+    assert threads[0].startswith("db")
+    assert 2001 in await db_async.get_all_subscribers()
+
+
+@pytest.mark.asyncio
+async def test_profile_lookups_are_batched(temp_db_path, monkeypatch):
+    db.add_subscriber(2002, tier="all", language="pt")
+    db.add_subscriber(2003, tier="sa", language="ru")
+
+    batches = []
+    real_profiles = db.get_subscriber_profiles
+    monkeypatch.setattr(db, "get_subscriber_profiles", lambda ids: batches.append(sorted(ids)) or real_profiles(ids))
+
+    profiles = await asyncio.gather(
+        db_async.get_subscriber_profile(2002),
+        db_async.get_subscriber_tier(2003),
+        db_async.get_subscriber_language(2003),
+        db_async.get_subscriber_profile(9999),
+    )
+
+    assert profiles == [("all", "pt"), "sa", "ru", ("sa", "en")]
+    assert batches == [[2002, 2003, 9999]]
+
+
+@pytest.mark.asyncio
+async def test_sequential_lookups_are_separate_batches(temp_db_path):
+    db.add_subscriber(2004, tier="all", language="pt")
+    assert await db_async.get_subscriber_language(2004) == "pt"
+    await db_async.update_language(2004, "ru")
+    assert await db_async.get_subscriber_language(2004) == "ru"
+
+
+@pytest.mark.asyncio
+async def test_cleanup_notified_matches(temp_db_path, monkeypatch):
+    monkeypatch.setattr(db, "NOTIFIED_CLEANUP_CHUNK_SIZE", 100)
+    chunks = []
+    real_delete = db.delete_notified_before
+    monkeypatch.setattr(db, "delete_notified_before", lambda *args: chunks.append(real_delete(*args)) or chunks[-1])
+
+    db.mark_notified_bulk([(user_id, 30) for user_id in range(250)] + [(1, 31)])
+    with db.get_connection() as conn:
+        conn.execute("UPDATE notified_matches SET notified_at = 100 WHERE match_id = 30")
+
+    assert await db_async.cleanup_notified_matches() == 250
+    assert chunks == [100, 100, 50]
+    assert db.get_notified_pairs([30, 31]) == {(1, 31)}
+    assert db.get_connection().execute("PRAGMA freelist_count").fetchone()[0] == 0
@@ -0,0 +1,103 @@
+import time
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from telegram.error import Forbidden, RetryAfter
+
+from bot import dispatcher
+
+
+def _bot(side_effect=None):
+    sent = []
+
+    async def send_message(chat_id, text, **kwargs):
+        if side_effect:
+            side_effect(chat_id)
+        sent.append((chat_id, text, time.monotonic()))
+
+    return MagicMock(send_message=AsyncMock(side_effect=send_message)), sent
+
+
+@pytest.fixture(autouse=True)
+def no_chat_pacing(monkeypatch):
+    monkeypatch.setattr(dispatcher, "PER_CHAT_INTERVAL_SECONDS", 0)
+
+
+@pytest.mark.asyncio
+async def test_start_lane_goes_before_digests(monkeypatch):
+    monkeypatch.setattr(dispatcher, "MAX_CONCURRENCY", 1)
+    bot, sent = _bot()
+
+    futures = [
+        dispatcher.submit(bot, 1, "digest", priority=dispatcher.PRIORITY_DIGEST),
+        dispatcher.submit(bot, 2, "digest", priority=dispatcher.PRIORITY_DIGEST),
+        dispatcher.submit(bot, 3, "start"),
+    ]
+    assert dispatcher.stats()["queued_by_priority"] == {dispatcher.PRIORITY_DIGEST: 2, dispatcher.PRIORITY_START: 1}
+    assert await asyncio.gather(*futures) == [True, True, True]
+
+    assert [text for _, text, _ in sent] == ["start", "digest", "digest"]
+    assert dispatcher.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_global_rate_and_per_chat_pacing(monkeypatch):
+    monkeypatch.setattr(dispatcher, "GLOBAL_RATE_PER_SECOND", 100)
+    monkeypatch.setattr(dispatcher, "GLOBAL_BURST", 1)
+    monkeypatch.setattr(dispatcher, "PER_CHAT_INTERVAL_SECONDS", 0.1)
+    bot, sent = _bot()
+
+    started = time.monotonic()
+    await asyncio.gather(*(dispatcher.send(bot, chat_id, "m") for chat_id in range(5)))
+    # Один токен сразу, остальные — по 10 мс
+    assert time.monotonic() - started >= 0.035
+
+    await asyncio.gather(dispatcher.send(bot, 7, "first"), dispatcher.send(bot, 7, "second"))
+    times = [at for chat_id, _, at in sent if chat_id == 7]
+    assert times[1] - times[0] >= 0.09
+
+
+@pytest.mark.asyncio
+async def test_retry_after_requeues(monkeypatch):
+    attempts = []
+
+    def flood(chat_id):
+        attempts.append(chat_id)
+        if len(attempts) == 1:
+            raise RetryAfter(0)
+
+    bot, sent = _bot(flood)
+    before = dispatcher.stats()["retry_after"]
+
+    assert await dispatcher.send(bot, 5, "m") is True
+    assert attempts == [5, 5]
+    assert [chat_id for chat_id, _, _ in sent] == [5]
+    assert dispatcher.stats()["retry_after"] == before + 1
+
+
+@pytest.mark.asyncio
+async def test_retry_after_gives_up(monkeypatch):
+    monkeypatch.setattr(dispatcher, "MAX_RETRY_AFTER_ATTEMPTS", 2)
+
+    def flood(chat_id):
+        raise RetryAfter(0)
+
+    bot, _ = _bot(flood)
+    assert await dispatcher.send(bot, 6, "m") is False
+    assert bot.send_message.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_forbidden_calls_callback():
+    def blocked(chat_id):
+        raise Forbidden("bot was blocked by the user")
+
+    bot, _ = _bot(blocked)
+    deactivated = []
+
+    async def on_forbidden(chat_id):
+        deactivated.append(chat_id)
+
+    assert await dispatcher.send(bot, 8, "m", on_forbidden=on_forbidden) is False
+    assert deactivated == [8]
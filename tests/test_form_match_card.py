@@ -55,4 +55,36 @@ def test_fallback_fields():
     }
     message, keyboard = build_match_card(incomplete_match, lang="ru")
     assert "Team1 vs Team2" in message
-    assert "?" in message
\ No newline at end of file
+    assert "?" in message
+
+def test_card_rendered_once_per_language(basic_match, monkeypatch):
+    import utils.form_match_card as form_match_card
+
+    renders = []
+    real_render = form_match_card._render_card
+    monkeypatch.setattr(form_match_card, "_render_card", lambda *args: renders.append(args[3]) or real_render(*args))
+    monkeypatch.setattr(form_match_card, "_card_cache", form_match_card.OrderedDict())
+    basic_match["modified_at"] = "2099-12-01T00:00:00Z"
+
+    first = build_match_card(basic_match, stream_button=True, lang="ru")
+    assert build_match_card(basic_match, stream_button=True, lang="ru") == first
+    build_match_card(basic_match, stream_button=True, lang="en")
+    assert renders == ["ru", "en"]
+
+    # Новый modified_at — карточка собирается заново
+    basic_match["modified_at"] = "2099-12-02T00:00:00Z"
+    basic_match["stream_url"] = None
+    message, keyboard = build_match_card(basic_match, stream_button=True, lang="ru")
+    assert keyboard is None and "Трансляция отсутствует" in message
+    assert renders == ["ru", "en", "ru"]
+
+
+def test_cached_card_refreshes_time_until(basic_match, monkeypatch):
+    basic_match["modified_at"] = "2099-12-01T00:00:00Z"
+    monkeypatch.setattr("utils.form_match_card.format_time_until", lambda dt, lang: "через 2 часа")
+    assert "через 2 часа" in build_match_card(basic_match, show_time_until=True, stream_button=True, lang="ru")[0]
+
+    monkeypatch.setattr("utils.form_match_card.format_time_until", lambda dt, lang: "через 1 час")
+    message, _ = build_match_card(basic_match, show_time_until=True, stream_button=True, lang="ru")
+    assert "через 1 час" in message and "через 2 часа" not in message
+    assert message.index("Начнётся через:") > message.index("Team A vs Team B")
@@ -0,0 +1,38 @@
+import json
+import pytest
+
+from utils.json_stream import iter_json_array
+
+
+async def chunked(text, size):
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+
+async def collect(chunks):
+    return [item async for item in iter_json_array(chunks)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+async def test_items_split_across_chunks(size):
+    data = [{"id": 1, "name": "Матч \"A\"", "nested": {"list": [1, 2, 3]}}, {"id": 2}, 12345, "str", None]
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    assert await collect(chunked(text, size)) == data
+
+
+@pytest.mark.asyncio
+async def test_empty_array():
+    assert await collect(chunked(" [ ] ", 2)) == []
+
+
+@pytest.mark.asyncio
+async def test_truncated_array_raises():
+    with pytest.raises(ValueError):
+        await collect(chunked('[{"id": 1}, {"id"', 4))
+
+
+@pytest.mark.asyncio
+async def test_non_array_raises():
+    with pytest.raises(ValueError):
+        await collect(chunked('{"id": 1}', 4))
@@ -0,0 +1,81 @@
+import pytest
+
+from utils.match_archive import archive_matches, query_archive
+
+
+def _match(match_id, begin_at, teams, tier="s", status="finished", modified_at="2025-01-01T00:00:00Z"):
+    return {
+        "id": match_id,
+        "name": f"{teams[0][1]} vs {teams[1][1]}",
+        "status": status,
+        "begin_at": begin_at,
+        "modified_at": modified_at,
+        "winner_id": teams[0][0],
+        "opponents": [{"id": team_id, "name": name, "acronym": None} for team_id, name in teams],
+        "league": {"id": 10, "name": "ESL"},
+        "tournament": {"id": 20, "name": "Pro League Playoffs", "tier": tier},
+    }
+
+
+@pytest.fixture
+def archive_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "archive.db")
+    monkeypatch.setattr("utils.match_archive.ARCHIVE_PATH", path)
+    return path
+
+
+def test_archive_only_finished_and_skips_unchanged(archive_path):
+    matches = [
+        _match(1, "2025-01-01T10:00:00Z", [(100, "Natus Vincere"), (200, "G2")]),
+        _match(2, "2025-01-02T10:00:00Z", [(100, "Natus Vincere"), (300, "FaZe")], status="running"),
+    ]
+    assert archive_matches(matches) == 1
+    assert archive_matches(matches) == 0
+
+    matches[0]["modified_at"] = "2025-01-01T12:00:00Z"
+    matches[0]["winner_id"] = 200
+    assert archive_matches(matches) == 1
+    assert query_archive()[0]["winner_id"] == 200
+
+
+def test_query_archive_filters_and_pagination(archive_path):
+    archive_matches([
+        _match(1, "2025-01-01T10:00:00Z", [(100, "Natus Vincere"), (200, "G2")]),
+        _match(2, "2025-01-02T10:00:00Z", [(300, "FaZe"), (200, "G2")], tier="c"),
+        _match(3, "2025-01-03T10:00:00Z", [(100, "Natus Vincere"), (300, "FaZe")]),
+    ])
+
+    assert [m["id"] for m in query_archive()] == [3, 2, 1]
+    assert [m["id"] for m in query_archive(limit=2, offset=2)] == [1]
+    assert [m["id"] for m in query_archive(tier="sa")] == [3, 1]
+    assert [m["id"] for m in query_archive(team_id=300)] == [3, 2]
+    assert [m["id"] for m in query_archive(search="natus")] == [3, 1]
+    assert [m["id"] for m in query_archive(search='faze "g2')] == [2]
+    assert [m["id"] for m in query_archive(search="playoffs", team_id=200)] == [2, 1]
+
+
+def test_reader_history(archive_path):
+    from utils.matches_cache_reader import get_match_history
+
+    archive_matches([_match(1, "2025-01-01T10:00:00Z", [(100, "Natus Vincere"), (200, "G2")])])
+    history = get_match_history(tier="sa", limit=5)
+    assert [m.id for m in history] == [1]
+    assert history[0].opponents[0].name == "Natus Vincere"
+
+
+def test_recent_is_topped_up_from_archive(archive_path, tmp_path, monkeypatch):
+    from utils.cache_writer import write_json_to_cache
+    from utils.matches_cache_reader import get_match_models
+
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(tmp_path))
+    # В кэше остался один завершённый матч, остальные уже выпали из past-эндпоинта
+    cached = _match(3, "2025-01-03T10:00:00Z", [(100, "Natus Vincere"), (300, "FaZe")])
+    write_json_to_cache("matches", {"matches": [cached]})
+    archive_matches([
+        cached,
+        _match(2, "2025-01-02T10:00:00Z", [(300, "FaZe"), (200, "G2")]),
+        _match(1, "2025-01-01T10:00:00Z", [(100, "Natus Vincere"), (200, "G2")]),
+    ])
+
+    assert [m.id for m in get_match_models("past", tier="all", limit=10)] == [3, 2, 1]
+    assert [m.id for m in get_match_models("past", tier="all", limit=2)] == [3, 2]
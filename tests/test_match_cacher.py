@@ -0,0 +1,291 @@
+import time
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+import utils.match_cacher as match_cacher
+
+
+def test_get_high_water_mark():
+    matches = [
+        {"id": 1, "modified_at": "2025-01-01T10:00:00Z"},
+        {"id": 2, "modified_at": "2025-01-02T09:00:00Z"},
+        {"id": 3, "modified_at": None},
+    ]
+    assert match_cacher.get_high_water_mark(matches) == "2025-01-02T09:00:00Z"
+    assert match_cacher.get_high_water_mark([]) is None
+
+
+def test_merge_matches_replaces_and_appends():
+    existing = [{"id": 1, "status": "not_started"}, {"id": 2, "status": "running"}]
+    updates = [{"id": 2, "status": "finished"}, {"id": 3, "status": "not_started"}]
+    merged = {m["id"]: m for m in match_cacher.merge_matches(existing, updates)}
+    assert merged[1]["status"] == "not_started"
+    assert merged[2]["status"] == "finished"
+    assert 3 in merged
+
+
+@pytest.mark.asyncio
+async def test_refresh_matches_delta(monkeypatch):
+    cached = {"matches": [{"id": 1, "status": "not_started", "modified_at": "2025-01-01T10:00:00Z"}]}
+    requested = []
+
+    async def fake_delta(since):
+        requested.append(since)
+        return [{"id": 1, "status": "running", "modified_at": "2025-01-01T11:00:00Z"}]
+
+    async def fail_full(previous=None):
+        raise AssertionError("полная синхронизация не ожидалась")
+
+    monkeypatch.setattr(match_cacher, "read_json_from_cache", lambda name: cached)
+    monkeypatch.setattr(match_cacher, "fetch_modified_matches", fake_delta)
+    monkeypatch.setattr(match_cacher, "fetch_all_matches", fail_full)
+
+    data = await match_cacher.refresh_matches(full_sync=False)
+    assert requested == ["2025-01-01T10:00:00Z"]
+    assert data["matches"][0]["status"] == "running"
+
+
+@pytest.mark.asyncio
+async def test_refresh_matches_falls_back_to_full_without_mark(monkeypatch):
+    async def fake_full(previous=None):
+        return {"matches": [{"id": 5}], "updated_at": "now", "complete": True}
+
+    monkeypatch.setattr(match_cacher, "read_json_from_cache", lambda name: {"matches": [], "updated_at": None})
+    monkeypatch.setattr(match_cacher, "fetch_all_matches", fake_full)
+
+    data = await match_cacher.refresh_matches(full_sync=False)
+    assert data["matches"] == [{"id": 5}]
+
+
+@pytest.mark.asyncio
+async def test_failed_delta_falls_back_to_full_sync(monkeypatch):
+    cached = {"matches": [{"id": 1, "status": "not_started", "modified_at": "2025-01-01T10:00:00Z"}]}
+
+    async def broken_delta(since):
+        raise RuntimeError("400 Bad Request: range[modified_at]")
+
+    async def fake_full(previous=None):
+        return {"matches": [{"id": 1, "status": "running"}], "updated_at": "now", "complete": True}
+
+    monkeypatch.setattr(match_cacher, "read_json_from_cache", lambda name: cached)
+    monkeypatch.setattr(match_cacher, "fetch_modified_matches", broken_delta)
+    monkeypatch.setattr(match_cacher, "fetch_all_matches", fake_full)
+
+    data = await match_cacher.refresh_matches(full_sync=False)
+    assert data["matches"] == [{"id": 1, "status": "running"}]
+    assert data["complete"] is True
+
+
+@pytest.mark.asyncio
+async def test_failed_cycles_count_towards_full_sync(monkeypatch):
+    calls = []
+
+    async def failing_refresh(full_sync, cached_matches=None):
+        calls.append("full" if full_sync else "delta")
+        if len(calls) == 10:
+            raise asyncio.CancelledError
+        if len(calls) in (4, 5):
+            # Разовый 5xx: падает полная сверка и следующая за ней дельта
+            raise RuntimeError("PandaScore 503")
+        return {"matches": [], "updated_at": "now", "complete": full_sync}
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(match_cacher, "FULL_SYNC_EVERY", 3)
+    monkeypatch.setattr(match_cacher, "FULL_SYNC_RETRY_CYCLES", 2)
+    monkeypatch.setattr(match_cacher, "CACHE_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(match_cacher, "next_interval", lambda *args, **kwargs: 0)
+    monkeypatch.setattr(match_cacher, "refresh_matches", failing_refresh)
+    monkeypatch.setattr(match_cacher, "schedule_save", lambda matches, updated_at: None)
+    monkeypatch.setattr(match_cacher, "close_client", noop)
+
+    with pytest.raises(asyncio.CancelledError):
+        await match_cacher.cache_matches_loop()
+    # Упавшая сверка повторяется через FULL_SYNC_RETRY_CYCLES, после успеха — снова обычная частота
+    assert calls == ["full", "delta", "delta", "full", "delta", "full", "delta", "delta", "full", "delta"]
+
+
+@pytest.mark.asyncio
+async def test_incomplete_full_sync_is_retried_with_backoff(monkeypatch):
+    calls = []
+
+    async def budget_limited_refresh(full_sync, cached_matches=None):
+        calls.append("full" if full_sync else "delta")
+        if len(calls) == 8:
+            raise asyncio.CancelledError
+        # Сверка всё время упирается в бюджет и возвращает неполный результат
+        return {"matches": [], "updated_at": "now", "complete": False}
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(match_cacher, "FULL_SYNC_EVERY", 4)
+    monkeypatch.setattr(match_cacher, "FULL_SYNC_RETRY_CYCLES", 3)
+    monkeypatch.setattr(match_cacher, "CACHE_INTERVAL_SECONDS", 0)
+    monkeypatch.setattr(match_cacher, "next_interval", lambda *args, **kwargs: 0)
+    monkeypatch.setattr(match_cacher, "refresh_matches", budget_limited_refresh)
+    monkeypatch.setattr(match_cacher, "schedule_save", lambda matches, updated_at: None)
+    monkeypatch.setattr(match_cacher, "close_client", noop)
+
+    with pytest.raises(asyncio.CancelledError):
+        await match_cacher.cache_matches_loop()
+    assert calls == ["full", "delta", "delta", "full", "delta", "delta", "full", "delta"]
+
+
+@pytest.mark.asyncio
+async def test_loop_merges_from_memory_and_flushes_only_on_stop(monkeypatch):
+    bases = []
+    flushes = []
+
+    async def refresh(full_sync, cached_matches=None):
+        bases.append(cached_matches)
+        if len(bases) == 3:
+            raise asyncio.CancelledError
+        return {"matches": [{"id": len(bases)}], "updated_at": "now", "complete": full_sync}
+
+    async def flush():
+        flushes.append(len(bases))
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(match_cacher, "next_interval", lambda *args, **kwargs: 0)
+    monkeypatch.setattr(match_cacher, "refresh_matches", refresh)
+    monkeypatch.setattr(match_cacher, "schedule_save", lambda matches, updated_at: None)
+    monkeypatch.setattr(match_cacher, "flush_writes", flush)
+    monkeypatch.setattr(match_cacher, "close_client", noop)
+
+    with pytest.raises(asyncio.CancelledError):
+        await match_cacher.cache_matches_loop()
+    assert bases == [None, [{"id": 1}], [{"id": 2}]]
+    assert flushes == [3]
+
+
+@pytest.mark.asyncio
+async def test_incomplete_full_sync_is_merged(monkeypatch):
+    cached = {"matches": [{"id": 1, "status": "finished"}, {"id": 2, "status": "not_started"}]}
+
+    async def partial_full(previous=None):
+        return {"matches": [{"id": 2, "status": "running"}], "updated_at": "now", "complete": False}
+
+    monkeypatch.setattr(match_cacher, "read_json_from_cache", lambda name: cached)
+    monkeypatch.setattr(match_cacher, "fetch_all_matches", partial_full)
+
+    data = await match_cacher.refresh_matches(full_sync=True)
+    merged = {m["id"]: m["status"] for m in data["matches"]}
+    assert merged == {1: "finished", 2: "running"}
+    assert data["complete"] is False
+
+
+def _match_at(seconds_from_now, now, status="not_started"):
+    begin = datetime.fromtimestamp(now + seconds_from_now, tz=timezone.utc).isoformat()
+    return {"id": seconds_from_now, "status": status, "begin_at": begin}
+
+
+@pytest.fixture
+def unlimited_cache_budget(monkeypatch):
+    # Квота кэшера не ограничивает интервал — проверяем только выбор по близости матчей
+    monkeypatch.setattr(match_cacher, "CACHE_API_BUDGET_PER_HOUR", 3600)
+
+
+def test_next_interval_hot_when_match_is_close(unlimited_cache_budget):
+    now = time.time()
+    matches = [_match_at(20 * 60, now)]
+    budget = {"remaining": 900, "reset_in": None}
+    assert match_cacher.next_interval(matches, 1, budget, now=now) == match_cacher.CACHE_HOT_INTERVAL_SECONDS
+
+
+def test_next_interval_hot_when_running(unlimited_cache_budget):
+    now = time.time()
+    matches = [_match_at(-600, now, status="running")]
+    budget = {"remaining": 900, "reset_in": None}
+    assert match_cacher.next_interval(matches, 1, budget, now=now) == match_cacher.CACHE_HOT_INTERVAL_SECONDS
+
+
+def test_next_interval_hot_when_start_is_overdue(unlimited_cache_budget):
+    now = time.time()
+    budget = {"remaining": 900, "reset_in": None}
+    overdue = {"id": 1, "status": "not_started", "begin_ts": int(now) - 600}
+    assert match_cacher.next_interval([overdue], 1, budget, now=now) == match_cacher.CACHE_HOT_INTERVAL_SECONDS
+
+    # Давно просроченный или уже завершённый матч горячим не считается
+    stale = {"id": 2, "status": "not_started", "begin_ts": int(now) - 2 * match_cacher.OVERDUE_WINDOW_SECONDS}
+    finished = {"id": 3, "status": "finished", "begin_ts": int(now) - 600}
+    assert match_cacher.next_interval([stale, finished], 1, budget, now=now) == match_cacher.CACHE_QUIET_INTERVAL_SECONDS
+
+
+def test_next_interval_backs_off_when_quiet():
+    now = time.time()
+    matches = [_match_at(3 * 24 * 3600, now)]
+    budget = {"remaining": 900, "reset_in": None}
+    assert match_cacher.next_interval(matches, 1, budget, now=now) == match_cacher.CACHE_QUIET_INTERVAL_SECONDS
+
+
+def test_next_interval_wakes_before_hot_window(unlimited_cache_budget):
+    # Целое время: begin_ts хранится в целых секундах
+    now = int(time.time())
+    matches = [_match_at(3600 + 120, now)]
+    budget = {"remaining": 900, "reset_in": None}
+    assert match_cacher.next_interval(matches, 1, budget, now=now) == 120
+
+
+def test_next_interval_respects_budget(monkeypatch):
+    now = time.time()
+    matches = [_match_at(10 * 60, now)]
+    # Квота по умолчанию (18/час): даже дельта из одного запроса — не чаще раза в 200 секунд
+    assert match_cacher.next_interval(matches, 1, {"remaining": 900, "reset_in": None}, now=now) == 200
+
+    monkeypatch.setattr(match_cacher, "CACHE_API_BUDGET_PER_HOUR", 300)
+    # 10 запросов за цикл при квоте 300/час — не чаще раза в 120 секунд
+    assert match_cacher.next_interval(matches, 10, {"remaining": 900, "reset_in": None}, now=now) == 120
+    # Остаток 5 запросов до сброса через 1000 с при 1 запросе за цикл — не чаще раза в 200 с
+    assert match_cacher.next_interval(matches, 1, {"remaining": 5, "reset_in": 1000}, now=now) == 200
+
+
+def test_save_matches_diffs_against_last_written_in_memory(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(match_cacher, "_last_written", None)
+    monkeypatch.setattr(match_cacher, "archive_matches", lambda matches: None)
+    summaries = []
+    monkeypatch.setattr(match_cacher, "publish", lambda generation, summary: summaries.append(summary))
+    match = {"id": 1, "status": "not_started", "begin_at": "2030-01-01T00:00:00Z"}
+    assert match_cacher.save_matches([match], None) == 1
+
+    def no_reads(*args):
+        raise AssertionError("кэш перечитан с диска")
+
+    monkeypatch.setattr(match_cacher, "read_json_from_cache", no_reads)
+    monkeypatch.setattr(match_cacher, "journal_head", no_reads)
+    assert match_cacher.save_matches([{**match, "status": "running"}], None) == 2
+    assert summaries[-1]["changed"] == [1]
+
+
+@pytest.mark.asyncio
+async def test_schedule_save_runs_off_loop_and_coalesces(monkeypatch):
+    import threading
+
+    release = threading.Event()
+    written = []
+
+    def slow_save(matches, updated_at):
+        release.wait(timeout=5)
+        written.append((updated_at, threading.current_thread().name))
+
+    monkeypatch.setattr(match_cacher, "save_matches", slow_save)
+    monkeypatch.setattr(match_cacher, "read_json_from_cache", lambda name: {"matches": []})
+
+    match_cacher.schedule_save([], "gen-1")
+    # Первый снимок уже пишется, второй вытесняется третьим
+    while match_cacher._pending_write is not None:
+        await asyncio.sleep(0.01)
+    match_cacher.schedule_save([], "gen-2")
+    match_cacher.schedule_save([], "gen-3")
+    assert written == []
+
+    release.set()
+    await match_cacher.flush_writes()
+    assert [updated_at for updated_at, _ in written] == ["gen-1", "gen-3"]
+    assert all(name.startswith("cache-writer") for _, name in written)
@@ -0,0 +1,112 @@
+import pytest
+
+import os
+
+from utils.match_journal import append_events, diff_matches, get_journal_path, journal_head, read_journal
+
+
+@pytest.fixture
+def journal_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_diff_matches_events():
+    old = [
+        {"id": 1, "status": "not_started", "begin_at": "2030-01-01T10:00:00Z"},
+        {"id": 2, "status": "running", "results": [{"team_id": 5, "score": 0}]},
+        {"id": 3, "status": "not_started", "stream_url": None},
+    ]
+    new = [
+        {"id": 1, "status": "running", "begin_at": "2030-01-01T11:00:00Z"},
+        {"id": 2, "status": "finished", "results": [{"team_id": 5, "score": 2}], "winner_id": 5},
+        {"id": 3, "status": "not_started", "stream_url": "https://twitch.tv/x"},
+        {"id": 4, "status": "not_started", "begin_at": "2030-01-02T10:00:00Z"},
+    ]
+
+    events = [(e["type"], e["match_id"]) for e in diff_matches(old, new)]
+    assert events == [
+        ("rescheduled", 1), ("live", 1),
+        ("score", 2), ("finished", 2),
+        ("stream", 3),
+        ("created", 4),
+    ]
+    assert diff_matches(new, new) == []
+
+
+def test_read_journal_since_generation(journal_dir):
+    append_events(1, [{"type": "created", "match_id": 1}])
+    append_events(2, [{"type": "live", "match_id": 1}, {"type": "score", "match_id": 1}])
+    append_events(3, [{"type": "finished", "match_id": 1}])
+
+    journal = read_journal(since=1)
+    assert journal["complete"]
+    assert [(e["generation"], e["type"]) for e in journal["events"]] == [(2, "live"), (2, "score"), (3, "finished")]
+
+    # limit не разрывает поколение
+    assert len(read_journal(since=0, limit=2)["events"]) == 3
+
+
+def test_journal_retention(journal_dir, monkeypatch):
+    monkeypatch.setattr("utils.match_journal.JOURNAL_RETENTION_GENERATIONS", 3)
+    for generation in range(1, 8):
+        append_events(generation, [{"type": "score", "match_id": generation}])
+
+    journal = read_journal(since=0)
+    assert [e["generation"] for e in journal["events"]] == [5, 6, 7]
+    assert not journal["complete"]
+    assert read_journal(since=4)["complete"]
+
+
+def test_missing_journal_is_empty(journal_dir):
+    assert read_journal(since=0) == {"events": [], "complete": True, "epoch": None, "generation": 0}
+    # Потребитель помнит поколение, которого нет в журнале, — ему нужно перечитать матчи целиком
+    assert not read_journal(since=10)["complete"]
+
+
+def test_journal_keeps_generation_and_epoch(journal_dir):
+    append_events(1, [{"type": "created", "match_id": 1}])
+    append_events(2, [])
+    epoch, generation = journal_head()
+    assert epoch and generation == 2
+
+    journal = read_journal(since=1, epoch=epoch)
+    assert journal["events"] == [] and journal["complete"]
+    assert journal["generation"] == 2
+
+    # Журнал удалён вместе с кэшем: новая эпоха, потребитель со старой видит complete=False
+    os.remove(get_journal_path())
+    append_events(1, [{"type": "created", "match_id": 2}])
+    new_epoch, _ = journal_head()
+    assert new_epoch != epoch
+    assert not read_journal(since=0, epoch=epoch)["complete"]
+    assert not read_journal(since=2)["complete"]
+
+
+def test_corrupt_lines_are_skipped(journal_dir):
+    append_events(1, [{"type": "created", "match_id": 1}])
+    with open(get_journal_path(), "a", encoding="utf-8") as f:
+        f.write('{"generation": 2, "type": "li\n')
+    append_events(2, [{"type": "live", "match_id": 1}])
+
+    assert journal_head()[1] == 2
+    assert [(e["generation"], e["type"]) for e in read_journal(since=0)["events"]] == [(1, "created"), (2, "live")]
+
+
+def test_generation_survives_cache_reset(journal_dir, monkeypatch):
+    from utils import match_cacher
+    from utils.cache_writer import get_cache_path
+
+    monkeypatch.setattr(match_cacher, "archive_matches", lambda matches: None)
+    monkeypatch.setattr(match_cacher, "publish", lambda generation, summary: 0)
+    match = {"id": 1, "status": "not_started", "begin_at": "2030-01-01T00:00:00Z"}
+    assert match_cacher.save_matches([match], None) == 1
+    assert match_cacher.save_matches([{**match, "status": "running"}], None) == 2
+
+    # Кэш удалён (make refresh-cache), журнал остался — нумерация продолжается и в новом процессе
+    for path in journal_dir.iterdir():
+        if str(path) != get_journal_path():
+            path.unlink()
+    monkeypatch.setattr(match_cacher, "_last_written", None)
+    assert not os.path.exists(get_cache_path("matches"))
+    assert match_cacher.save_matches([match], None) == 3
@@ -0,0 +1,58 @@
+from utils.match_model import Match, parse_begin_ts
+
+
+def full_match():
+    return {
+        "id": 42,
+        "name": "Team A vs Team B",
+        "status": "not_started",
+        "begin_at": "2099-12-31T15:00:00Z",
+        "scheduled_at": "2099-12-31T15:00:00Z",
+        "end_at": None,
+        "modified_at": "2099-12-30T10:00:00Z",
+        "number_of_games": 3,
+        "results": [{"team_id": 1, "score": 0}, {"team_id": 2, "score": 0}],
+        "winner_id": None,
+        "opponents": [
+            {"id": 1, "name": "Team A", "acronym": "A", "image_url": None},
+            {"id": 2, "name": "Team B", "acronym": "B", "image_url": None},
+        ],
+        "stream_url": "https://twitch.tv/x",
+        "league": {"id": 10, "name": "ESL", "image_url": None},
+        "tournament": {"id": 20, "name": "Playoffs", "tier": "S", "region": "EU"},
+        "serie": {"id": 30, "season": None, "full_name": "Pro League 2099", "year": 2099},
+    }
+
+
+def test_parse_begin_ts():
+    assert parse_begin_ts("1970-01-01T00:01:00Z") == 60
+    assert parse_begin_ts("not-a-date") is None
+    assert parse_begin_ts(None) is None
+
+
+def test_round_trip():
+    data = full_match()
+    match = Match.from_dict(data)
+    assert match.begin_ts == parse_begin_ts(data["begin_at"])
+    assert match.to_dict() == {**data, "begin_ts": match.begin_ts}
+
+
+def test_names_are_interned():
+    def with_runtime_names():
+        data = full_match()
+        # Строки, собранные в рантайме, — разные объекты до интернирования
+        data["league"]["name"] = "".join(["ES", "L"])
+        data["opponents"][0]["name"] = "".join(["Team", " A"])
+        return data
+
+    first = Match.from_dict(with_runtime_names())
+    second = Match.from_dict(with_runtime_names())
+    assert first.league.name is second.league.name
+    assert first.opponents[0].name is second.opponents[0].name
+
+
+def test_partial_dict_and_tier():
+    match = Match.from_dict({"id": 1, "opponents": [], "status": "upcoming"})
+    assert match.tier == ""
+    assert match.league.name is None
+    assert Match.from_dict(full_match()).tier == "s"
@@ -0,0 +1,70 @@
+from utils.match_model import EntityStore, Match
+from utils.match_store import build_cache_payload, build_views, denormalize_matches, normalize_matches
+
+
+def make_match(match_id, team_ids=(1, 2)):
+    return {
+        "id": match_id,
+        "name": f"Match {match_id}",
+        "status": "not_started",
+        "begin_at": "2099-12-31T15:00:00Z",
+        "begin_ts": 4102412400,
+        "opponents": [
+            {"id": team_id, "name": f"Team {team_id}", "acronym": None, "image_url": f"https://img/{team_id}.png"}
+            for team_id in team_ids
+        ],
+        "league": {"id": 10, "name": "ESL", "image_url": "https://img/esl.png"},
+        "tournament": {"id": 20, "name": "Playoffs", "tier": "s", "region": "EU"},
+        "serie": {"id": 30, "season": None, "full_name": "Pro League 2099", "year": 2099},
+    }
+
+
+def test_entities_are_stored_once():
+    payload = normalize_matches([make_match(1), make_match(2, team_ids=(2, 3))])
+    assert set(payload["entities"]["teams"]) == {"1", "2", "3"}
+    assert list(payload["entities"]["leagues"]) == ["10"]
+    record = payload["matches"][0]
+    assert record["league_id"] == 10
+    assert record["opponent_ids"] == [1, 2]
+    assert "league" not in record and "opponents" not in record
+
+
+def test_denormalize_round_trip():
+    matches = [make_match(1), make_match(2, team_ids=(2, 3))]
+    assert denormalize_matches(build_cache_payload(matches, "now")) == matches
+
+
+def test_entities_without_id_stay_inline():
+    legacy = {"id": 5, "tournament": {"tier": "a"}, "opponents": [{"name": "No id"}]}
+    payload = normalize_matches([legacy])
+    assert payload["matches"][0]["tournament"] == {"tier": "a"}
+    assert denormalize_matches(payload) == [legacy]
+
+
+def test_store_shares_entity_objects():
+    payload = normalize_matches([make_match(1), make_match(2, team_ids=(2, 3))])
+    store = EntityStore(payload["entities"])
+    first, second = (Match.from_dict(record, store) for record in payload["matches"])
+    assert first.league is second.league
+    assert first.opponents[1] is second.opponents[0]
+    assert first.tier == "s"
+    restored = first.to_dict()
+    for field in ("opponents", "league", "tournament", "serie"):
+        assert restored[field] == make_match(1)[field]
+
+
+def test_build_views_by_status_and_tier():
+    now = 1_000_000
+    matches = [
+        Match.from_dict({"id": 1, "status": "not_started", "begin_ts": now + 60, "tournament": {"tier": "s"}}),
+        Match.from_dict({"id": 2, "status": "not_started", "begin_ts": now + 30, "tournament": {"tier": "c"}}),
+        Match.from_dict({"id": 3, "status": "running", "begin_ts": now - 30, "tournament": {"tier": "a"}}),
+        Match.from_dict({"id": 4, "status": "finished", "begin_ts": now - 600, "tournament": {"tier": "b"}}),
+        Match.from_dict({"id": 5, "status": "finished", "begin_ts": now - 60, "tournament": {"tier": "a"}}),
+    ]
+    views = build_views(matches, now)
+    assert views["upcoming:all"] == [2, 1]
+    assert views["upcoming:sa"] == [1]
+    assert views["running:all"] == [3]
+    assert views["past:all"] == [5, 4]
+    assert views["past:sa"] == [5]
@@ -80,4 +80,66 @@ def test_invalid_date_skipped(caplog):
     result = get_matches(status="upcoming", tier="sa", limit=5)
 
     assert all(m.get("id") != 9999 for m in result)
-    assert any("Невозможно распарсить дату" in msg for msg in caplog.messages)
\ No newline at end of file
+    assert any("Невозможно распарсить дату" in msg for msg in caplog.messages)
+
+def test_snapshot_rebuilt_only_on_cache_change(sample_matches):
+    from utils.matches_cache_reader import get_snapshot, get_match
+
+    write_json_to_cache("matches", sample_matches)
+    snapshot = get_snapshot()
+    assert get_snapshot() is snapshot
+    assert get_match(1).id == 1
+
+    sample_matches["matches"].append({
+        "id": 5,
+        "begin_at": datetime.now(timezone.utc).isoformat(),
+        "status": "not_started",
+        "tournament": {"tier": "s"},
+    })
+    write_json_to_cache("matches", sample_matches)
+    assert get_snapshot() is not snapshot
+    assert get_match(5) is not None
+
+
+def test_precomputed_views_are_corrected_by_time():
+    from utils.match_store import build_cache_payload, build_views
+    from utils.match_model import Match
+
+    now = datetime.now(timezone.utc)
+    matches = [
+        {"id": 10, "status": "not_started", "begin_at": (now - timedelta(minutes=10)).isoformat(), "tournament": {"tier": "s"}},
+        {"id": 11, "status": "not_started", "begin_at": (now + timedelta(minutes=10)).isoformat(), "tournament": {"tier": "s"}},
+        {"id": 12, "status": "finished", "begin_at": (now - timedelta(hours=3)).isoformat(), "tournament": {"tier": "s"}},
+    ]
+    payload = build_cache_payload(matches, now.isoformat())
+    # Представления посчитаны час назад: тогда матч 10 ещё был в upcoming
+    payload["views"] = build_views([Match.from_dict(m) for m in matches], now.timestamp() - 3600)
+    assert payload["views"]["upcoming:sa"] == [10, 11]
+    write_json_to_cache("matches", payload)
+
+    assert [m["id"] for m in get_matches(status="upcoming", tier="sa", limit=10)] == [11]
+    assert [m["id"] for m in get_matches(status="past", tier="sa", limit=10)] == [10, 12]
+
+
+@pytest.mark.parametrize("formats", [("json",), ("json", "mmap")])
+def test_matches_between_finds_matches_past_first_page(formats, monkeypatch):
+    from utils.matches_cache_reader import matches_between
+
+    monkeypatch.setattr("utils.cache_writer.CACHE_FORMATS", formats)
+    now = datetime.now(timezone.utc)
+    matches = [
+        {
+            "id": 100 + i,
+            "status": "not_started",
+            "begin_at": (now + timedelta(minutes=i)).isoformat(),
+            "tournament": {"tier": "s" if i % 2 else "c"},
+        }
+        for i in range(60)
+    ]
+    write_json_to_cache("matches", {"matches": matches})
+
+    start = int(now.timestamp()) + 40 * 60
+    window = matches_between(start, start + 5 * 60, tier="all")
+    assert [m.id for m in window] == [140, 141, 142, 143, 144, 145]
+    assert [m.id for m in matches_between(start, start + 5 * 60, tier="sa")] == [141, 143, 145]
+    assert matches_between(now.timestamp() + 7200, now.timestamp() + 9000) == []
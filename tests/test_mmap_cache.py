@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta, timezone
+
+from utils.match_store import build_cache_payload
+from utils.mmap_cache import MappedCache, encode_mapped_cache
+
+
+def _payload():
+    now = datetime.now(timezone.utc)
+    matches = [
+        {
+            "id": 30 - i,
+            "status": "not_started",
+            "begin_at": (now + timedelta(minutes=10 * i)).isoformat(),
+            "tournament": {"id": 7, "tier": "s"},
+            "opponents": [{"id": 1, "name": "NAVI"}, {"id": 2, "name": "G2"}],
+        }
+        for i in range(10)
+    ]
+    matches.append({"id": 99, "status": "not_started", "begin_at": None, "tournament": {"id": 7, "tier": "s"}})
+    return now, build_cache_payload(matches, now.isoformat())
+
+
+def test_lookup_by_id(tmp_path):
+    _, payload = _payload()
+    path = tmp_path / "matches.mmap"
+    path.write_bytes(encode_mapped_cache(payload))
+
+    mapped = MappedCache(str(path))
+    assert mapped.count == 11
+    match = mapped.get(25)
+    assert match.id == 25
+    assert match.tier == "s"
+    assert [team.name for team in match.opponents] == ["NAVI", "G2"]
+    assert mapped.get(99).begin_ts is None
+    assert mapped.get(1000) is None
+
+
+def test_slice_by_begin_ts(tmp_path):
+    now, payload = _payload()
+    path = tmp_path / "matches.mmap"
+    path.write_bytes(encode_mapped_cache(payload))
+
+    mapped = MappedCache(str(path))
+    start = now.timestamp() + 15 * 60
+    window = list(mapped.between(start, start + 30 * 60))
+    assert [m.id for m in window] == [28, 27, 26]
+    assert all(start <= m.begin_ts <= start + 30 * 60 for m in window)
+
+
+def test_reader_uses_mapped_cache(tmp_path, monkeypatch):
+    from utils.cache_writer import write_json_to_cache
+    from utils.matches_cache_reader import get_match, matches_between
+    import utils.matches_cache_reader as reader
+
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(tmp_path))
+    now, payload = _payload()
+    write_json_to_cache("matches", payload)
+
+    # Снимок целиком не разбирается
+    monkeypatch.setattr(reader, "get_snapshot", lambda: (_ for _ in ()).throw(AssertionError("full parse")))
+    assert get_match(21).id == 21
+    assert [m.id for m in matches_between(now.timestamp() - 1, now.timestamp() + 5 * 60)] == [30]
+
+    # После перезаписи файла отображение переоткрывается
+    payload["matches"] = [m for m in payload["matches"] if m["id"] != 21]
+    write_json_to_cache("matches", payload)
+    assert get_match(21) is None
@@ -104,4 +104,49 @@ def test_match_filtering_logic():
 
     running = get_matches(status="running", tier="all", limit=10)
     assert any(m["id"] == 3 for m in running)
-    assert all(m["status"] == "running" for m in running)
\ No newline at end of file
+    assert all(m["status"] == "running" for m in running)
+
+@pytest.mark.asyncio
+async def test_notify_tick_uses_bulk_queries(monkeypatch):
+    from unittest.mock import AsyncMock, MagicMock
+    from utils.match_model import Match
+    import bot.notifications as notifications
+    from bot import notify_buffer
+
+    now = datetime.now(timezone.utc).timestamp()
+    window = [
+        Match(id=1, name="A vs B", status="not_started", begin_ts=int(now) + 60),
+        Match(id=2, name="C vs D", status="not_started", begin_ts=int(now) + 120),
+    ]
+    monkeypatch.setattr(notifications, "matches_between", lambda start, end, tier="all": window)
+
+    calls = []
+
+    async def profiles():
+        calls.append("profiles")
+        return [(10, "all", "en"), (11, "sa", "ru"), (12, "all", "pt")]
+
+    async def notified(match_ids):
+        calls.append(("pairs", match_ids))
+        return {(12, 1)}
+
+    marked = []
+
+    async def mark(pairs):
+        marked.extend(pairs)
+        return True
+
+    monkeypatch.setattr(notifications, "get_active_subscriber_profiles", profiles)
+    monkeypatch.setattr(notifications, "get_notified_pairs", notified)
+    monkeypatch.setattr(notify_buffer, "mark_notified_bulk", mark)
+    monkeypatch.setattr(notifications, "bot", MagicMock(send_message=AsyncMock()))
+    monkeypatch.setattr("bot.dispatcher.PER_CHAT_INTERVAL_SECONDS", 0)
+
+    await notifications.notify_upcoming_matches()
+    # Отметки ещё в буфере: повторный тик их видит и не отправляет заново
+    await notifications.notify_upcoming_matches()
+    await notify_buffer.flush()
+
+    assert calls == ["profiles", ("pairs", [1, 2])] * 2
+    assert sorted(marked) == [(10, 1), (10, 2), (11, 1), (11, 2), (12, 2)]
+    assert notifications.bot.send_message.await_count == 5
@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from bot import notify_buffer
+
+
+@pytest.fixture
+def written(monkeypatch):
+    batches = []
+
+    async def mark(pairs):
+        batches.append(sorted(pairs))
+        return True
+
+    monkeypatch.setattr(notify_buffer, "mark_notified_bulk", mark)
+    yield batches
+    notify_buffer._pending.clear()
+
+
+@pytest.mark.asyncio
+async def test_flush_by_time(written, monkeypatch):
+    monkeypatch.setattr(notify_buffer, "FLUSH_INTERVAL_SECONDS", 0.01)
+    notify_buffer.record(1, 10)
+    notify_buffer.record(2, 10)
+    assert notify_buffer.pending_pairs([10, 11]) == {(1, 10), (2, 10)}
+    assert written == []
+
+    await asyncio.sleep(0.05)
+    assert written == [[(1, 10), (2, 10)]]
+    assert notify_buffer.pending_count() == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_by_size(written, monkeypatch):
+    monkeypatch.setattr(notify_buffer, "FLUSH_SIZE", 3)
+    for user_id in range(4):
+        notify_buffer.record(user_id, 20)
+    await asyncio.sleep(0)
+
+    assert written == [[(0, 20), (1, 20), (2, 20)]]
+    assert notify_buffer.pending_pairs([20]) == {(3, 20)}
+    assert await notify_buffer.flush() == 1
+    assert written[-1] == [(3, 20)]
+
+
+@pytest.mark.asyncio
+async def test_in_flight_pairs_count_as_notified(written, monkeypatch):
+    release = asyncio.Event()
+
+    async def slow_mark(pairs):
+        await release.wait()
+        written.append(sorted(pairs))
+        return True
+
+    monkeypatch.setattr(notify_buffer, "mark_notified_bulk", slow_mark)
+    monkeypatch.setattr(notify_buffer, "FLUSH_SIZE", 1)
+    notify_buffer.record(1, 30)
+    await asyncio.sleep(0)
+
+    assert notify_buffer.pending_pairs([30]) == {(1, 30)}
+    release.set()
+    await notify_buffer.flush()
+    assert notify_buffer.pending_pairs([30]) == set()
+    assert written == [[(1, 30)]]
+
+
+@pytest.mark.asyncio
+async def test_failed_write_is_retried(written, monkeypatch):
+    results = [False, True]
+
+    async def flaky_mark(pairs):
+        written.append(sorted(pairs))
+        return results.pop(0)
+
+    monkeypatch.setattr(notify_buffer, "mark_notified_bulk", flaky_mark)
+    notify_buffer.record(1, 40)
+
+    assert await notify_buffer.flush() == 0
+    assert notify_buffer.pending_pairs([40]) == {(1, 40)}
+    assert await notify_buffer.flush() == 1
+    assert written == [[(1, 40)], [(1, 40)]]
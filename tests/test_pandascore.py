@@ -0,0 +1,190 @@
+import httpx
+import pytest
+
+import utils.pandascore as pandascore
+
+
+def raw_match(match_id, status="not_started"):
+    return {
+        "id": match_id,
+        "name": f"Match {match_id}",
+        "status": status,
+        "begin_at": "2099-12-31T15:00:00Z",
+        "modified_at": "2099-12-30T15:00:00Z",
+        "opponents": [
+            {"opponent": {"id": 1, "name": "Team A", "acronym": "A"}},
+            {"opponent": {"id": 2, "name": "Team B", "acronym": "B"}},
+        ],
+        "streams_list": [{"main": True, "raw_url": "https://twitch.tv/x"}],
+        "league": {"id": 10, "name": "ESL"},
+        "tournament": {"id": 20, "name": "Playoffs", "tier": "s"},
+        "serie": {"id": 30, "full_name": "Pro League 2099"},
+    }
+
+
+@pytest.fixture
+def mock_client(monkeypatch):
+    def install(handler):
+        client = httpx.AsyncClient(base_url=pandascore.BASE_URL, transport=httpx.MockTransport(handler))
+        monkeypatch.setattr(pandascore, "_client", client)
+        return client
+    return install
+
+
+@pytest.mark.asyncio
+async def test_fetch_endpoint_follows_pagination(mock_client, monkeypatch):
+    monkeypatch.setattr(pandascore, "PAGE_SIZE", 2)
+    pages = {
+        "1": [raw_match(1), raw_match(2)],
+        "2": [raw_match(3)],
+    }
+
+    def handler(request):
+        page = request.url.params.get("page[number]", "1")
+        headers = {}
+        if page == "1":
+            headers["Link"] = f'<{pandascore.BASE_URL}/csgo/matches/upcoming?page[number]=2&page[size]=2>; rel="next"'
+        return httpx.Response(200, json=pages[page], headers=headers)
+
+    client = mock_client(handler)
+    matches = await pandascore.fetch_endpoint(client, "upcoming")
+    assert [m["id"] for m in matches] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_fetch_endpoint_stops_at_horizon(mock_client, monkeypatch):
+    monkeypatch.setattr(pandascore, "PAGE_SIZE", 1)
+    monkeypatch.setattr(pandascore, "MAX_PAGES", 2)
+    calls = []
+
+    def handler(request):
+        calls.append(request.url)
+        page = int(request.url.params.get("page[number]", "1"))
+        link = f'<{pandascore.BASE_URL}/csgo/matches/upcoming?page[number]={page + 1}&page[size]=1>; rel="next"'
+        return httpx.Response(200, json=[raw_match(page)], headers={"Link": link})
+
+    client = mock_client(handler)
+    matches = await pandascore.fetch_endpoint(client, "upcoming")
+    assert len(calls) == 2
+    assert len(matches) == 2
+
+
+@pytest.mark.asyncio
+async def test_past_is_limited_to_first_page(mock_client, monkeypatch):
+    monkeypatch.setattr(pandascore, "PAGE_SIZE", 1)
+    monkeypatch.setattr(pandascore, "MAX_PAGES", 5)
+    calls = []
+
+    def handler(request):
+        calls.append(request.url)
+        page = int(request.url.params.get("page[number]", "1"))
+        link = f'<{pandascore.BASE_URL}/csgo/matches/past?page[number]={page + 1}&page[size]=1>; rel="next"'
+        return httpx.Response(200, json=[raw_match(page)], headers={"Link": link})
+
+    client = mock_client(handler)
+    matches = await pandascore.fetch_endpoint(client, "past")
+    assert len(calls) == 1
+    assert [m["id"] for m in matches] == [1]
+
+
+@pytest.mark.asyncio
+async def test_fetch_all_matches_skips_failed_endpoint_and_dedups(mock_client):
+    def handler(request):
+        if request.url.path.endswith("/past"):
+            return httpx.Response(500)
+        if request.url.path.endswith("/running"):
+            return httpx.Response(200, json=[raw_match(1, status="running")])
+        return httpx.Response(200, json=[raw_match(1), raw_match(2)])
+
+    mock_client(handler)
+    data = await pandascore.fetch_all_matches()
+    matches = {m["id"]: m for m in data["matches"]}
+    assert set(matches) == {1, 2}
+    assert matches[1]["status"] == "running"
+    assert data["updated_at"]
+
+
+def test_budget_reserves_capacity_for_high_priority():
+    budget = pandascore.RequestBudget(limit_per_hour=10)
+    budget.tokens = 2
+    # past обязан оставить 25% лимита (2.5 запроса) — отказ
+    assert not budget.try_acquire(pandascore.PRIORITY_PAST)
+    assert budget.try_acquire(pandascore.PRIORITY_RUNNING)
+    assert budget.spent == 1
+
+
+def test_budget_follows_rate_limit_headers():
+    budget = pandascore.RequestBudget(limit_per_hour=1000)
+    budget.update_from_headers(httpx.Headers({"X-Rate-Limit-Remaining": "3", "X-Rate-Limit-Reset": "120"}))
+    snapshot = budget.snapshot()
+    assert snapshot["remaining"] == 3
+    assert 0 < snapshot["reset_in"] <= 120
+
+
+@pytest.mark.asyncio
+async def test_fetch_all_matches_defers_low_priority(mock_client, monkeypatch):
+    budget = pandascore.RequestBudget(limit_per_hour=100)
+    budget.tokens = 20  # хватает на running и upcoming, но не на past (резерв 25)
+    monkeypatch.setattr(pandascore, "request_budget", budget)
+    requested = []
+
+    def handler(request):
+        requested.append(request.url.path)
+        return httpx.Response(200, json=[raw_match(len(requested))])
+
+    mock_client(handler)
+    data = await pandascore.fetch_all_matches()
+    assert not any(path.endswith("/past") for path in requested)
+    assert data["complete"] is False
+    assert len(data["matches"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_response_exhausts_budget(mock_client, monkeypatch):
+    budget = pandascore.RequestBudget(limit_per_hour=100)
+    monkeypatch.setattr(pandascore, "request_budget", budget)
+    client = mock_client(lambda request: httpx.Response(429, headers={"Retry-After": "60"}))
+
+    with pytest.raises(pandascore.BudgetExceeded):
+        await pandascore.fetch_endpoint(client, "running")
+    assert budget.snapshot()["remaining"] == 0
+
+
+@pytest.mark.asyncio
+async def test_conditional_request_reuses_known_matches(mock_client, monkeypatch, tmp_path):
+    monkeypatch.setattr("utils.cache_writer.CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pandascore, "_validators", None)
+    seen_headers = []
+
+    def handler(request):
+        seen_headers.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json=[raw_match(7)], headers={"ETag": '"v1"'})
+
+    client = mock_client(handler)
+    first = await pandascore.fetch_endpoint(client, "upcoming", known={})
+    known = {m["id"]: m for m in first}
+    second = await pandascore.fetch_endpoint(client, "upcoming", known=known)
+
+    assert seen_headers == [None, '"v1"']
+    assert second == first
+
+    pandascore.save_validators()
+    assert (tmp_path / f"{pandascore.VALIDATORS_CACHE_NAME}.json").exists()
+
+
+@pytest.mark.asyncio
+async def test_conditional_request_skipped_when_matches_unknown(mock_client, monkeypatch):
+    monkeypatch.setattr(pandascore, "_validators", {})
+    seen_headers = []
+
+    def handler(request):
+        seen_headers.append(request.headers.get("If-None-Match"))
+        return httpx.Response(200, json=[raw_match(8)], headers={"ETag": '"v2"'})
+
+    client = mock_client(handler)
+    await pandascore.fetch_endpoint(client, "running", known={})
+    # Матча 8 нет в known — условный запрос бессмысленен, 304 не с чем восстановить
+    await pandascore.fetch_endpoint(client, "running", known={})
+    assert seen_headers == [None, None]
@@ -0,0 +1,124 @@
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+from bot import db, subscriber_cache
+from bot.subscriber_cache import SubscriberProfile
+
+
+@pytest.fixture
+def temp_db_path(monkeypatch):
+    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    temp_file.close()
+    monkeypatch.setattr(db, "DB_PATH", temp_file.name)
+    db.init_db()
+    yield temp_file.name
+    db.close_connection()
+    os.remove(temp_file.name)
+
+
+def _count_profile_reads(monkeypatch):
+    reads = []
+    real_from_row = db._profile_from_row
+    monkeypatch.setattr(db, "_profile_from_row", lambda row: reads.append(row) or real_from_row(row))
+    return reads
+
+
+def test_profile_is_served_from_cache(temp_db_path, monkeypatch):
+    db.add_subscriber(3001, tier="all", language="pt")
+    reads = _count_profile_reads(monkeypatch)
+
+    assert db.get_subscriber_profile(3001) == SubscriberProfile("all", "pt", True)
+    assert db.get_subscriber_language(3001) == "pt"
+    assert db.get_subscriber_tier(3001) == "all"
+    assert db.is_subscriber_active(3001)
+    assert db.get_subscriber_profiles([3001]) == {3001: ("all", "pt")}
+    assert len(reads) == 1
+
+    # Отсутствующий пользователь тоже кэшируется
+    assert db.get_subscriber_profile(3999) is None
+    assert db.get_subscriber_profiles([3999]) == {}
+
+
+def test_write_through_updates_cached_profile(temp_db_path, monkeypatch):
+    db.add_subscriber(3002, tier="sa", language="en")
+    assert db.get_subscriber_language(3002) == "en"
+
+    db.update_language(3002, "ru")
+    db.update_tier(3002, "all")
+    db.remove_subscriber(3002)
+
+    monkeypatch.setattr(subscriber_cache, "SUBSCRIBER_CACHE_POLL_SECONDS", 3600)
+    reads = _count_profile_reads(monkeypatch)
+    assert db.get_subscriber_profile(3002) == SubscriberProfile("all", "ru", False)
+    assert reads == []
+
+    # Новый пользователь после промаха "нет в базе"
+    assert db.get_subscriber_profile(3003) is None
+    db.add_subscriber(3003, tier="all")
+    assert db.get_subscriber_tier(3003) == "all"
+
+
+def test_changes_from_other_process_invalidate_cache(temp_db_path, monkeypatch):
+    db.add_subscriber(3004, tier="sa", language="en")
+    assert db.get_subscriber_language(3004) == "en"
+
+    other = sqlite3.connect(temp_db_path)
+    with other:
+        other.execute("UPDATE subscribers SET language = 'pt' WHERE user_id = 3004")
+        other.execute("INSERT INTO subscribers (user_id, tier, language) VALUES (3005, 'all', 'ru')")
+    other.close()
+
+    monkeypatch.setattr(subscriber_cache, "SUBSCRIBER_CACHE_POLL_SECONDS", 3600)
+    assert db.get_subscriber_language(3004) == "en"
+
+    monkeypatch.setattr(subscriber_cache, "SUBSCRIBER_CACHE_POLL_SECONDS", 0)
+    assert db.get_subscriber_language(3004) == "pt"
+    assert db.get_subscriber_profiles([3004, 3005]) == {3004: ("sa", "pt"), 3005: ("all", "ru")}
+
+
+def test_pruned_history_resets_cache(temp_db_path, monkeypatch):
+    monkeypatch.setattr(subscriber_cache, "SUBSCRIBER_CACHE_POLL_SECONDS", 0)
+    db.add_subscriber(3006, language="en")
+    assert db.get_subscriber_language(3006) == "en"
+
+    other = sqlite3.connect(temp_db_path)
+    with other:
+        other.execute("UPDATE subscribers SET language = 'ru' WHERE user_id = 3006")
+        other.execute("UPDATE subscribers SET tier = 'all' WHERE user_id = 3006")
+        other.execute("DELETE FROM subscriber_changes WHERE seq < (SELECT MAX(seq) FROM subscriber_changes)")
+    other.close()
+
+    assert db.get_subscriber_language(3006) == "ru"
+
+
+def test_lru_eviction(monkeypatch):
+    monkeypatch.setattr(subscriber_cache, "SUBSCRIBER_CACHE_SIZE", 2)
+    subscriber_cache.reset("lru-test")
+    profile = SubscriberProfile("sa", "en", True)
+
+    subscriber_cache.put(1, profile)
+    subscriber_cache.put(2, profile)
+    assert subscriber_cache.get(1) == (True, profile)
+    subscriber_cache.put(3, profile)
+
+    assert subscriber_cache.get(2) == (False, None)
+    assert subscriber_cache.get(1) == (True, profile)
+    assert subscriber_cache.get(3) == (True, profile)
+
+
+def test_cache_resets_when_db_path_changes(temp_db_path, monkeypatch):
+    db.add_subscriber(3007, language="pt")
+    assert db.get_subscriber_language(3007) == "pt"
+
+    other_file = tempfile.NamedTemporaryFile(delete=False)
+    other_file.close()
+    try:
+        monkeypatch.setattr(db, "DB_PATH", other_file.name)
+        db.init_db()
+        assert db.get_subscriber_profile(3007) is None
+    finally:
+        db.close_connection()
+        os.remove(other_file.name)
@@ -0,0 +1,127 @@
+import os
+import glob
+import json
+import socket
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from utils.logging_config import setup_logging
+
+# Локальный pub/sub об обновлении кэша: каждый процесс-подписчик (бот, уведомления, воркеры API)
+# слушает свой Unix datagram-сокет в run/notify/, кэшер после записи нового поколения рассылает
+# {generation, summary} во все сокеты каталога. Каталог смонтирован во все контейнеры, так что
+# ничего, кроме файловой системы хоста, не нужно. Он отдельно от cache/: очистка кэша
+# (make refresh-cache) не должна удалять сокеты работающих подписчиков.
+NOTIFY_DIR = os.getenv("CACHE_NOTIFY_DIR", "run/notify")
+
+# Сколько id перечислять в сводке (датаграмма должна оставаться маленькой)
+SUMMARY_MAX_IDS = 200
+
+setup_logging()
+logger = logging.getLogger("cache_notify")
+
+
+def get_notify_dir() -> str:
+    return NOTIFY_DIR
+
+
+def summarize_changes(old_matches: list[dict], new_matches: list[dict]) -> dict:
+    """Что изменилось между двумя поколениями: новые, удалённые и изменённые матчи (по id)."""
+    old_by_id = {m.get("id"): m for m in old_matches}
+    new_by_id = {m.get("id"): m for m in new_matches}
+
+    added = [match_id for match_id in new_by_id if match_id not in old_by_id]
+    removed = [match_id for match_id in old_by_id if match_id not in new_by_id]
+    changed = [
+        match_id for match_id, match in new_by_id.items()
+        if match_id in old_by_id and old_by_id[match_id] != match
+    ]
+
+    return {
+        "total": len(new_by_id),
+        "added": added[:SUMMARY_MAX_IDS],
+        "removed": removed[:SUMMARY_MAX_IDS],
+        "changed": changed[:SUMMARY_MAX_IDS],
+        "counts": {"added": len(added), "removed": len(removed), "changed": len(changed)},
+    }
+
+
+def publish(generation: int, summary: Optional[dict] = None) -> int:
+    """Рассылает уведомление о новом поколении кэша всем подписчикам. Возвращает число доставленных.
+
+    Сокеты завершившихся процессов (никто не слушает) удаляются.
+    """
+    message = json.dumps({"generation": generation, "summary": summary or {}}, ensure_ascii=False).encode("utf-8")
+    delivered = 0
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        for path in glob.glob(os.path.join(get_notify_dir(), "*.sock")):
+            try:
+                sock.sendto(message, path)
+                delivered += 1
+            except (ConnectionRefusedError, FileNotFoundError):
+                logger.debug(f"🧹 Удаляем сокет завершившегося подписчика: {path}")
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                # Очередь подписчика переполнена: он и так отстал, следующее поколение догонит
+                logger.warning(f"⚠️ Подписчик {path} не успевает читать уведомления.")
+            except OSError as e:
+                logger.warning(f"⚠️ Ошибка отправки уведомления в {path}: {e}")
+
+    logger.info(f"📣 Поколение кэша {generation}: уведомлено подписчиков — {delivered}.")
+    return delivered
+
+
+class CacheSubscriber:
+    """Подписка процесса на уведомления кэшера. Обработчик вызывается в event loop
+    с разобранным сообщением {generation, summary}."""
+
+    def __init__(self, name: str, callback: Callable[[dict], None]):
+        self.name = name
+        self.callback = callback
+        self.path = os.path.join(get_notify_dir(), f"{name}-{os.getpid()}.sock")
+        self.sock: Optional[socket.socket] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> "CacheSubscriber":
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.setblocking(False)
+        self.sock.bind(self.path)
+        self.loop = loop or asyncio.get_running_loop()
+        self.loop.add_reader(self.sock.fileno(), self._on_readable)
+        logger.info(f"📡 Подписка {self.name} на обновления кэша: {self.path}")
+        return self
+
+    def _on_readable(self):
+        while True:
+            try:
+                raw = self.sock.recv(65536)
+            except BlockingIOError:
+                return
+            except OSError as e:
+                logger.warning(f"⚠️ Ошибка чтения уведомления кэша: {e}")
+                return
+            try:
+                self.callback(json.loads(raw))
+            except Exception as e:
+                logger.exception(f"🔥 Ошибка в обработчике уведомления кэша: {e}")
+
+    def stop(self):
+        if self.sock is None:
+            return
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+        self.sock = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
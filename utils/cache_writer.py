@@ -1,47 +1,190 @@
 import os
 import json
+import struct
+import marshal
+import hashlib
 import logging
+import threading
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Iterable, Optional
 
 from utils.logging_config import setup_logging
+from utils.mmap_cache import MappedCache, encode_mapped_cache
 
 CACHE_DIR = "cache"
 MATCHES_CACHE_NAME = "matches"
 
+# Форматы, в которых пишется кэш: bin (компактный marshal с заголовком) и mmap — индексированный
+# файл для точечных чтений (см. utils/mmap_cache.py), целиком не читается. json (читаемый) —
+# только по запросу, например CACHE_FORMATS=json,bin,mmap на время отката на версию, читающую
+# только json, или для отладки: каждый формат — отдельная сериализация и fsync на запись.
+# Читатель сам выбирает самый свежий файл и определяет формат.
+CACHE_FORMATS = tuple(f.strip() for f in os.getenv("CACHE_FORMATS", "bin,mmap").split(",") if f.strip())
+FORMAT_EXTENSIONS = {"json": "json", "bin": "bin", "mmap": "mmap"}
+
+# Политика надёжности записи: fsync временного файла перед os.replace и каталога после него.
+# Без fsync при сбое питания после replace на диске может оказаться пустой или обрезанный файл
+CACHE_FSYNC = os.getenv("CACHE_FSYNC", "true").lower() == "true"
+
+# Заголовок бинарного кэша: сигнатура + версия схемы
+BINARY_MAGIC = b"CS2C"
+BINARY_VERSION = 1
+_BINARY_HEADER = struct.Struct("<4sH")
+
+# Поля, которые меняются каждый цикл или выводятся из остальных (представления по статусам
+# пересчитываются со временем, номер поколения растёт с каждой записью) и не считаются
+# изменением содержимого кэша
+VOLATILE_KEYS = {"updated_at", "views", "views_at", "generation"}
+
+# Хэши последнего записанного содержимого по пути файла (дублируются в <path>.sha256 на случай рестарта)
+_content_hashes: dict[str, str] = {}
+
+# Разобранные кэш-файлы: path -> ((inode, mtime_ns, size), data)
+_parsed_cache: dict[str, tuple[tuple, dict]] = {}
+# Файлы, которые не удалось разобрать: path -> ключ файла (повторно не разбираем, пока он не сменится)
+_broken_files: dict[str, tuple] = {}
+_parsed_cache_lock = threading.Lock()
+
+# Открытые отображаемые кэши: path -> MappedCache. Старое отображение не закрываем явно —
+# его ещё могут читать другие потоки; память освободится вместе с последней ссылкой
+_mapped_cache: dict[str, MappedCache] = {}
+
 setup_logging()
 logger = logging.getLogger("matches")
 
 os.makedirs(CACHE_DIR, exist_ok=True)
 
 
-def get_cache_path(name: str) -> str:
-    return os.path.join(CACHE_DIR, f"{name}.json")
+def get_cache_path(name: str, fmt: str = "json") -> str:
+    return os.path.join(CACHE_DIR, f"{name}.{FORMAT_EXTENSIONS[fmt]}")
+
+
+def encode_cache(data: dict, fmt: str) -> bytes:
+    if fmt == "bin":
+        return _BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION) + marshal.dumps(data)
+    if fmt == "mmap":
+        return encode_mapped_cache(data)
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def decode_cache(raw: bytes) -> dict:
+    """Определяет формат по сигнатуре: бинарный (marshal) или JSON."""
+    if raw[:len(BINARY_MAGIC)] == BINARY_MAGIC:
+        _, version = _BINARY_HEADER.unpack_from(raw)
+        if version != BINARY_VERSION:
+            raise ValueError(f"Неподдерживаемая версия бинарного кэша: {version}")
+        return marshal.loads(raw[_BINARY_HEADER.size:])
+    return json.loads(raw)
+
+
+def content_hash(data: dict) -> str:
+    stable = {k: v for k, v in data.items() if k not in VOLATILE_KEYS}
+    encoded = json.dumps(stable, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
 
+def _stored_hash(path: str) -> Optional[str]:
+    if path not in _content_hashes:
+        try:
+            with open(path + ".sha256", "r", encoding="utf-8") as f:
+                _content_hashes[path] = f.read().strip()
+        except OSError:
+            return None
+    return _content_hashes[path]
 
-def write_json_to_cache(name: str, data: dict):
-    path = get_cache_path(name)
-    tmp_path = path + ".tmp"
 
+def _fsync_dir(path: str):
+    fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
     try:
-        with open(tmp_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
-        os.replace(tmp_path, path)
-        logger.info(f"✅ Кэш-файл {name} успешно сохранён.")
+
+def write_json_to_cache(name: str, data: dict, formats: Optional[Iterable[str]] = None) -> bool:
+    """Атомарно записывает кэш во все форматы из CACHE_FORMATS (или formats). Если содержимое
+    не изменилось — файл не трогаем (mtime остаётся прежним, и кэши читателей не инвалидируются).
+    Возвращает True, если хоть что-то записали."""
+    written = False
+
+    try:
+        digest = content_hash(data)
+        for fmt in formats or CACHE_FORMATS:
+            path = get_cache_path(name, fmt)
+            tmp_path = path + ".tmp"
+
+            if os.path.exists(path) and _stored_hash(path) == digest:
+                logger.info(f"⏭ Кэш-файл {name} ({fmt}) не изменился — запись пропущена.")
+                continue
+
+            with open(tmp_path, "wb") as f:
+                f.write(encode_cache(data, fmt))
+                if CACHE_FSYNC:
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            # Сначала убираем старый хэш: после сбоя между заменой файла и записью хэша
+            # кэш просто перезапишется в следующем цикле, а не будет ошибочно пропущен
+            _content_hashes.pop(path, None)
+            if os.path.exists(path + ".sha256"):
+                os.remove(path + ".sha256")
+            os.replace(tmp_path, path)
+            if CACHE_FSYNC:
+                _fsync_dir(path)
+            with open(path + ".sha256", "w", encoding="utf-8") as f:
+                f.write(digest)
+            _content_hashes[path] = digest
+            written = True
+            logger.info(f"✅ Кэш-файл {name} ({fmt}) успешно сохранён.")
     except Exception as e:
         logger.error(f"❌ Ошибка при сохранении кэша {name}: {e}")
 
+    return written
 
-def read_json_from_cache(name: str) -> dict:
-    path = get_cache_path(name)
-    if not os.path.exists(path):
-        logger.warning(f"⚠️ Кэш-файл {name} не найден.")
-        return {"matches": [], "updated_at": None}
 
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+def _file_key(st: os.stat_result) -> tuple:
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _cache_files(name: str) -> list[tuple[str, os.stat_result]]:
+    """Существующие файлы кэша (bin / json), от самого свежего к старому."""
+    files = []
+    # bin первым: при равном mtime предпочитаем более быстрый формат (сортировка устойчивая)
+    for fmt in ("bin", "json"):
+        path = get_cache_path(name, fmt)
+        try:
+            files.append((path, os.stat(path)))
+        except FileNotFoundError:
+            continue
+    files.sort(key=lambda item: item[1].st_mtime_ns, reverse=True)
+    return files
+
+
+def _latest_cache_file(name: str) -> Optional[tuple[str, os.stat_result]]:
+    """Самый свежий из существующих файлов кэша (bin / json)."""
+    files = _cache_files(name)
+    return files[0] if files else None
+
+
+def _parse_cache_file(name: str, path: str, st: os.stat_result) -> Optional[dict]:
+    key = _file_key(st)
+    cached = _parsed_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    if _broken_files.get(path) == key:
+        return None
+
+    with _parsed_cache_lock:
+        # Пока ждали блокировку, файл мог уже разобрать другой поток
+        cached = _parsed_cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        try:
+            with open(path, "rb") as f:
+                # Ключ берём от открытого файла: между stat и open его могли заменить
+                key = _file_key(os.fstat(f.fileno()))
+                data = decode_cache(f.read())
 
             if not isinstance(data, dict):
                 raise ValueError("Кэш не является словарём.")
@@ -50,17 +193,79 @@ def read_json_from_cache(name: str) -> dict:
             if not isinstance(matches, list):
                 raise ValueError("Поле 'matches' отсутствует или не является списком.")
 
-            logger.debug(f"📥 Кэш {name} успешно загружен.")
+            _parsed_cache[path] = (key, data)
+            _broken_files.pop(path, None)
+            logger.debug(f"📥 Кэш {name} успешно загружен ({os.path.basename(path)}).")
             return data
 
-    except Exception as e:
+        except Exception as e:
+            logger.warning(f"❌ Ошибка чтения кэша {name} ({os.path.basename(path)}): {e}")
+            _broken_files[path] = key
+            return None
+
+
+def read_json_from_cache(name: str) -> dict:
+    """Читает кэш (формат определяется автоматически). Разобранные данные кэшируются в процессе
+    и перечитываются с диска, только когда у файла сменились inode, mtime или размер
+    (кэшер пишет через os.replace). Если самый свежий файл не разбирается (повреждён, версия
+    из будущего после отката), читается файл другого формата.
+
+    Возвращаемый словарь общий для всех вызывающих — его нельзя изменять.
+    """
+    try:
+        files = _cache_files(name)
+    except OSError as e:
         logger.warning(f"❌ Ошибка чтения кэша {name}: {e}")
         return {"matches": [], "updated_at": None}
-    
+
+    if not files:
+        logger.warning(f"⚠️ Кэш-файл {name} не найден.")
+        return {"matches": [], "updated_at": None}
+
+    for index, (path, st) in enumerate(files):
+        data = _parse_cache_file(name, path, st)
+        if data is not None:
+            if index:
+                logger.warning(f"⚠️ Кэш {name}: свежий файл не читается, используем {os.path.basename(path)}.")
+            return data
+
+    return {"matches": [], "updated_at": None}
+
+
+def open_mapped_cache(name: str) -> Optional[MappedCache]:
+    """Отображённый в память кэш (формат mmap) для точечных чтений. Переоткрывается при смене
+    файла. None, если файла нет, он повреждён или отстаёт от основного кэша (например,
+    формат mmap выключен в CACHE_FORMATS) — тогда вызывающий читает кэш целиком."""
+    path = get_cache_path(name, "mmap")
+    try:
+        st = os.stat(path)
+        latest = _latest_cache_file(name)
+    except OSError:
+        return None
+    if latest is not None and latest[1].st_mtime_ns > st.st_mtime_ns:
+        return None
+
+    mapped = _mapped_cache.get(path)
+    if mapped is not None and _file_key(mapped.key) == _file_key(st):
+        return mapped
+
+    with _parsed_cache_lock:
+        mapped = _mapped_cache.get(path)
+        if mapped is not None and _file_key(mapped.key) == _file_key(st):
+            return mapped
+        try:
+            mapped = MappedCache(path)
+        except (OSError, ValueError, struct.error) as e:
+            logger.warning(f"❌ Ошибка открытия отображаемого кэша {name}: {e}")
+            return None
+        _mapped_cache[path] = mapped
+        logger.debug(f"📥 Отображаемый кэш {name} открыт ({mapped.count} матчей).")
+        return mapped
+
+
 def get_cache_last_modified(name: str) -> Optional[datetime]:
-    path = get_cache_path(name)
-    if not os.path.exists(path):
+    latest = _latest_cache_file(name)
+    if latest is None:
         return None
 
-    ts = os.path.getmtime(path)
-    return datetime.fromtimestamp(ts, tz=timezone.utc)
\ No newline at end of file
+    return datetime.fromtimestamp(latest[1].st_mtime, tz=timezone.utc)
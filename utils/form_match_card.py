@@ -1,53 +1,93 @@
+import os
+from collections import OrderedDict
+from typing import Optional
+
 from telegram import InlineKeyboardMarkup, InlineKeyboardButton
+from utils.match_model import Match
 from utils.pandascore import format_time_until
 from utils.translations import t
 
-def build_match_card(
-    match: dict,
-    *,
-    show_time_until: bool = False,
-    show_winner: bool = False,
-    stream_button: bool = False,
-    lang: str = "en"
-) -> tuple[str, InlineKeyboardMarkup | None]:
-    league = match.get("league", {}).get("name", "?")
-    tournament = match.get("tournament", {}).get("name", "?")
-    serie = match.get("serie", {}).get("full_name", "?")
+# Готовые карточки по (id матча, язык, флаги, modified_at): рассылка одного матча тысячам
+# пользователей стоит одну сборку на язык. «Время до начала» в кэш не входит — оно
+# подставляется в готовый шаблон при каждом вызове.
+CARD_CACHE_SIZE = int(os.getenv("CARD_CACHE_SIZE", 2048))
+
+# key -> (текст до «времени до начала», текст после, клавиатура, begin для расчёта времени)
+_card_cache: "OrderedDict[tuple, tuple[str, str, Optional[InlineKeyboardMarkup], Optional[int | str]]]" = OrderedDict()
+
+
+def _render_card(match: Match, show_winner: bool, stream_button: bool, lang: str):
+    league = match.league.name or "?"
+    tournament = match.tournament.name or "?"
+    serie = match.serie.full_name or "?"
 
-    opponents = match.get("opponents", [])
-    team1 = opponents[0].get("name") if len(opponents) > 0 else "Team1"
-    team2 = opponents[1].get("name") if len(opponents) > 1 else "Team2"
+    opponents = match.opponents
+    team1 = opponents[0].name if len(opponents) > 0 else "Team1"
+    team2 = opponents[1].name if len(opponents) > 1 else "Team2"
 
-    message = f"{league} | {tournament}\n{serie}\n<b>{team1} vs {team2}</b>"
+    head = f"{league} | {tournament}\n{serie}\n<b>{team1} vs {team2}</b>"
 
     # Победитель
-    if show_winner and match.get("status") == "finished":
-        winner_id = match.get("winner_id")
+    if show_winner and match.status == "finished":
         winner_name = "?"
         for team in opponents:
-            if str(team.get("id")) == str(winner_id):
-                winner_name = team.get("name") or team.get("acronym") or "?"
+            if str(team.id) == str(match.winner_id):
+                winner_name = team.name or team.acronym or "?"
                 break
-        message += f"\n<b>{t('winner', lang)}</b> {winner_name}"
-
-    # Время до начала
-    if show_time_until:
-        begin_at = match.get("begin_at")
-        if begin_at:
-            time_until = format_time_until(begin_at, lang=lang)
-            if time_until != "Время неизвестно":
-                message += f"\n<b>{t('time_until', lang)}</b> {time_until}"
+        head += f"\n<b>{t('winner', lang)}</b> {winner_name}"
 
     # Кнопка трансляции
+    tail = ""
     keyboard = None
     if stream_button:
-        stream_url = match.get("stream_url")
+        stream_url = match.stream_url
         if stream_url and stream_url.startswith("http"):
             button_text = f"{team1} vs {team2}"
             keyboard = InlineKeyboardMarkup([
                 [InlineKeyboardButton(text=button_text, url=stream_url)]
             ])
         else:
-            message += f"\n<i>{t('no_stream', lang)}</i>"
+            tail = f"\n<i>{t('no_stream', lang)}</i>"
+
+    begin = match.begin_ts if match.begin_ts is not None else match.begin_at
+    return head, tail, keyboard, begin
+
+
+def build_match_card(
+    match: Match | dict,
+    *,
+    show_time_until: bool = False,
+    show_winner: bool = False,
+    stream_button: bool = False,
+    lang: str = "en"
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    if isinstance(match, dict):
+        match_id, modified_at = match.get("id"), match.get("modified_at")
+    else:
+        match_id, modified_at = match.id, match.modified_at
+
+    # Без modified_at изменения матча не отследить — такие карточки не кэшируются
+    key = (match_id, lang, show_winner, stream_button, modified_at)
+    cacheable = match_id is not None and modified_at is not None
+    card = _card_cache.get(key) if cacheable else None
+    if card is None:
+        if isinstance(match, dict):
+            match = Match.from_dict(match)
+        card = _render_card(match, show_winner, stream_button, lang)
+        if cacheable:
+            _card_cache[key] = card
+            while len(_card_cache) > CARD_CACHE_SIZE:
+                _card_cache.popitem(last=False)
+    else:
+        _card_cache.move_to_end(key)
+
+    head, tail, keyboard, begin = card
+    message = head
+
+    # Время до начала
+    if show_time_until and begin:
+        time_until = format_time_until(begin, lang=lang)
+        if time_until != "Время неизвестно":
+            message += f"\n<b>{t('time_until', lang)}</b> {time_until}"
 
-    return message, keyboard
\ No newline at end of file
+    return message + tail, keyboard
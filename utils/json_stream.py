@@ -0,0 +1,49 @@
+import json
+from typing import Any, AsyncIterator
+
+_decoder = json.JSONDecoder()
+_SKIP = " \t\n\r,"
+
+
+async def iter_json_array(chunks: AsyncIterator[str]) -> AsyncIterator[Any]:
+    """Инкрементально разбирает JSON-массив верхнего уровня, отдавая элементы по одному.
+
+    В памяти держится только текущий кусок тела ответа и недочитанный хвост элемента,
+    а не весь массив целиком.
+    """
+    buffer = ""
+    pos = 0
+    started = False
+
+    async for chunk in chunks:
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+        while True:
+            while pos < len(buffer) and buffer[pos] in _SKIP:
+                pos += 1
+            if pos >= len(buffer):
+                break
+
+            if not started:
+                if buffer[pos] != "[":
+                    raise ValueError("Ожидался JSON-массив")
+                started = True
+                pos += 1
+                continue
+
+            if buffer[pos] == "]":
+                return
+
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                break  # элемент ещё не дочитан — ждём следующий кусок
+
+            if end == len(buffer) and not isinstance(item, (dict, list)):
+                break  # число или литерал на границе куска может быть обрезан
+
+            yield item
+            pos = end
+
+    raise ValueError("JSON-массив оборван")
@@ -0,0 +1,219 @@
+import os
+import json
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+from utils.logging_config import setup_logging
+from utils.match_model import parse_begin_ts
+from utils.match_store import TIER_SA
+
+# Архив завершённых матчей: кэш хранит только то, что осталось в past-эндпоинте PandaScore,
+# а архив копит историю месяцами и отдаёт её индексированными запросами
+ARCHIVE_PATH = os.getenv("MATCH_ARCHIVE_PATH", "data/matches_archive.db")
+ARCHIVED_STATUSES = {"finished"}
+
+setup_logging()
+logger = logging.getLogger("match_archive")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS archived_matches (
+        id INTEGER PRIMARY KEY,
+        begin_ts INTEGER,
+        begin_at TEXT,
+        status TEXT,
+        tier TEXT,
+        league_id INTEGER,
+        tournament_id INTEGER,
+        winner_id INTEGER,
+        modified_at TEXT,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_archived_begin ON archived_matches (begin_ts DESC);
+    CREATE INDEX IF NOT EXISTS idx_archived_league ON archived_matches (league_id, begin_ts DESC);
+    CREATE INDEX IF NOT EXISTS idx_archived_tournament ON archived_matches (tournament_id, begin_ts DESC);
+    CREATE INDEX IF NOT EXISTS idx_archived_tier ON archived_matches (tier, begin_ts DESC);
+
+    CREATE TABLE IF NOT EXISTS archived_match_teams (
+        team_id INTEGER NOT NULL,
+        match_id INTEGER NOT NULL,
+        PRIMARY KEY (team_id, match_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_archived_teams_match ON archived_match_teams (match_id);
+"""
+
+# Полнотекстовый поиск по названиям команд, турнира и лиги; rowid = id матча
+_FTS_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS archived_matches_fts
+    USING fts5(name, teams, tournament, league, tokenize = 'unicode61');
+"""
+
+_fts_available: Optional[bool] = None
+_initialized_paths: set[str] = set()
+
+
+@contextmanager
+def _connect(path: Optional[str] = None):
+    """Соединение с архивом (схема создаётся при первом обращении к файлу); коммит и закрытие на выходе."""
+    global _fts_available
+    path = path or ARCHIVE_PATH
+    if path not in _initialized_paths:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=10)
+    try:
+        conn.row_factory = sqlite3.Row
+        if path not in _initialized_paths:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            try:
+                conn.executescript(_FTS_SCHEMA)
+                _fts_available = True
+            except sqlite3.OperationalError as e:
+                logger.warning(f"⚠️ FTS5 недоступен, поиск по архиву отключён: {e}")
+                _fts_available = False
+            _initialized_paths.add(path)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _fts_document(match: dict) -> tuple:
+    teams = " ".join(
+        " ".join(filter(None, (team.get("name"), team.get("acronym"))))
+        for team in match.get("opponents") or []
+    )
+    return (
+        match.get("name") or "",
+        teams,
+        (match.get("tournament") or {}).get("name") or "",
+        (match.get("league") or {}).get("name") or "",
+    )
+
+
+def archive_matches(matches: Iterable[dict], path: Optional[str] = None) -> int:
+    """Добавляет/обновляет в архиве завершённые матчи (формат process_match).
+    Неизменившиеся (тот же modified_at) пропускаются. Возвращает число записанных."""
+    finished = {m["id"]: m for m in matches if m.get("id") is not None and m.get("status") in ARCHIVED_STATUSES}
+    if not finished:
+        return 0
+
+    written = 0
+    with _connect(path) as conn:
+        placeholders = ",".join("?" * len(finished))
+        known = dict(conn.execute(
+            f"SELECT id, modified_at FROM archived_matches WHERE id IN ({placeholders})", list(finished)
+        ).fetchall())
+
+        for match_id, match in finished.items():
+            if match_id in known and known[match_id] == match.get("modified_at"):
+                continue
+
+            begin_ts = match.get("begin_ts")
+            if begin_ts is None:
+                begin_ts = parse_begin_ts(match.get("begin_at"))
+            tournament = match.get("tournament") or {}
+
+            conn.execute("""
+                INSERT INTO archived_matches
+                    (id, begin_ts, begin_at, status, tier, league_id, tournament_id, winner_id, modified_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    begin_ts = excluded.begin_ts,
+                    begin_at = excluded.begin_at,
+                    status = excluded.status,
+                    tier = excluded.tier,
+                    league_id = excluded.league_id,
+                    tournament_id = excluded.tournament_id,
+                    winner_id = excluded.winner_id,
+                    modified_at = excluded.modified_at,
+                    data = excluded.data
+            """, (
+                match_id, begin_ts, match.get("begin_at"), match.get("status"),
+                (tournament.get("tier") or "").lower(),
+                (match.get("league") or {}).get("id"), tournament.get("id"),
+                match.get("winner_id"), match.get("modified_at"),
+                json.dumps(match, ensure_ascii=False),
+            ))
+
+            conn.execute("DELETE FROM archived_match_teams WHERE match_id = ?", (match_id,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO archived_match_teams (team_id, match_id) VALUES (?, ?)",
+                [(team["id"], match_id) for team in match.get("opponents") or [] if team.get("id") is not None],
+            )
+
+            if _fts_available:
+                conn.execute("DELETE FROM archived_matches_fts WHERE rowid = ?", (match_id,))
+                conn.execute(
+                    "INSERT INTO archived_matches_fts (rowid, name, teams, tournament, league) VALUES (?, ?, ?, ?, ?)",
+                    (match_id, *_fts_document(match)),
+                )
+            written += 1
+
+    if written:
+        logger.info(f"🗄 В архив записано матчей: {written}")
+    return written
+
+
+def archive_exists(path: Optional[str] = None) -> bool:
+    """Есть ли файл архива (читателям не нужно создавать пустой архив ради запроса)."""
+    return os.path.exists(path or ARCHIVE_PATH)
+
+
+def _fts_query(search: str) -> str:
+    """Пользовательский ввод -> запрос FTS5: каждое слово как префикс, без операторов."""
+    tokens = [token.replace('"', '""') for token in search.split()]
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def query_archive(
+    tier: str = "all",
+    team_id: Optional[int] = None,
+    league_id: Optional[int] = None,
+    tournament_id: Optional[int] = None,
+    search: Optional[str] = None,
+    before_ts: Optional[int] = None,
+    limit: int = 50,
+    offset: int = 0,
+    path: Optional[str] = None,
+) -> list[dict]:
+    """Матчи архива по фильтрам, от новых к старым (begin_ts DESC), с постраничной выдачей."""
+    try:
+        with _connect(path) as conn:
+            joins = []
+            where = []
+            params: list = []
+
+            if team_id is not None:
+                joins.append("JOIN archived_match_teams t ON t.match_id = m.id")
+                where.append("t.team_id = ?")
+                params.append(team_id)
+            if search and search.strip() and _fts_available:
+                joins.append("JOIN archived_matches_fts ON archived_matches_fts.rowid = m.id")
+                where.append("archived_matches_fts MATCH ?")
+                params.append(_fts_query(search))
+            if tier != "all":
+                where.append(f"m.tier IN ({','.join('?' * len(TIER_SA))})")
+                params.extend(sorted(TIER_SA))
+            if league_id is not None:
+                where.append("m.league_id = ?")
+                params.append(league_id)
+            if tournament_id is not None:
+                where.append("m.tournament_id = ?")
+                params.append(tournament_id)
+            if before_ts is not None:
+                where.append("m.begin_ts < ?")
+                params.append(before_ts)
+
+            sql = f"SELECT m.data FROM archived_matches m {' '.join(joins)}"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            sql += " ORDER BY m.begin_ts DESC, m.id DESC LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+
+            return [json.loads(row["data"]) for row in conn.execute(sql, params)]
+    except sqlite3.Error as e:
+        logger.error(f"❌ Ошибка запроса к архиву матчей: {e}")
+        return []
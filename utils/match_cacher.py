@@ -1,34 +1,294 @@
+import os
 import asyncio
 import logging
 import sys
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional
 
 from utils.logging_config import setup_logging
-from utils.cache_writer import write_json_to_cache, MATCHES_CACHE_NAME
-from utils.pandascore import fetch_all_matches
+from utils.cache_writer import write_json_to_cache, read_json_from_cache, get_cache_path, MATCHES_CACHE_NAME
+from utils.match_model import parse_begin_ts
+from utils.match_store import build_cache_payload, denormalize_matches
+from utils.cache_notify import publish, summarize_changes
+from utils.match_journal import append_events, diff_matches, journal_head
+from utils.match_archive import archive_matches
+from utils.pandascore import (
+    fetch_all_matches,
+    fetch_modified_matches,
+    close_client,
+    get_budget,
+    BudgetExceeded,
+)
 
 # Настройка логгера
 setup_logging()
 logger = logging.getLogger("match_cacher")
 
-# Интервал обновления в секундах
-CACHE_INTERVAL_SECONDS = 600  # 10 минут
+# Адаптивный интервал обновления (секунды): часто — пока есть live-матчи или старт в пределах часа,
+# реже — если ближайший старт в пределах HOT/WARM-окон, и долго — в «тихие» ночи
+CACHE_HOT_INTERVAL_SECONDS = int(os.getenv("CACHE_HOT_INTERVAL_SECONDS", 45))
+CACHE_WARM_INTERVAL_SECONDS = int(os.getenv("CACHE_WARM_INTERVAL_SECONDS", 180))
+CACHE_INTERVAL_SECONDS = int(os.getenv("CACHE_INTERVAL_SECONDS", 600))  # 10 минут
+CACHE_QUIET_INTERVAL_SECONDS = int(os.getenv("CACHE_QUIET_INTERVAL_SECONDS", 1800))
+HOT_WINDOW_SECONDS = 3600
+WARM_WINDOW_SECONDS = 6 * 3600
+QUIET_WINDOW_SECONDS = 24 * 3600
+# Не начавшийся матч, время которого уже прошло, — обычное опоздание старта: держим горячий
+# интервал, пока опоздание не больше этого окна
+OVERDUE_WINDOW_SECONDS = 3 * 3600
 
-async def cache_matches_loop(once=False):
+# Сколько запросов в час кэшер может потратить из общего лимита токена. По умолчанию — как
+# прежний опрос (3 запроса раз в 10 минут): частые циклы идут за счёт дешёвых дельт
+CACHE_API_BUDGET_PER_HOUR = int(os.getenv("CACHE_API_BUDGET_PER_HOUR", 18))
+
+# Каждые N циклов — полная сверка (ловит удалённые матчи), между ними — дельта по modified_at
+FULL_SYNC_EVERY = int(os.getenv("CACHE_FULL_SYNC_EVERY", 6))
+# Неудавшуюся или неполную сверку повторяем через столько циклов, а не в каждом следующем
+FULL_SYNC_RETRY_CYCLES = int(os.getenv("CACHE_FULL_SYNC_RETRY_CYCLES", 2))
+
+
+def get_high_water_mark(matches: list[dict]) -> Optional[str]:
+    """Максимальный modified_at среди матчей кэша (ISO-строки PandaScore сравнимы лексикографически)."""
+    return max((m["modified_at"] for m in matches if m.get("modified_at")), default=None)
+
+
+def merge_matches(existing: list[dict], updates: list[dict]) -> list[dict]:
+    """Сливает изменённые матчи в кэш по id: обновлённые заменяются, новые добавляются."""
+    merged = {m["id"]: m for m in existing}
+    for match in updates:
+        merged[match["id"]] = match
+    return list(merged.values())
+
+
+# Запись кэша (нормализация, сериализация, журнал, диск) идёт в отдельном потоке, чтобы не
+# блокировать event loop. Двойная буферизация: пока поток пишет один снимок, следующий ждёт
+# в _pending_write; если до начала записи пришёл ещё более новый — промежуточный отбрасывается
+_write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
+_write_lock = threading.Lock()
+_pending_write: Optional[tuple[list[dict], Optional[str]]] = None
+_writer_busy = False
+_write_future: Optional[asyncio.Future] = None
+# Последнее записанное поколение (путь кэша, матчи, номер) — меняется только в save_matches
+_last_written: Optional[tuple[str, list[dict], int]] = None
+
+
+def _last_written_generation() -> tuple[list[dict], int]:
+    """Матчи и номер последнего записанного поколения. В работающем кэшере — из памяти потока
+    записи; с диска (кэш и журнал) — только при первой записи процесса или смене каталога кэша."""
+    path = get_cache_path(MATCHES_CACHE_NAME)
+    if _last_written is not None and _last_written[0] == path:
+        return _last_written[1], _last_written[2]
+
+    previous = read_json_from_cache(MATCHES_CACHE_NAME)
+    # Номер поколения ведёт журнал: очистка или порча файла кэша не откатывает его назад.
+    # Поколение кэша учитываем, чтобы не уйти ниже уже выданных номеров при переходе
+    try:
+        _, journal_generation = journal_head()
+    except OSError as e:
+        logger.warning(f"⚠️ Не удалось прочитать журнал изменений: {e}")
+        journal_generation = 0
+    return denormalize_matches(previous), max(journal_generation, previous.get("generation") or 0)
+
+
+def save_matches(matches: list[dict], updated_at: Optional[str]) -> Optional[int]:
+    """Пишет новое поколение кэша, дописывает изменения в журнал, переносит завершённые матчи
+    в архив и оповещает подписчиков (бот, уведомления, API).
+
+    Возвращает номер поколения или None, если содержимое не изменилось и запись пропущена.
+    """
+    global _last_written
+    previous_matches, previous_generation = _last_written_generation()
+    path = get_cache_path(MATCHES_CACHE_NAME)
+    generation = previous_generation + 1
+    if not write_json_to_cache(MATCHES_CACHE_NAME, build_cache_payload(matches, updated_at, generation)):
+        _last_written = (path, matches, previous_generation)
+        return None
+    _last_written = (path, matches, generation)
+
+    try:
+        append_events(generation, diff_matches(previous_matches, matches))
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Не удалось записать журнал изменений поколения {generation}: {e}")
+
+    try:
+        archive_matches(matches)
+    except sqlite3.Error as e:
+        logger.warning(f"⚠️ Не удалось обновить архив матчей: {e}")
+
+    try:
+        publish(generation, summarize_changes(previous_matches, matches))
+    except OSError as e:
+        logger.warning(f"⚠️ Не удалось оповестить подписчиков о поколении {generation}: {e}")
+    return generation
+
+
+def _drain_pending_writes():
+    """Поток записи: пишет самый свежий отложенный снимок, пока они есть."""
+    global _pending_write, _writer_busy
     while True:
+        with _write_lock:
+            pending, _pending_write = _pending_write, None
+            if pending is None:
+                _writer_busy = False
+                return
         try:
-            logger.info("🔄 Загрузка матчей из PandaScore (running + upcoming)...")
-            match_data = await fetch_all_matches()
-            write_json_to_cache(MATCHES_CACHE_NAME, match_data)
-            logger.info(f"✅ Сохранено {len(match_data['matches'])} матчей в кэш.")
+            save_matches(*pending)
         except Exception as e:
-            logger.error(f"❌ Ошибка при обновлении кэша матчей: {e}", exc_info=True)
+            logger.error(f"❌ Ошибка фоновой записи кэша матчей: {e}", exc_info=True)
+
+
+def schedule_save(matches: list[dict], updated_at: Optional[str]) -> asyncio.Future:
+    """Ставит снимок в очередь записи и сразу возвращает управление. Переданный список нельзя менять."""
+    global _pending_write, _writer_busy, _write_future
+    with _write_lock:
+        if _pending_write is not None:
+            logger.info("⏩ Предыдущий снимок ещё не записан — заменяем его более свежим.")
+        _pending_write = (matches, updated_at)
+        start = not _writer_busy
+        _writer_busy = True
+
+    if start:
+        _write_future = asyncio.get_running_loop().run_in_executor(_write_executor, _drain_pending_writes)
+    return _write_future
+
+
+async def flush_writes():
+    """Дожидается записи всех поставленных в очередь снимков."""
+    while _write_future is not None and not _write_future.done():
+        await asyncio.shield(_write_future)
+
+
+async def refresh_matches(full_sync: bool, cached_matches: Optional[list[dict]] = None) -> dict:
+    """Возвращает новый снимок кэша; complete=True только для полностью удавшейся полной синхронизации.
+
+    Неполные результаты (дельта, отложенные бюджетом или упавшие эндпоинты) сливаются
+    с текущим кэшем, а не записываются поверх него. cached_matches — последний снимок цикла
+    (в памяти); без него текущий кэш читается с диска.
+    """
+    if cached_matches is None:
+        cached_matches = denormalize_matches(read_json_from_cache(MATCHES_CACHE_NAME))
+
+    if not full_sync:
+        since = get_high_water_mark(cached_matches)
+        if since:
+            updates = None
+            try:
+                updates = await fetch_modified_matches(since)
+            except BudgetExceeded as e:
+                logger.warning(f"⏸ Дельта отложена: {e}")
+                updates = e.matches
+            except Exception as e:
+                # Дельта может не работать долго (фильтр отвергнут, 5xx) — кэш не должен застыть
+                logger.warning(f"⚠️ Дельта не удалась ({e}) — выполняем полную синхронизацию.")
+            if updates is not None:
+                return {
+                    "matches": merge_matches(cached_matches, updates),
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                    "complete": False,
+                }
+        else:
+            logger.info("ℹ️ В кэше нет modified_at — выполняем полную синхронизацию.")
+
+    logger.info("🔄 Полная загрузка матчей из PandaScore (running + upcoming + past)...")
+    match_data = await fetch_all_matches(previous=cached_matches)
+    if not match_data["complete"]:
+        logger.warning("⚠️ Полная загрузка неполная — сливаем с текущим кэшем.")
+        match_data["matches"] = merge_matches(cached_matches, match_data["matches"])
+    return match_data
+
+
+def _seconds_until_next_start(matches: list[dict], now: float) -> Optional[float]:
+    """Секунды до ближайшего старта; 0 — если не начавшийся матч уже опаздывает (в пределах окна)."""
+    soonest = None
+    for match in matches:
+        begin_ts = match.get("begin_ts")
+        if begin_ts is None:
+            begin_ts = parse_begin_ts(match.get("begin_at"))
+        if begin_ts is None:
+            continue
+        delta = begin_ts - now
+        if delta <= 0:
+            if match.get("status") != "not_started" or -delta > OVERDUE_WINDOW_SECONDS:
+                continue
+            delta = 0
+        if soonest is None or delta < soonest:
+            soonest = delta
+    return soonest
+
+
+def next_interval(matches: list[dict], requests_per_cycle: int, budget: dict, now: Optional[float] = None) -> int:
+    """Интервал до следующего цикла: по близости матчей, но не чаще, чем позволяет бюджет API."""
+    now = now or time.time()
+    until_start = _seconds_until_next_start(matches, now)
+
+    if any(m.get("status") == "running" for m in matches) or (until_start is not None and until_start <= HOT_WINDOW_SECONDS):
+        interval = CACHE_HOT_INTERVAL_SECONDS
+    elif until_start is not None and until_start <= WARM_WINDOW_SECONDS:
+        interval = CACHE_WARM_INTERVAL_SECONDS
+    elif until_start is not None and until_start <= QUIET_WINDOW_SECONDS:
+        interval = CACHE_INTERVAL_SECONDS
+    else:
+        interval = CACHE_QUIET_INTERVAL_SECONDS
+
+    # Не проспать момент, когда ближайший матч войдёт в горячее окно
+    if until_start is not None and until_start > HOT_WINDOW_SECONDS:
+        interval = min(interval, max(CACHE_HOT_INTERVAL_SECONDS, until_start - HOT_WINDOW_SECONDS))
+
+    # Ограничение бюджетом: собственная квота кэшера и остаток общего лимита до сброса окна
+    requests_per_cycle = max(1, requests_per_cycle)
+    floor = 3600 * requests_per_cycle / max(1, CACHE_API_BUDGET_PER_HOUR)
+    if budget.get("reset_in"):
+        floor = max(floor, budget["reset_in"] * requests_per_cycle / max(1, budget["remaining"]))
+
+    return round(max(interval, floor))
+
+
+async def cache_matches_loop(once=False):
+    cycles_since_full = FULL_SYNC_EVERY
+    # Последний слитый снимок: база для дельты и условных запросов, чтобы не ждать записи
+    # предыдущего поколения на диск и не перечитывать его
+    snapshot: Optional[list[dict]] = None
+    try:
+        while True:
+            interval = CACHE_INTERVAL_SECONDS
+            try:
+                spent_before = get_budget()["spent"]
+                full_sync = cycles_since_full >= FULL_SYNC_EVERY
+                if full_sync:
+                    # Любая попытка сверки сбрасывает счётчик: если она упадёт или упрётся в бюджет,
+                    # повторим через FULL_SYNC_RETRY_CYCLES, а в промежутке — дельты
+                    cycles_since_full = FULL_SYNC_EVERY - min(FULL_SYNC_RETRY_CYCLES, FULL_SYNC_EVERY)
+                # Считаем и неудачные циклы, иначе при постоянных ошибках полная сверка не наступит
+                cycles_since_full += 1
+                match_data = await refresh_matches(full_sync, snapshot)
+                if match_data.pop("complete"):
+                    cycles_since_full = 1
+                snapshot = match_data["matches"]
+                schedule_save(snapshot, match_data["updated_at"])
+
+                budget = get_budget()
+                interval = next_interval(match_data["matches"], budget["spent"] - spent_before, budget)
+                logger.info(
+                    f"✅ Получено {len(match_data['matches'])} матчей, снимок передан на запись в кэш. "
+                    f"Бюджет API: {budget}. Следующее обновление через {interval} с."
+                )
+            except Exception as e:
+                logger.error(f"❌ Ошибка при обновлении кэша матчей: {e}", exc_info=True)
 
-        if once:
-            break
+            if once:
+                break
 
-        await asyncio.sleep(CACHE_INTERVAL_SECONDS)
+            await asyncio.sleep(interval)
+    finally:
+        # Записи ждём только при остановке
+        await flush_writes()
+        await close_client()
 
 
 if __name__ == "__main__":
     once_flag = "--once" in sys.argv
-    asyncio.run(cache_matches_loop(once=once_flag))
\ No newline at end of file
+    asyncio.run(cache_matches_loop(once=once_flag))
@@ -0,0 +1,236 @@
+import os
+import json
+import time
+import uuid
+import logging
+from typing import Optional
+
+from utils import cache_writer
+from utils.logging_config import setup_logging
+
+# Журнал изменений матчей: по строке JSON на событие, с номером поколения кэша.
+# Потребители запоминают последнее обработанное поколение и читают только новые события.
+# Первая строка — заголовок с эпохой журнала: новая эпоха значит, что журнал начат заново
+# и поколения до неё с нынешними не сравнимы
+JOURNAL_NAME = "matches_journal"
+
+# Сколько последних поколений хранить. Файл сжимается, когда в нём накопилось вдвое больше
+JOURNAL_RETENTION_GENERATIONS = int(os.getenv("MATCH_JOURNAL_RETENTION", 500))
+
+EVENT_TYPES = ("created", "rescheduled", "live", "score", "finished", "stream")
+HEADER = "journal"
+# Заголовок журналов, записанных до появления эпох
+TRUNCATED = "truncated"
+# Поколение, в котором матчи не изменились (например, поменялось только время обновления)
+EMPTY = "empty"
+
+# Сколько байт с конца файла читать в поисках последнего поколения
+TAIL_READ_BYTES = 64 * 1024
+
+setup_logging()
+logger = logging.getLogger("match_journal")
+
+
+def get_journal_path() -> str:
+    return os.path.join(cache_writer.CACHE_DIR, f"{JOURNAL_NAME}.jsonl")
+
+
+def diff_matches(old_matches: list[dict], new_matches: list[dict]) -> list[dict]:
+    """События по матчам между двумя снимками кэша (в формате process_match)."""
+    old_by_id = {m.get("id"): m for m in old_matches}
+    events = []
+
+    for match in new_matches:
+        match_id = match.get("id")
+        old = old_by_id.get(match_id)
+
+        if old is None:
+            events.append({"type": "created", "match_id": match_id, "begin_at": match.get("begin_at")})
+            if match.get("status") == "running":
+                events.append({"type": "live", "match_id": match_id})
+            continue
+
+        if old.get("begin_at") != match.get("begin_at"):
+            events.append({
+                "type": "rescheduled", "match_id": match_id,
+                "from": old.get("begin_at"), "to": match.get("begin_at"),
+            })
+        if match.get("status") == "running" and old.get("status") != "running":
+            events.append({"type": "live", "match_id": match_id})
+        if (old.get("results") or []) != (match.get("results") or []):
+            events.append({"type": "score", "match_id": match_id, "results": match.get("results") or []})
+        if match.get("status") == "finished" and old.get("status") != "finished":
+            events.append({"type": "finished", "match_id": match_id, "winner_id": match.get("winner_id")})
+        if match.get("stream_url") and not old.get("stream_url"):
+            events.append({"type": "stream", "match_id": match_id, "stream_url": match.get("stream_url")})
+
+    return events
+
+
+def _parse_line(line: str) -> Optional[dict]:
+    """Строка журнала или None, если она пустая или повреждена (например, оборванная запись)."""
+    if not line.strip():
+        return None
+    try:
+        entry = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(entry, dict) or not isinstance(entry.get("generation"), int):
+        return None
+    return entry
+
+
+def _read_header(path: str) -> Optional[dict]:
+    """Заголовок журнала (первая строка): эпоха и поколение, до которого (включительно) событий нет."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = _parse_line(f.readline())
+    except FileNotFoundError:
+        return None
+    if entry is None or entry.get("type") not in (HEADER, TRUNCATED):
+        return None
+    return entry
+
+
+def _last_generation(path: str) -> int:
+    """Поколение последней целой строки журнала (0, если журнала нет)."""
+    try:
+        with open(path, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - TAIL_READ_BYTES))
+            tail = f.read()
+            lines = tail.decode("utf-8", errors="replace").splitlines()
+            if size > TAIL_READ_BYTES:
+                # Первая строка хвоста может быть обрезана
+                lines = lines[1:]
+            for line in reversed(lines):
+                entry = _parse_line(line)
+                if entry is not None:
+                    return entry["generation"]
+            if size <= TAIL_READ_BYTES:
+                return 0
+            # В хвосте нет ни одной целой строки — просматриваем файл целиком
+            f.seek(0)
+            generation = 0
+            for raw in f:
+                entry = _parse_line(raw.decode("utf-8", errors="replace"))
+                if entry is not None:
+                    generation = entry["generation"]
+            return generation
+    except FileNotFoundError:
+        return 0
+
+
+def journal_head() -> tuple[Optional[str], int]:
+    """Эпоха журнала и последнее записанное поколение; (None, 0), если журнала ещё нет.
+
+    Номер поколения кэша ведётся здесь, а не в файле кэша: очистка или порча кэша не должна
+    откатывать его назад. Если пропал и сам журнал, новый начнётся с новой эпохой.
+    """
+    path = get_journal_path()
+    header = _read_header(path)
+    return (header.get("epoch") if header else None), _last_generation(path)
+
+
+def _header_line(generation: int, epoch: str) -> str:
+    return json.dumps({"generation": generation, "type": HEADER, "epoch": epoch}) + "\n"
+
+
+def _compact(path: str, keep_after: int, epoch: str):
+    tmp_path = path + ".tmp"
+    with open(path, "r", encoding="utf-8") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+        # Заголовок отмечает границу: события до неё (включительно) удалены
+        dst.write(_header_line(keep_after, epoch))
+        for line in src:
+            entry = _parse_line(line)
+            if entry is not None and entry.get("type") not in (HEADER, TRUNCATED) and entry["generation"] > keep_after:
+                dst.write(line if line.endswith("\n") else line + "\n")
+    os.replace(tmp_path, path)
+    logger.info(f"🧹 Журнал матчей сжат: оставлены поколения после {keep_after}.")
+
+
+def append_events(generation: int, events: list[dict]) -> int:
+    """Дописывает события поколения в журнал и при необходимости отбрасывает старые поколения.
+
+    Поколение без событий тоже записывается (строкой EMPTY), чтобы journal_head его помнил.
+    """
+    path = get_journal_path()
+    header = _read_header(path)
+    if header is None or not header.get("epoch"):
+        if os.path.exists(path):
+            # Журнал без эпохи (старый формат или испорченный заголовок) — переписываем с новой
+            _compact(path, (header or {}).get("generation", 0), uuid.uuid4().hex)
+        else:
+            epoch = uuid.uuid4().hex
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(_header_line(generation - 1, epoch))
+            logger.info(f"📒 Новый журнал матчей: эпоха {epoch}, начиная с поколения {generation}.")
+        header = _read_header(path)
+
+    ts = int(time.time())
+    entries = events or [{"type": EMPTY}]
+    lines = "".join(
+        json.dumps({"generation": generation, "ts": ts, **event}, ensure_ascii=False) + "\n"
+        for event in entries
+    )
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(lines)
+        if cache_writer.CACHE_FSYNC:
+            f.flush()
+            os.fsync(f.fileno())
+
+    if generation - header["generation"] > 2 * JOURNAL_RETENTION_GENERATIONS:
+        _compact(path, generation - JOURNAL_RETENTION_GENERATIONS, header["epoch"])
+
+    if events:
+        logger.info(f"📝 Поколение {generation}: в журнал записано событий — {len(events)}.")
+    return len(events)
+
+
+def read_journal(since: int = 0, limit: Optional[int] = None, epoch: Optional[str] = None) -> dict:
+    """События с поколением больше since (по порядку записи), не больше limit (с точностью до поколения).
+
+    complete=False значит, что дельтам после since верить нельзя — потребителю нужно перечитать
+    кэш целиком: часть событий удалена по сроку хранения, since больше последнего поколения
+    (журнал начат заново) или передана epoch, не совпадающая с текущей эпохой журнала.
+    """
+    path = get_journal_path()
+    events = []
+    truncated_at = None
+    current_epoch = None
+    latest = 0
+
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                event = _parse_line(line)
+                if event is None:
+                    # Повреждённую строку пропускаем, остальной журнал остаётся читаемым
+                    continue
+                if event.get("type") in (HEADER, TRUNCATED):
+                    truncated_at = event["generation"]
+                    current_epoch = event.get("epoch")
+                    continue
+                latest = max(latest, event["generation"])
+                if event.get("type") == EMPTY or event["generation"] <= since:
+                    continue
+                # limit не разрывает поколение: потребитель продолжит с последнего целиком
+                if limit is not None and len(events) >= limit and events[-1]["generation"] != event["generation"]:
+                    continue
+                events.append(event)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"❌ Ошибка чтения журнала матчей: {e}")
+
+    complete = (
+        (truncated_at is None or since >= truncated_at)
+        and since <= latest
+        and (epoch is None or epoch == current_epoch)
+    )
+    return {
+        "events": events,
+        "complete": complete,
+        "epoch": current_epoch,
+        "generation": latest,
+    }
@@ -0,0 +1,205 @@
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def parse_begin_ts(begin_at) -> Optional[int]:
+    """ISO-время PandaScore -> epoch (секунды). None, если дата отсутствует или не разбирается."""
+    if not begin_at:
+        return None
+    try:
+        return int(datetime.fromisoformat(begin_at.replace("Z", "+00:00")).timestamp())
+    except (ValueError, AttributeError):
+        return None
+
+
+@dataclass(frozen=True, slots=True)
+class Team:
+    id: Optional[int] = None
+    name: Optional[str] = None
+    acronym: Optional[str] = None
+    image_url: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Team":
+        return cls(
+            data.get("id"),
+            _intern(data.get("name")),
+            _intern(data.get("acronym")),
+            data.get("image_url"),
+        )
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "name": self.name, "acronym": self.acronym, "image_url": self.image_url}
+
+
+@dataclass(frozen=True, slots=True)
+class League:
+    id: Optional[int] = None
+    name: Optional[str] = None
+    image_url: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "League":
+        return cls(data.get("id"), _intern(data.get("name")), data.get("image_url"))
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "name": self.name, "image_url": self.image_url}
+
+
+@dataclass(frozen=True, slots=True)
+class Tournament:
+    id: Optional[int] = None
+    name: Optional[str] = None
+    tier: Optional[str] = None
+    region: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Tournament":
+        return cls(
+            data.get("id"),
+            _intern(data.get("name")),
+            _intern(data.get("tier")),
+            _intern(data.get("region")),
+        )
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "name": self.name, "tier": self.tier, "region": self.region}
+
+
+@dataclass(frozen=True, slots=True)
+class Serie:
+    id: Optional[int] = None
+    season: Optional[str] = None
+    full_name: Optional[str] = None
+    year: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Serie":
+        return cls(data.get("id"), _intern(data.get("season")), _intern(data.get("full_name")), data.get("year"))
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "season": self.season, "full_name": self.full_name, "year": self.year}
+
+
+def _as(cls, value):
+    return value if isinstance(value, cls) else cls.from_dict(value)
+
+
+_EMPTY_LEAGUE = League()
+_EMPTY_TOURNAMENT = Tournament()
+_EMPTY_SERIE = Serie()
+
+
+@dataclass(frozen=True, slots=True)
+class Match:
+    """Компактное представление матча из кэша: без словарей, с заранее разобранным begin_at.
+
+    results — кортеж пар (team_id, score).
+    """
+    id: Optional[int]
+    name: Optional[str] = None
+    status: Optional[str] = None
+    begin_at: Optional[str] = None
+    begin_ts: Optional[int] = None
+    scheduled_at: Optional[str] = None
+    end_at: Optional[str] = None
+    modified_at: Optional[str] = None
+    number_of_games: Optional[int] = None
+    results: tuple = ()
+    winner_id: Optional[int] = None
+    opponents: tuple = ()
+    stream_url: Optional[str] = None
+    league: League = _EMPTY_LEAGUE
+    tournament: Tournament = _EMPTY_TOURNAMENT
+    serie: Serie = _EMPTY_SERIE
+
+    @property
+    def tier(self) -> str:
+        return (self.tournament.tier or "").lower()
+
+    @classmethod
+    def from_dict(cls, data: dict, store: Optional["EntityStore"] = None) -> "Match":
+        """Из словаря формата process_match или из «тонкой» записи нормализованного кэша
+        (league_id / tournament_id / serie_id / opponent_ids разрешаются через store)."""
+        if store is not None:
+            data = store.resolve(data)
+        begin_at = data.get("begin_at")
+        begin_ts = data.get("begin_ts")
+        return cls(
+            id=data.get("id"),
+            name=data.get("name"),
+            status=_intern(data.get("status")),
+            begin_at=begin_at,
+            begin_ts=begin_ts if begin_ts is not None else parse_begin_ts(begin_at),
+            scheduled_at=data.get("scheduled_at"),
+            end_at=data.get("end_at"),
+            modified_at=data.get("modified_at"),
+            number_of_games=data.get("number_of_games"),
+            results=tuple((r.get("team_id"), r.get("score")) for r in data.get("results") or ()),
+            winner_id=data.get("winner_id"),
+            opponents=tuple(_as(Team, o) for o in data.get("opponents") or ()),
+            stream_url=data.get("stream_url"),
+            league=_as(League, data["league"]) if data.get("league") else _EMPTY_LEAGUE,
+            tournament=_as(Tournament, data["tournament"]) if data.get("tournament") else _EMPTY_TOURNAMENT,
+            serie=_as(Serie, data["serie"]) if data.get("serie") else _EMPTY_SERIE,
+        )
+
+    def to_dict(self) -> dict:
+        """Обратно в формат process_match (для кэш-файла и API)."""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "begin_at": self.begin_at,
+            "begin_ts": self.begin_ts,
+            "scheduled_at": self.scheduled_at,
+            "end_at": self.end_at,
+            "modified_at": self.modified_at,
+            "number_of_games": self.number_of_games,
+            "results": [{"team_id": team_id, "score": score} for team_id, score in self.results],
+            "winner_id": self.winner_id,
+            "opponents": [team.to_dict() for team in self.opponents],
+            "stream_url": self.stream_url,
+            "league": self.league.to_dict(),
+            "tournament": self.tournament.to_dict(),
+            "serie": self.serie.to_dict(),
+        }
+
+
+class EntityStore:
+    """Таблица сущностей нормализованного кэша (лиги, турниры, серии, команды) с поиском по id за O(1).
+
+    Каждая сущность создаётся один раз и разделяется всеми матчами, которые на неё ссылаются.
+    """
+
+    def __init__(self, entities: Optional[dict] = None):
+        entities = entities or {}
+        self.leagues = self._table(League, entities.get("leagues"))
+        self.tournaments = self._table(Tournament, entities.get("tournaments"))
+        self.series = self._table(Serie, entities.get("series"))
+        self.teams = self._table(Team, entities.get("teams"))
+
+    @staticmethod
+    def _table(cls, rows: Optional[dict]) -> dict:
+        return {int(entity_id): cls.from_dict(row) for entity_id, row in (rows or {}).items()}
+
+    def resolve(self, record: dict) -> dict:
+        """Подставляет объекты сущностей вместо ссылок; записи старого формата возвращаются как есть."""
+        if "league_id" not in record and "tournament_id" not in record and "serie_id" not in record and "opponent_ids" not in record:
+            return record
+        resolved = dict(record)
+        if "league_id" in record:
+            resolved["league"] = self.leagues.get(record["league_id"], _EMPTY_LEAGUE)
+        if "tournament_id" in record:
+            resolved["tournament"] = self.tournaments.get(record["tournament_id"], _EMPTY_TOURNAMENT)
+        if "serie_id" in record:
+            resolved["serie"] = self.series.get(record["serie_id"], _EMPTY_SERIE)
+        if "opponent_ids" in record:
+            resolved["opponents"] = [self.teams.get(team_id) or Team(team_id) for team_id in record["opponent_ids"]]
+        return resolved
@@ -0,0 +1,110 @@
+import time
+from typing import Iterable, Optional
+
+from utils.match_model import Match
+
+TIER_SA = {"s", "a"}
+VIEW_STATUSES = ("running", "upcoming", "past")
+VIEW_TIERS = ("all", "sa")
+
+# Поле матча -> таблица сущностей нормализованного кэша
+ENTITY_FIELDS = {
+    "league": "leagues",
+    "tournament": "tournaments",
+    "serie": "series",
+}
+
+
+def normalize_matches(matches: list[dict]) -> dict:
+    """Раскладывает матчи формата process_match на таблицу сущностей и «тонкие» записи со ссылками.
+
+    Лиги, турниры, серии и команды хранятся один раз по id, а матч ссылается на них через
+    league_id / tournament_id / serie_id / opponent_ids. Сущности без id остаются внутри матча.
+    """
+    entities = {"leagues": {}, "tournaments": {}, "series": {}, "teams": {}}
+    records = []
+
+    for match in matches:
+        record = {k: v for k, v in match.items() if k not in ENTITY_FIELDS and k != "opponents"}
+
+        for field, table in ENTITY_FIELDS.items():
+            entity = match.get(field)
+            if entity and entity.get("id") is not None:
+                entities[table][str(entity["id"])] = entity
+                record[f"{field}_id"] = entity["id"]
+            elif entity:
+                record[field] = entity
+
+        opponents = match.get("opponents") or []
+        if all(team.get("id") is not None for team in opponents):
+            for team in opponents:
+                entities["teams"][str(team["id"])] = team
+            record["opponent_ids"] = [team["id"] for team in opponents]
+        else:
+            record["opponents"] = opponents
+
+        records.append(record)
+
+    return {"entities": entities, "matches": records}
+
+
+def denormalize_matches(cache_data: dict) -> list[dict]:
+    """Обратная операция: матчи кэша (любого формата) в виде полных словарей process_match."""
+    entities = cache_data.get("entities") or {}
+    matches = []
+
+    for record in cache_data.get("matches", []):
+        match = dict(record)
+        for field, table in ENTITY_FIELDS.items():
+            entity_id = match.pop(f"{field}_id", None)
+            if entity_id is not None:
+                match[field] = (entities.get(table) or {}).get(str(entity_id), {"id": entity_id})
+        opponent_ids = match.pop("opponent_ids", None)
+        if opponent_ids is not None:
+            teams = entities.get("teams") or {}
+            match["opponents"] = [teams.get(str(team_id), {"id": team_id}) for team_id in opponent_ids]
+        matches.append(match)
+
+    return matches
+
+
+def view_key(status: str, tier: str) -> str:
+    return f"{status}:{'all' if tier == 'all' else 'sa'}"
+
+
+def build_views(matches: Iterable[Match], now: float) -> dict[str, list[int]]:
+    """Готовые отсортированные списки id для каждой пары (status, tier) на момент now.
+
+    running и upcoming — по возрастанию begin_ts, past — по убыванию. Деление на upcoming/past
+    устаревает со временем; читатель поправляет его сам по границе begin_ts (см. matches_cache_reader).
+    """
+    timeline = sorted((m for m in matches if m.begin_ts is not None), key=lambda m: m.begin_ts)
+    views = {view_key(status, tier): [] for status in VIEW_STATUSES for tier in VIEW_TIERS}
+
+    for match in timeline:
+        statuses = []
+        if match.status == "running":
+            statuses.append("running")
+        if match.begin_ts > now:
+            statuses.append("upcoming")
+        elif match.begin_ts < now and match.status != "running":
+            statuses.append("past")
+        for status in statuses:
+            views[view_key(status, "all")].append(match.id)
+            if match.tier in TIER_SA:
+                views[view_key(status, "sa")].append(match.id)
+
+    for tier in VIEW_TIERS:
+        views[view_key("past", tier)].reverse()
+    return views
+
+
+def build_cache_payload(matches: list[dict], updated_at: Optional[str], generation: int = 0) -> dict:
+    now = time.time()
+    return {
+        **normalize_matches(matches),
+        "views": build_views((Match.from_dict(m) for m in matches), now),
+        "views_at": now,
+        "updated_at": updated_at,
+        "generation": generation,
+    }
@@ -1,20 +1,65 @@
 import os
-import json
 import logging
-from datetime import datetime, timezone
-from typing import List
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from itertools import chain, islice
+from typing import Callable, List, Optional
 
-from utils.cache_writer import read_json_from_cache, MATCHES_CACHE_NAME
+from utils.cache_writer import open_mapped_cache, read_json_from_cache, MATCHES_CACHE_NAME
+from utils.cache_notify import CacheSubscriber
 from utils.logging_config import setup_logging
+from utils.match_archive import archive_exists, query_archive
+from utils.match_model import Match, EntityStore
+from utils.match_store import TIER_SA, build_views, view_key
 
 setup_logging()
 logger = logging.getLogger("matches_cache_reader")
 
-TIER_SA = {"s", "a"}
+# С подпиской на уведомления кэшера снимок не перепроверяется по stat на каждом вызове —
+# только после уведомления о новом поколении и, на случай потерянной датаграммы, не реже этого интервала
+SNAPSHOT_MAX_AGE_SECONDS = int(os.getenv("CACHE_SNAPSHOT_MAX_AGE_SECONDS", 30))
+
+
+class CacheSnapshot:
+    """Разобранный и проиндексированный кэш матчей одного поколения файла.
+
+    timeline — матчи с валидным begin_ts, отсортированные по нему; begin_ts — ключи для bisect.
+    views — готовые списки матчей по (status, tier), посчитанные кэшером (или здесь же, если
+    в файле их нет); upcoming_ts — begin_ts представлений upcoming для поправки границы по времени.
+    """
+    __slots__ = ("source", "generation", "matches", "by_id", "timeline", "begin_ts", "views", "upcoming_ts")
+
+    def __init__(self, source, matches: List[Match], views: Optional[dict] = None):
+        self.source = source
+        self.generation = source.get("generation") if isinstance(source, dict) else None
+        self.matches = tuple(matches)
+        self.by_id = {m.id: m for m in matches}
+        self.timeline = tuple(sorted((m for m in matches if m.begin_ts is not None), key=lambda m: m.begin_ts))
+        self.begin_ts = [m.begin_ts for m in self.timeline]
+
+        if not isinstance(views, dict):
+            views = build_views(self.matches, time.time())
+        by_id = self.by_id
+        self.views = {
+            key: tuple(by_id[match_id] for match_id in ids if match_id in by_id)
+            for key, ids in views.items()
+        }
+        self.upcoming_ts = {
+            key: [m.begin_ts for m in matches]
+            for key, matches in self.views.items()
+            if key.startswith("upcoming:")
+        }
 
-def get_matches(status: str, tier: str = "all", limit: int = 10) -> List[dict]:
-    cache_data = read_json_from_cache(MATCHES_CACHE_NAME)
 
+_snapshot: Optional[CacheSnapshot] = None
+_snapshot_lock = threading.Lock()
+_push_enabled = False
+_snapshot_stale = True
+_snapshot_checked_at = 0.0
+
+
+def _parse_matches(cache_data) -> List[Match]:
     if not isinstance(cache_data, dict):
         logger.error(f"❌ Кэш {MATCHES_CACHE_NAME} имеет неверный формат: ожидался словарь.")
         return []
@@ -24,47 +69,161 @@ def get_matches(status: str, tier: str = "all", limit: int = 10) -> List[dict]:
         logger.error(f"❌ Кэш {MATCHES_CACHE_NAME}['matches'] не является списком.")
         return []
 
-    now = datetime.now(timezone.utc)
+    # Нормализованный кэш: матчи ссылаются на лиги/турниры/команды из общей таблицы сущностей
+    store = EntityStore(cache_data.get("entities"))
+    matches = [Match.from_dict(m, store) for m in all_matches]
 
-    def match_status_filter(match: dict) -> bool:
-        begin_at_str = match.get("begin_at")
-        if not begin_at_str:
-            return False
+    for match in matches:
+        if match.begin_ts is None and match.begin_at:
+            logger.warning(f"⚠️ Невозможно распарсить дату: {match.begin_at}")
+    return matches
 
-        try:
-            begin_at = datetime.fromisoformat(begin_at_str.replace("Z", "+00:00"))
-        except ValueError:
-            logger.warning(f"⚠️ Невозможно распарсить дату: {begin_at_str}")
-            return False
 
-        if status == "running":
-            return match.get("status") == "running"
-        elif status == "upcoming":
-            return begin_at > now
-        elif status == "past":
-            return begin_at < now and match.get("status") != "running"
-        else:
-            return False
+def get_snapshot() -> CacheSnapshot:
+    """Текущий снимок кэша. Пересобирается, только когда read_json_from_cache вернул новые данные
+    (т.е. файл кэша сменился); безопасно для asyncio и потоков threadpool."""
+    global _snapshot, _snapshot_stale, _snapshot_checked_at
+
+    snapshot = _snapshot
+    if (
+        snapshot is not None and _push_enabled and not _snapshot_stale
+        and time.monotonic() - _snapshot_checked_at < SNAPSHOT_MAX_AGE_SECONDS
+    ):
+        return snapshot
+
+    # Сбрасываем флаг до чтения: уведомление, пришедшее во время чтения, не потеряется
+    _snapshot_stale = False
+    _snapshot_checked_at = time.monotonic()
+    cache_data = read_json_from_cache(MATCHES_CACHE_NAME)
+
+    if snapshot is not None and snapshot.source is cache_data:
+        return snapshot
+
+    with _snapshot_lock:
+        snapshot = _snapshot
+        if snapshot is None or snapshot.source is not cache_data:
+            views = cache_data.get("views") if isinstance(cache_data, dict) else None
+            snapshot = CacheSnapshot(cache_data, _parse_matches(cache_data), views)
+            _snapshot = snapshot
+    return snapshot
+
+
+def invalidate_snapshot(message: Optional[dict] = None):
+    """Помечает снимок устаревшим: следующий вызов перечитает кэш (если файл действительно сменился)."""
+    global _snapshot_stale
+    _snapshot_stale = True
+    if message:
+        logger.info(f"🔔 Новое поколение кэша: {message.get('generation')}")
+
+
+def subscribe_to_updates(name: str, on_update: Optional[Callable[[dict], None]] = None) -> CacheSubscriber:
+    """Подписывает процесс на уведомления кэшера (вызывать из работающего event loop).
+
+    Снимок сбрасывается по уведомлению, затем вызывается on_update(message), если он задан.
+    """
+    global _push_enabled
+
+    def handle(message: dict):
+        invalidate_snapshot(message)
+        if on_update is not None:
+            on_update(message)
+
+    subscriber = CacheSubscriber(name, handle).start()
+    _push_enabled = True
+    invalidate_snapshot()
+    return subscriber
+
 
-    def tier_filter(match: dict) -> bool:
-        if tier == "all":
-            return True
-        match_tier = match.get("tournament", {}).get("tier", "").lower()
-        return match_tier in TIER_SA
+def load_matches() -> List[Match]:
+    return list(get_snapshot().matches)
 
+
+def get_match(match_id: int) -> Optional[Match]:
+    """Один матч по id. Если есть отображаемый кэш, декодируется только эта запись,
+    иначе — поиск по полному снимку."""
+    mapped = open_mapped_cache(MATCHES_CACHE_NAME)
+    if mapped is not None:
+        return mapped.get(match_id)
+    return get_snapshot().by_id.get(match_id)
+
+
+def matches_between(start_ts: float, end_ts: float, tier: str = "all") -> List[Match]:
+    """Матчи с begin_ts в [start_ts, end_ts] по возрастанию времени: бинарный поиск по индексу
+    begin_ts (отображаемого кэша или снимка) — O(log n + k), весь кэш не перебирается."""
+    mapped = open_mapped_cache(MATCHES_CACHE_NAME)
+    if mapped is not None:
+        matches = mapped.between(start_ts, end_ts)
+    else:
+        snapshot = get_snapshot()
+        lo = bisect_left(snapshot.begin_ts, start_ts)
+        hi = bisect_right(snapshot.begin_ts, end_ts)
+        matches = snapshot.timeline[lo:hi]
+
+    if tier == "all":
+        return list(matches)
+    return [m for m in matches if m.tier in TIER_SA]
+
+
+def get_match_models(status: str, tier: str = "all", limit: int = 10) -> List[Match]:
+    """Матчи по статусу и тиру в компактном виде (Match) — для бота и уведомлений."""
     try:
-        filtered_matches = [
-            m for m in all_matches if match_status_filter(m) and tier_filter(m)
-        ]
+        snapshot = get_snapshot()
+    except Exception as e:
+        logger.exception(f"🔥 Ошибка при разборе кэша матчей: {e}")
+        return []
+
+    now = time.time()
 
-        filtered_matches.sort(
-            key=lambda m: m.get("begin_at") or "",
-            reverse=(status == "past")
-        )
+    try:
+        # Представления посчитаны на момент записи кэша: матчи из головы upcoming, чьё время уже
+        # наступило, перетекают в past — находим эту границу бинарным поиском
+        upcoming = snapshot.views.get(view_key("upcoming", tier), ())
+        boundary = bisect_right(snapshot.upcoming_ts.get(view_key("upcoming", tier), []), now)
+
+        if status == "running":
+            filtered_matches = list(snapshot.views.get(view_key("running", tier), ())[:limit])
+        elif status == "upcoming":
+            filtered_matches = list(upcoming[boundary:boundary + limit])
+        elif status == "past":
+            moved = (
+                upcoming[i] for i in range(boundary - 1, -1, -1)
+                if upcoming[i].begin_ts < now and upcoming[i].status != "running"
+            )
+            past = snapshot.views.get(view_key("past", tier), ())
+            filtered_matches = list(islice(chain(moved, past), limit))
+            if len(filtered_matches) < limit:
+                filtered_matches += _past_from_archive(filtered_matches, tier, limit - len(filtered_matches))
+        else:
+            filtered_matches = []
 
         logger.info(f"📊 Получено {len(filtered_matches)} матчей по фильтрам: status={status}, tier={tier}")
-        return filtered_matches[:limit]
+        return filtered_matches
 
     except Exception as e:
         logger.exception(f"🔥 Ошибка при фильтрации матчей: {e}")
-        return []
\ No newline at end of file
+        return []
+
+
+def _past_from_archive(known: List[Match], tier: str, limit: int) -> List[Match]:
+    """Добирает завершённые матчи из архива: в кэше остаётся лишь то, что ещё отдаёт past-эндпоинт
+    PandaScore, а архив хранит историю дальше. Берутся матчи не новее последнего из known."""
+    if not archive_exists():
+        return []
+    known_ids = {m.id for m in known}
+    begin = [m.begin_ts for m in known if m.begin_ts is not None]
+    before_ts = min(begin) + 1 if begin else None
+    rows = query_archive(tier=tier, before_ts=before_ts, limit=limit + len(known_ids))
+    return [Match.from_dict(m) for m in rows if m.get("id") not in known_ids][:limit]
+
+
+def get_matches(status: str, tier: str = "all", limit: int = 10) -> List[dict]:
+    """То же, что get_match_models, но в виде словарей формата кэша (для API)."""
+    return [m.to_dict() for m in get_match_models(status, tier, limit)]
+
+
+def get_match_history(tier: str = "all", limit: int = 10, offset: int = 0, **filters) -> List[Match]:
+    """Завершённые матчи из архива (от новых к старым), с постраничной выдачей.
+
+    filters — team_id, league_id, tournament_id, search, before_ts (см. query_archive).
+    """
+    return [Match.from_dict(m) for m in query_archive(tier=tier, limit=limit, offset=offset, **filters)]
@@ -0,0 +1,118 @@
+import os
+import math
+import mmap
+import struct
+import marshal
+from typing import Iterator, Optional
+
+from utils.match_model import EntityStore, Match, parse_begin_ts
+
+# Раскладка файла (все числа little-endian):
+#   заголовок | таблица сущностей (marshal) | записи матчей (marshal, подряд) | индекс id | индекс begin_ts
+# Индексы — массивы записей фиксированной длины, отсортированные по ключу, поэтому по ним
+# можно искать бинарным поиском прямо в отображённой памяти, не разбирая остальной файл.
+MAPPED_MAGIC = b"CS2M"
+MAPPED_VERSION = 1
+_HEADER = struct.Struct("<4sHxxIIQQQQQ")  # magic, version, count, time_count, entities (offset, len), id index, time index, reserved
+_ENTRY = struct.Struct("<qQI")  # ключ (id или begin_ts), смещение записи, длина записи
+
+
+def encode_mapped_cache(payload: dict) -> bytes:
+    """Нормализованный кэш (entities + matches) -> байты отображаемого формата."""
+    entities = marshal.dumps(payload.get("entities") or {})
+    body = bytearray()
+    by_id = []
+    by_time = []
+
+    offset = _HEADER.size + len(entities)
+    for record in payload.get("matches", []):
+        encoded = marshal.dumps(record)
+        entry_offset = offset + len(body)
+        if record.get("id") is not None:
+            by_id.append((record["id"], entry_offset, len(encoded)))
+        begin_ts = record.get("begin_ts")
+        if begin_ts is None:
+            begin_ts = parse_begin_ts(record.get("begin_at"))
+        if begin_ts is not None:
+            by_time.append((begin_ts, entry_offset, len(encoded)))
+        body += encoded
+
+    by_id.sort()
+    by_time.sort()
+    id_index_offset = offset + len(body)
+    time_index_offset = id_index_offset + len(by_id) * _ENTRY.size
+
+    header = _HEADER.pack(
+        MAPPED_MAGIC, MAPPED_VERSION, len(by_id), len(by_time),
+        _HEADER.size, len(entities), id_index_offset, time_index_offset, 0,
+    )
+    return b"".join([
+        header,
+        entities,
+        bytes(body),
+        b"".join(_ENTRY.pack(*entry) for entry in by_id),
+        b"".join(_ENTRY.pack(*entry) for entry in by_time),
+    ])
+
+
+class MappedCache:
+    """Кэш матчей, отображённый в память (mmap): декодируются только запрошенные записи.
+
+    Несколько процессов, открывших один файл, делят одни и те же страницы page cache.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.key = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.count, self.time_count, ent_offset, ent_length, self._id_index, self._time_index, _ = (
+            _HEADER.unpack_from(self._mm)
+        )
+        if magic != MAPPED_MAGIC:
+            raise ValueError("Файл не является отображаемым кэшем матчей")
+        if version != MAPPED_VERSION:
+            raise ValueError(f"Неподдерживаемая версия отображаемого кэша: {version}")
+        self._entities_range = (ent_offset, ent_length)
+        self._store: Optional[EntityStore] = None
+
+    @property
+    def store(self) -> EntityStore:
+        if self._store is None:
+            offset, length = self._entities_range
+            self._store = EntityStore(marshal.loads(self._mm[offset:offset + length]))
+        return self._store
+
+    def _entry(self, index_offset: int, position: int) -> tuple[int, int, int]:
+        return _ENTRY.unpack_from(self._mm, index_offset + position * _ENTRY.size)
+
+    def _lower_bound(self, index_offset: int, size: int, key: int) -> int:
+        lo, hi = 0, size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(index_offset, mid)[0] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _decode(self, offset: int, length: int) -> Match:
+        return Match.from_dict(marshal.loads(self._mm[offset:offset + length]), self.store)
+
+    def get(self, match_id: int) -> Optional[Match]:
+        position = self._lower_bound(self._id_index, self.count, match_id)
+        if position < self.count:
+            key, offset, length = self._entry(self._id_index, position)
+            if key == match_id:
+                return self._decode(offset, length)
+        return None
+
+    def between(self, start_ts: float, end_ts: float) -> Iterator[Match]:
+        """Матчи с start_ts <= begin_ts <= end_ts по возрастанию begin_ts."""
+        position = self._lower_bound(self._time_index, self.time_count, math.ceil(start_ts))
+        while position < self.time_count:
+            begin_ts, offset, length = self._entry(self._time_index, position)
+            if begin_ts > end_ts:
+                break
+            yield self._decode(offset, length)
+            position += 1
@@ -1,10 +1,17 @@
 import os
+import json
+import time
+import asyncio
 import logging
+from typing import AsyncIterator, Optional
 import httpx
 from dotenv import load_dotenv
 from datetime import datetime, timezone
 from utils.logging_config import setup_logging
 from utils.translations import t
+from utils.cache_writer import get_cache_path, write_json_to_cache
+from utils.json_stream import iter_json_array
+from utils.match_model import parse_begin_ts
 
 load_dotenv()
 
@@ -13,10 +20,121 @@ BASE_URL = "https://api.pandascore.co"
 HEADERS = {
     "Authorization": f"Bearer {PANDASCORE_TOKEN}"
 }
+ENDPOINTS = ["running", "upcoming", "past"]
+
+# Пагинация: размер страницы (максимум у PandaScore — 100) и горизонт в страницах на эндпоинт
+PAGE_SIZE = int(os.getenv("PANDASCORE_PAGE_SIZE", 100))
+MAX_PAGES = int(os.getenv("PANDASCORE_MAX_PAGES", 5))
+# Прошедшие матчи нужны только для последних результатов (глубже — архив матчей),
+# поэтому past загружается не дальше первой страницы
+PAST_MAX_PAGES = int(os.getenv("PANDASCORE_PAST_MAX_PAGES", 1))
+ENDPOINT_MAX_PAGES = {
+    "past": PAST_MAX_PAGES,
+}
+
+# Часовой лимит запросов токена (общий для всех окружений)
+HOURLY_REQUEST_LIMIT = int(os.getenv("PANDASCORE_HOURLY_LIMIT", 1000))
+
+# Приоритет вызовов: меньше — важнее. Дельта приравнена к running
+PRIORITY_RUNNING = 0
+PRIORITY_UPCOMING = 1
+PRIORITY_PAST = 2
+ENDPOINT_PRIORITY = {
+    "running": PRIORITY_RUNNING,
+    "upcoming": PRIORITY_UPCOMING,
+    "past": PRIORITY_PAST,
+}
+# Доля часового лимита, которую вызов данного приоритета обязан оставить более важным
+PRIORITY_RESERVE = {
+    PRIORITY_RUNNING: 0.0,
+    PRIORITY_UPCOMING: 0.1,
+    PRIORITY_PAST: 0.25,
+}
+
+# Валидаторы условных запросов (ETag / Last-Modified) по URL страницы, хранятся рядом с кэшем
+VALIDATORS_CACHE_NAME = "pandascore_validators"
+
+_client: Optional[httpx.AsyncClient] = None
+_validators: Optional[dict] = None
 
 setup_logging()
 logger = logging.getLogger("pandascore")
 
+
+class BudgetExceeded(Exception):
+    """Запрос отложен планировщиком бюджета; matches — то, что успели загрузить."""
+
+    def __init__(self, message: str, matches: Optional[list] = None):
+        super().__init__(message)
+        self.matches = matches or []
+
+
+class RequestBudget:
+    """Token bucket на час, синхронизируемый с заголовками X-Rate-Limit-* от PandaScore.
+
+    Пока сервер не сообщил время сброса, бюджет пополняется равномерно (limit / час).
+    Если известен момент сброса окна — до него остаётся ровно столько, сколько сказал сервер.
+    """
+
+    def __init__(self, limit_per_hour: int = HOURLY_REQUEST_LIMIT):
+        self.limit = limit_per_hour
+        self.tokens = float(limit_per_hour)
+        self.reset_at: Optional[float] = None
+        self.spent = 0
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.reset_at is not None:
+            if time.time() >= self.reset_at:
+                self.tokens = float(self.limit)
+                self.reset_at = None
+        else:
+            self.tokens = min(self.limit, self.tokens + (now - self._updated) * self.limit / 3600)
+        self._updated = now
+
+    def try_acquire(self, priority: int = PRIORITY_RUNNING) -> bool:
+        self._refill()
+        reserve = self.limit * PRIORITY_RESERVE.get(priority, 0.0)
+        if self.tokens - 1 < reserve:
+            return False
+        self.tokens -= 1
+        self.spent += 1
+        return True
+
+    def update_from_headers(self, headers):
+        remaining = headers.get("X-Rate-Limit-Remaining")
+        if remaining is not None and remaining.isdigit():
+            self.tokens = float(remaining)
+        reset = headers.get("X-Rate-Limit-Reset")
+        if reset is not None and reset.isdigit():
+            # Заголовок бывает как epoch, так и «секунд до сброса»
+            value = int(reset)
+            self.reset_at = value if value > 1_000_000_000 else time.time() + value
+
+    def exhaust(self, retry_after: Optional[str] = None):
+        """Сервер ответил 429: бюджета нет до сброса окна."""
+        self.tokens = 0.0
+        delay = int(retry_after) if retry_after and retry_after.isdigit() else 3600
+        self.reset_at = time.time() + delay
+
+    def snapshot(self) -> dict:
+        self._refill()
+        return {
+            "limit": self.limit,
+            "remaining": int(self.tokens),
+            "reset_in": max(0, int(self.reset_at - time.time())) if self.reset_at else None,
+            "spent": self.spent,
+        }
+
+
+request_budget = RequestBudget()
+
+
+def get_budget() -> dict:
+    """Текущее состояние бюджета запросов — для планирования следующего цикла кэшера."""
+    return request_budget.snapshot()
+
 def process_match(match: dict) -> dict:
     opponents = []
     for opponent in match.get("opponents", []):
@@ -37,6 +155,7 @@ def process_match(match: dict) -> dict:
         "name": match["name"],
         "status": match["status"],
         "begin_at": match["begin_at"],
+        "begin_ts": parse_begin_ts(match["begin_at"]),
         "scheduled_at": match.get("scheduled_at"),
         "end_at": match.get("end_at"),
         "modified_at": match.get("modified_at"),
@@ -57,6 +176,7 @@ def process_match(match: dict) -> dict:
             "region": match["tournament"].get("region")
         },
         "serie": {
+            "id": match["serie"].get("id"),
             "season": match["serie"].get("season"),
             "full_name": match["serie"].get("full_name"),
             "year": match["serie"].get("year")
@@ -64,32 +184,202 @@ def process_match(match: dict) -> dict:
     }
 
 
-async def fetch_all_matches() -> dict:
-    all_matches = []
-    endpoints = ["running", "upcoming", "past"]
+def get_client() -> httpx.AsyncClient:
+    """Общий HTTP/2-клиент с пулом соединений, живущий между циклами кэшера."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            base_url=BASE_URL,
+            headers=HEADERS,
+            http2=True,
+            timeout=10,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+        )
+    return _client
+
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        for endpoint in endpoints:
-            url = f"{BASE_URL}/csgo/matches/{endpoint}"
-            try:
-                response = await client.get(url, headers=HEADERS)
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _load_validators() -> dict:
+    global _validators
+    if _validators is None:
+        try:
+            with open(get_cache_path(VALIDATORS_CACHE_NAME), "r", encoding="utf-8") as f:
+                _validators = json.load(f).get("pages", {})
+        except (OSError, ValueError):
+            _validators = {}
+    return _validators
+
+
+def save_validators(pages: Optional[dict] = None):
+    """Сохраняет валидаторы (по умолчанию текущие). Пишет с fsync — из event loop вызывать через executor."""
+    pages = _validators if pages is None else pages
+    if pages is not None:
+        write_json_to_cache(VALIDATORS_CACHE_NAME, {"pages": pages}, formats=("json",))
+
+
+async def iter_processed_matches(response: httpx.Response) -> AsyncIterator[dict]:
+    """Разбирает тело ответа потоково и отдаёт уже обработанные матчи:
+    сырой объект матча живёт только до вызова process_match."""
+    async for raw_match in iter_json_array(response.aiter_text()):
+        yield process_match(raw_match)
+
+
+async def fetch_pages(
+    client: httpx.AsyncClient,
+    url: str,
+    params: Optional[dict] = None,
+    priority: int = PRIORITY_RUNNING,
+    known: Optional[dict] = None,
+    max_pages: Optional[int] = None,
+) -> list[dict]:
+    """Загружает список матчей постранично, следуя Link: rel="next", но не дальше max_pages
+    (по умолчанию MAX_PAGES).
+
+    Каждая страница списывается из request_budget; если бюджет не позволяет — BudgetExceeded.
+    Если передан known (id -> уже обработанный матч), страницы запрашиваются условно
+    (If-None-Match / If-Modified-Since), а на 304 матчи страницы берутся из known.
+    """
+    matches = []
+    params = {**(params or {}), "page[size]": PAGE_SIZE, "page[number]": 1}
+    validators = _load_validators() if known is not None else {}
+    max_pages = max_pages or MAX_PAGES
+
+    for page in range(1, max_pages + 1):
+        if not request_budget.try_acquire(priority):
+            raise BudgetExceeded(f"бюджет запросов исчерпан (стр. {page})", matches)
+
+        request = client.build_request("GET", url, params=params)
+        key = str(request.url)
+        cached_page = validators.get(key)
+        if cached_page and all(match_id in known for match_id in cached_page["ids"]):
+            if cached_page.get("etag"):
+                request.headers["If-None-Match"] = cached_page["etag"]
+            if cached_page.get("last_modified"):
+                request.headers["If-Modified-Since"] = cached_page["last_modified"]
+
+        response = await client.send(request, stream=True)
+        try:
+            request_budget.update_from_headers(response.headers)
+            if response.status_code == 429:
+                request_budget.exhaust(response.headers.get("Retry-After"))
+                raise BudgetExceeded("PandaScore вернул 429", matches)
+
+            if response.status_code == 304 and cached_page:
+                matches.extend(known[match_id] for match_id in cached_page["ids"])
+                page_count = len(cached_page["ids"])
+                next_link = cached_page.get("next")
+            else:
                 response.raise_for_status()
-                raw_matches = response.json()
-                processed = [process_match(m) for m in raw_matches]
-                all_matches.extend(processed)
-                logger.info(f"✅ Загружено {len(processed)} матчей из {endpoint}")
-            except Exception as e:
-                logger.warning(f"❌ Ошибка при загрузке матчей ({endpoint}): {e}")
+                page_ids = []
+                async for match in iter_processed_matches(response):
+                    matches.append(match)
+                    page_ids.append(match["id"])
+                page_count = len(page_ids)
+                next_link = response.links.get("next", {}).get("url")
+
+                if known is not None:
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+                    if etag or last_modified:
+                        validators[key] = {
+                            "etag": etag,
+                            "last_modified": last_modified,
+                            "next": next_link,
+                            "ids": page_ids,
+                        }
+                    else:
+                        validators.pop(key, None)
+        finally:
+            await response.aclose()
+
+        if not next_link or page_count < PAGE_SIZE:
+            break
+        # Ссылка next уже содержит все параметры запроса
+        url, params = next_link, None
+    else:
+        logger.info(f"⏹ {url}: достигнут горизонт пагинации ({max_pages} стр.)")
+
+    return matches
+
+
+async def fetch_endpoint(client: httpx.AsyncClient, endpoint: str, known: Optional[dict] = None) -> list[dict]:
+    return await fetch_pages(
+        client,
+        f"/csgo/matches/{endpoint}",
+        priority=ENDPOINT_PRIORITY[endpoint],
+        known=known,
+        max_pages=ENDPOINT_MAX_PAGES.get(endpoint),
+    )
+
+
+async def fetch_modified_matches(since: str) -> list[dict]:
+    """Дельта: все матчи (любого статуса), изменённые начиная с since (ISO 8601)."""
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    params = {
+        "range[modified_at]": f"{since},{now}",
+        "sort": "modified_at",
+    }
+    matches = await fetch_pages(get_client(), "/csgo/matches", params, priority=PRIORITY_RUNNING)
+    logger.info(f"✅ Дельта: загружено {len(matches)} изменённых матчей с {since}")
+    return matches
+
+
+async def fetch_all_matches(previous: Optional[list[dict]] = None) -> dict:
+    """Полная загрузка. complete=False, если хоть один эндпоинт не загружен целиком —
+    такой результат нельзя записывать поверх кэша, только сливать с ним.
+
+    previous — текущие матчи кэша: с ними страницы запрашиваются условно, и неизменившиеся
+    (304) не скачиваются и не обрабатываются заново.
+    """
+    client = get_client()
+    known = {m["id"]: m for m in previous} if previous is not None else None
+    # Корутины стартуют в порядке приоритета, поэтому первые страницы важных эндпоинтов
+    # резервируют бюджет раньше остальных
+    endpoints = sorted(ENDPOINTS, key=ENDPOINT_PRIORITY.get)
+    results = await asyncio.gather(
+        *(fetch_endpoint(client, endpoint, known) for endpoint in endpoints),
+        return_exceptions=True,
+    )
+    if known is not None:
+        # Копия: пока поток пишет файл, следующий цикл может менять валидаторы
+        await asyncio.get_running_loop().run_in_executor(None, save_validators, dict(_load_validators()))
+
+    # Матч может сместиться между страницами во время загрузки — убираем дубли по id
+    matches_by_id = {}
+    complete = True
+    for endpoint, result in zip(endpoints, results):
+        if isinstance(result, BudgetExceeded):
+            logger.warning(f"⏸ {endpoint} отложен: {result}")
+            complete = False
+            result = result.matches
+        elif isinstance(result, Exception):
+            logger.warning(f"❌ Ошибка при загрузке матчей ({endpoint}): {result}")
+            complete = False
+            continue
+        for match in result:
+            matches_by_id.setdefault(match["id"], match)
+        logger.info(f"✅ Загружено {len(result)} матчей из {endpoint}")
 
     return {
-        "matches": all_matches,
-        "updated_at": datetime.now(timezone.utc).isoformat()
+        "matches": list(matches_by_id.values()),
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "complete": complete,
     }
 
 
-def format_time_until(start_time_iso: str, lang: str = "en") -> str:
+def format_time_until(start_time_iso: str | int, lang: str = "en") -> str:
+    """Сколько осталось до начала. Принимает ISO-строку или уже разобранный epoch (begin_ts)."""
     try:
-        start_time = datetime.fromisoformat(start_time_iso.replace("Z", "+00:00"))
+        if isinstance(start_time_iso, int):
+            start_time = datetime.fromtimestamp(start_time_iso, tz=timezone.utc)
+        else:
+            start_time = datetime.fromisoformat(start_time_iso.replace("Z", "+00:00"))
         now = datetime.now(timezone.utc)
         delta = start_time - now
 
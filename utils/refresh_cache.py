@@ -1,7 +1,7 @@
 import asyncio
 import logging
-from utils.pandascore import fetch_all_matches  
-from utils.cache_writer import write_json_to_cache
+from utils.pandascore import close_client
+from utils.match_cacher import refresh_matches, save_matches
 from utils.logging_config import setup_logging
 
 setup_logging()
@@ -9,9 +9,15 @@ logger = logging.getLogger("refresh_cache")
 
 async def main():
     logger.info("⏳ Обновление кэша матчей вручную...")
-    matches = await fetch_all_matches()
-    write_json_to_cache("matches", {"matches": matches})
-    logger.info(f"✅ Успешно обновлён кэш: {len(matches)} матчей")
+    try:
+        # Через refresh_matches: неполная загрузка сливается с текущим кэшем, а не затирает его
+        match_data = await refresh_matches(full_sync=True)
+    finally:
+        await close_client()
+    if not match_data.pop("complete"):
+        logger.warning("⚠️ Загрузка неполная: в кэше сохранены и прежние матчи.")
+    save_matches(match_data["matches"], match_data["updated_at"])
+    logger.info(f"✅ Успешно обновлён кэш: {len(match_data['matches'])} матчей")
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
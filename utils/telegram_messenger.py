@@ -3,7 +3,8 @@ from telegram.ext import ContextTypes
 import logging
 
 from utils.form_match_card import build_match_card
-from bot.db import get_subscriber_language
+from utils.match_model import Match
+from bot.db_async import get_subscriber_language
 
 logger = logging.getLogger("telegram_messenger")
 
@@ -12,7 +13,7 @@ async def send_match_batch(
     update: Update,
     context: ContextTypes.DEFAULT_TYPE,
     *,
-    matches: list[dict],
+    matches: list[Match | dict],
     prefix_text: str,
     show_time_until: bool = False,
     show_winner: bool = False,
@@ -21,7 +22,7 @@ async def send_match_batch(
     lang: str = None,
 ):
     user_id = update.effective_chat.id
-    lang = lang or get_subscriber_language(user_id)
+    lang = lang or await get_subscriber_language(user_id)
 
     if not matches:
         await context.bot.send_message(chat_id=user_id, text=empty_text)